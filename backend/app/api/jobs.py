@@ -0,0 +1,17 @@
+from fastapi import APIRouter, HTTPException
+from app.services import job_queue
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+@router.get('')
+def list_jobs(status: str | None = None, kind: str | None = None, limit: int = 50):
+    """Recent jobs (newest first), optionally filtered, plus per-status counts."""
+    return {"jobs": job_queue.list_jobs(status, kind, min(max(limit, 1), 500)), "counts": job_queue.counts()}
+
+@router.get('/{job_id}')
+def get_job(job_id: str):
+    """Job state: status (queued/running/done/failed), attempts, next retry time, last error."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+    return job
@@ -1,42 +1,28 @@
-from fastapi import APIRouter, UploadFile, File, Depends, BackgroundTasks, HTTPException, Form
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 from app.db.database import get_db
 from app.models.media import Media
 from app.schemas.media import MediaOut, SummaryRequest, ChatRequest, SummaryResponse, AnalyticsOut, ChatResponse
 from app.utils.file import save_upload
-from app.services.whisper_service import transcribe_to_segments
 from app.services.gemini_service import call_gemini_summarize
-from app.services.tasks import transcribe_media, summarize_media
+from app.services.tasks import summarize_media
+from app.services import chunked_upload, job_queue
 from app.ai.gemini import chat_with_context, call_gemini
 from app.api.deps import get_current_user
 import os, json, asyncio, uuid
+from pathlib import Path
 from fastapi.responses import FileResponse
 from fastapi.responses import PlainTextResponse
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 
 router = APIRouter(prefix="/media", tags=["media"])
 
-async def process_transcription(media_id: int, path: str, db: AsyncSession):
-    # fallback local inline (if Celery not running)
-    try:
-        transcribe_media.delay(media_id, path)
-    except Exception:
-        try:
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, lambda: transcribe_to_segments(path))
-            transcript = result['text']
-            language = result.get('language')
-            segments_json = json.dumps(result.get('segments', []))
-            await db.execute(update(Media).where(Media.id==media_id).values(transcript=transcript, language=language, segments_json=segments_json, status='transcribed'))
-            await db.commit()
-        except Exception:
-            await db.execute(update(Media).where(Media.id==media_id).values(status='error'))
-            await db.commit()
+async def process_transcription(media_id: int, path: str):
+    # durable local queue (Celery when JOB_BACKEND=celery); the worker updates the Media row
+    return job_queue.enqueue('transcribe_db', {'media_id': media_id, 'path': path}, job_id=f"transcribe_db:{media_id}")
 
 @router.post('/upload', response_model=MediaOut)
-async def upload(file: UploadFile = File(...), db: AsyncSession = Depends(get_db), user=Depends(get_current_user), background_tasks: BackgroundTasks = None):
+async def upload(file: UploadFile = File(...), db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
     try:
         stored = save_upload(file)
     except ValueError as e:
@@ -46,33 +32,42 @@ async def upload(file: UploadFile = File(...), db: AsyncSession = Depends(get_db
     await db.commit()
     await db.refresh(media)
     path = os.path.join('uploads', stored)
-    background_tasks.add_task(process_transcription, media.id, path, db)
+    await process_transcription(media.id, path)
     return media
 
 @router.post('/upload/chunk')
-async def upload_chunk(chunk: UploadFile = File(...), chunk_index: int = Form(...), total_chunks: int = Form(...), upload_id: str = Form(...)):
-    os.makedirs('uploads/chunks', exist_ok=True)
-    temp_dir = os.path.join('uploads', 'chunks', upload_id)
-    os.makedirs(temp_dir, exist_ok=True)
-    # save chunk
-    chunk_path = os.path.join(temp_dir, f"{chunk_index}.part")
-    with open(chunk_path, 'wb') as f:
-        f.write(await chunk.read())
-    # if last chunk, assemble
-    assembled = None
-    if len(os.listdir(temp_dir)) == total_chunks:
-        final_name = f"{upload_id}.bin"
-        assembled = os.path.join('uploads', final_name)
-        with open(assembled, 'wb') as out:
-            for i in range(total_chunks):
-                p = os.path.join(temp_dir, f"{i}.part")
-                with open(p, 'rb') as inp:
-                    out.write(inp.read())
-        # cleanup
-        for fpart in os.listdir(temp_dir):
-            os.remove(os.path.join(temp_dir, fpart))
-        os.rmdir(temp_dir)
-    return {"received": chunk_index, "assembled": bool(assembled), "upload_id": upload_id, "final_path": assembled}
+async def upload_chunk(chunk: UploadFile = File(...), chunk_index: int = Form(...), total_chunks: int = Form(...), upload_id: str = Form(...),
+                       chunk_size: int | None = Form(None), total_size: int | None = Form(None), filename: str | None = Form(None),
+                       db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+    # chunks are written in place at their offset; the completing request registers the Media row exactly once
+    try:
+        state = await chunked_upload.write_chunk(upload_id, chunk_index, chunk, chunk_size=chunk_size, total_chunks=total_chunks,
+                                                 total_size=total_size, filename=filename or chunk.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if state.pop('claimed'):
+        name = state.get('filename') or f"{upload_id}.bin"
+        stored = f"{upload_id}{os.path.splitext(name)[1].lower() or '.bin'}"
+        os.makedirs('uploads', exist_ok=True)
+        path = os.path.join('uploads', stored)
+        media = Media(filename=stored, original_name=name, content_type=chunk.content_type or 'application/octet-stream', status='processing', user_id=int(user) if user else None)
+        db.add(media)
+        await db.commit()
+        await db.refresh(media)
+        state = chunked_upload.complete(upload_id, Path(path), str(media.id))
+        await process_transcription(media.id, path)
+    return {"received": chunk_index, "assembled": state['state'] == 'done', "upload_id": upload_id, "final_path": state.get('final_path'),
+            "media_id": state.get('media_id'), "missing": state.get('missing', [])}
+
+@router.get('/upload/{upload_id}/status')
+async def upload_status(upload_id: str):
+    try:
+        status = chunked_upload.get_status(upload_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if status is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return status
 
 @router.get('/{media_id}', response_model=MediaOut)
 async def get_media(media_id: int, db: AsyncSession = Depends(get_db)):
@@ -151,6 +146,8 @@ async def export_pdf(media_id: int, db: AsyncSession = Depends(get_db)):
     media = q.scalar_one_or_none()
     if not media or not media.transcript:
         raise HTTPException(status_code=404, detail="Transcript not found")
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
     pdf_path = os.path.join('uploads', f"media_{media_id}.pdf")
     c = canvas.Canvas(pdf_path, pagesize=letter)
     width, height = letter
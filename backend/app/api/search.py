@@ -0,0 +1,29 @@
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.api.deps import get_current_user
+from app.services import library_search
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+def _epoch(value: datetime | None):
+    if value is None:
+        return None
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+@router.get('')
+def search_library(q: str = Query(..., min_length=1), offset: int = Query(0, ge=0), limit: int = Query(20, ge=1, le=100),
+                   mode: str = 'hybrid', language: str | None = None, since: datetime | None = None,
+                   until: datetime | None = None, user=Depends(get_current_user)):
+    """Search the caller's transcripts: media id, segment timestamp and score per hit, best first.
+
+    Results are scoped to the bearer-token user (media they uploaded, or captured with
+    their user_id); without a token only anonymous media is searched.
+    mode: hybrid (lexical + semantic, rank-fused), lexical or semantic. Filters: language and
+    since/until (media creation time, ISO 8601 or epoch seconds).
+    Pages are offset/limit; `has_more` tells whether another page exists.
+    """
+    if mode not in library_search.MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(library_search.MODES)}")
+    if offset + limit > library_search.MAX_DEPTH:
+        raise HTTPException(status_code=400, detail=f"offset + limit must not exceed {library_search.MAX_DEPTH}")
+    return library_search.search(q, offset, limit, mode, language, _epoch(since), _epoch(until), user)
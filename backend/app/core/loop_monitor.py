@@ -0,0 +1,53 @@
+"""Event-loop lag monitor.
+
+A task on the server loop sleeps LOOP_LAG_INTERVAL_MS and measures how late it wakes
+up. Anything blocking the loop (a synchronous subprocess, file I/O or CPU work in a
+coroutine) shows up as lag for every WebSocket and HTTP request at once; wake-ups later
+than LOOP_LAG_WARN_MS are logged as stalls. Figures are served by /_debug/loop.
+"""
+import asyncio, os, time
+from collections import deque
+
+INTERVAL = float(os.getenv('LOOP_LAG_INTERVAL_MS', '100')) / 1000
+THRESHOLD = float(os.getenv('LOOP_LAG_WARN_MS', '100')) / 1000
+WINDOW = 600  # recent samples kept for percentiles
+
+_task = None
+_samples: deque = deque(maxlen=WINDOW)
+_stats = {'max_ms': 0.0, 'stalls': 0, 'last_stall_ms': None, 'last_stall_at': None}
+
+
+def _record(lag: float, threshold: float):
+    _samples.append(lag)
+    _stats['max_ms'] = max(_stats['max_ms'], lag * 1000)
+    if lag >= threshold:
+        _stats.update(stalls=_stats['stalls'] + 1, last_stall_ms=round(lag * 1000, 1), last_stall_at=time.time())
+        print(f'[loop] event loop stalled {lag * 1000:.0f}ms (threshold {threshold * 1000:.0f}ms)')  # noqa: T201
+
+async def _monitor(interval: float, threshold: float):
+    loop = asyncio.get_running_loop()
+    while True:
+        due = loop.time() + interval
+        await asyncio.sleep(interval)
+        _record(max(loop.time() - due, 0.0), threshold)
+
+def start(interval: float = INTERVAL, threshold: float = THRESHOLD):
+    """Start monitoring the running loop (no-op when already running or LOOP_LAG_INTERVAL_MS=0)."""
+    global _task
+    if interval <= 0 or (_task is not None and not _task.done()):
+        return _task
+    _task = asyncio.get_running_loop().create_task(_monitor(interval, threshold))
+    return _task
+
+def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
+
+def stats() -> dict:
+    recent = sorted(_samples)
+    pick = lambda q: round(recent[min(int(q * len(recent)), len(recent) - 1)] * 1000, 1) if recent else None
+    return dict(_stats, max_ms=round(_stats['max_ms'], 1), running=_task is not None and not _task.done(),
+                interval_ms=INTERVAL * 1000, threshold_ms=THRESHOLD * 1000,
+                last_ms=round(_samples[-1] * 1000, 1) if _samples else None, p50_ms=pick(0.5), p99_ms=pick(0.99))
@@ -0,0 +1,85 @@
+"""Background warm-up, reported separately from liveness.
+
+/health answers as soon as the app has imported; heavy work (storage/manifest
+preparation, Whisper model loads) runs here on a daemon thread started from the
+lifespan hook, and /ready reports per-step progress. The app is ready once every
+step has finished; a model that cannot be loaded is reported as unavailable
+rather than blocking readiness (transcription then uses its fallback).
+"""
+import os, threading, time
+
+WARMUP_WHISPER = os.getenv('WARMUP_WHISPER', '1') not in ('0', 'false', 'no')
+
+_lock = threading.Lock()
+_thread = None
+_started_at = None
+_steps: dict = {}
+
+
+def _storage():
+    from app.services.storage_access import ensure_storage
+    ensure_storage()
+
+def _manifest():
+    from app.services import manifest
+    manifest.get('')  # opens the database (and backfills a fresh one)
+
+def _library():
+    from app.services import library_search
+    library_search.backfill()  # items transcribed before the library index existed
+
+def _embeddings():
+    from app.services import embedding_service
+    embedding_service.backfill()  # indexes whose build job was lost or failed, or never queued
+
+def _model(size: str | None):
+    def load():
+        if not WARMUP_WHISPER:
+            return 'skipped'
+        from app.services import engines
+        return 'done' if engines.get_engine().available(size) else 'unavailable'
+    return load
+
+def _plan():
+    from app.websocket.capture_ws import REALTIME_MODEL
+    return [
+        ('storage', _storage),
+        ('manifest', _manifest),
+        ('library_index', _library),
+        ('embedding_index', _embeddings),
+        ('whisper', _model(None)),
+        ('whisper_realtime', _model(REALTIME_MODEL)),
+    ]
+
+def _run(plan):
+    for name, fn in plan:
+        _steps[name]['status'] = 'running'
+        t0 = time.perf_counter()
+        try:
+            _steps[name]['status'] = fn() or 'done'
+        except Exception as e:
+            _steps[name].update(status='failed', error=str(e))
+        _steps[name]['seconds'] = round(time.perf_counter() - t0, 3)
+
+def start():
+    """Kick off warm-up once per process (no-op when already started)."""
+    global _thread, _started_at
+    with _lock:
+        if _thread is not None:
+            return
+        plan = _plan()
+        for name, _ in plan:
+            _steps[name] = {'status': 'pending'}
+        _started_at = time.time()
+        _thread = threading.Thread(target=_run, args=(plan,), name='warmup', daemon=True)
+        _thread.start()
+
+def status() -> dict:
+    steps = {k: dict(v) for k, v in _steps.items()}
+    finished = bool(steps) and all(s['status'] not in ('pending', 'running') for s in steps.values())
+    return {
+        'ready': finished,
+        'started': _started_at is not None,
+        'uptime_seconds': round(time.time() - _started_at, 3) if _started_at else None,
+        'steps': steps,
+    }
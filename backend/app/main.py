@@ -1,9 +1,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from app.routes import realtime_routes  # websocket routes (package)
 from app.unified_media import router as media_router
 from app.api import auth as auth_api
+from app.api import jobs as jobs_api
+from app.api import search as search_api
+from app.websocket import capture_ws
+from app.core import warmup, loop_monitor
+from app.services import chunked_upload, job_queue, session_buffer, whisper_service
 import os
 try:
     from fastapi_limiter import FastAPILimiter
@@ -21,6 +27,15 @@ async def lifespan(app: FastAPI):  # FastAPI 0.110+ lifespan style
             await FastAPILimiter.init(r)
         except Exception:
             pass
+    # Spill files of live sessions that died with a previous process (before any new session spills)
+    session_buffer.purge_stale_spills()
+    chunked_upload.purge_stale_locks()
+    # Models and storage warm up in the background; /ready tracks progress
+    warmup.start()
+    # Durable job queue: in-process workers (JOB_WORKERS=0 leaves jobs to `python -m app.worker`)
+    job_queue.start_workers()
+    # Log event-loop stalls (blocking work on the loop delays every socket); figures at /_debug/loop
+    loop_monitor.start()
     # Keep-alive task (does nothing but prevents some envs from treating app as idle)
     import asyncio
     _alive = True
@@ -31,6 +46,11 @@ async def lifespan(app: FastAPI):  # FastAPI 0.110+ lifespan style
     yield
     # (Optional) add shutdown cleanup here
     _alive = False  # type: ignore
+    # Store open live capture sessions (including ones waiting for a resume) before exiting
+    await capture_ws.shutdown()
+    job_queue.stop_workers()
+    whisper_service.shutdown_pools()  # long-media worker processes each hold a model
+    loop_monitor.stop()
     try:
         task.cancel()
     except Exception:
@@ -50,7 +70,10 @@ app.add_middleware(
 # Unified routers
 app.include_router(auth_api.router)
 app.include_router(media_router)
+app.include_router(jobs_api.router)
+app.include_router(search_api.router)  # library-wide search
 app.include_router(realtime_routes.router, prefix="/realtime", tags=["Realtime"])  # existing ws
+app.include_router(capture_ws.router, tags=["Realtime"])  # /v1/ws/capture used by LiveCapture
 
 
 @app.get("/")
@@ -61,6 +84,12 @@ def root():
 def health():
     return {"status": "ok"}
 
+@app.get("/ready")
+def ready():
+    """Readiness: 200 once background warm-up finished, 503 (with per-step progress) before."""
+    state = warmup.status()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
 @app.get("/_debug/routes")
 def list_routes():
     routes = []
@@ -76,6 +105,31 @@ def list_routes():
     return {"routes": routes}
 
 
+@app.get("/_debug/models")
+def list_models():
+    """Transcription engine plus Whisper models loaded in this process: replicas, busy slots, queue depth, memory."""
+    from app.services import model_registry, engines
+    return {"engine": engines.get_engine().capabilities(), "models": model_registry.stats(),
+            "slots_per_model": model_registry.INFERENCE_SLOTS}
+
+
+@app.get("/_debug/realtime")
+def realtime_stats():
+    """Realtime scheduler (inference workers, queue depth, per-session wait/run lag) and session memory budget."""
+    from app.services.realtime_scheduler import get_scheduler
+    from app.services.session_buffer import BUDGET
+    from app.websocket.capture_ws import SESSIONS
+    return dict(get_scheduler().stats(), memory=dict(BUDGET.stats(), sessions={
+        sid: {'buffered_bytes': s.buffer.size, 'memory_bytes': s.buffer.memory_bytes, 'spilled': s.buffer.spilled}
+        for sid, s in list(SESSIONS.items())}))
+
+
+@app.get("/_debug/loop")
+def loop_lag():
+    """Event-loop lag: recent p50/p99, worst wake-up delay and stalls above LOOP_LAG_WARN_MS."""
+    return loop_monitor.stats()
+
+
 @app.middleware("http")
 async def _log_requests(request, call_next):  # minimal logging
     from time import time
@@ -0,0 +1,137 @@
+"""Decoded-audio cache: each media file is decoded once to 16 kHz mono PCM.
+
+Decoded audio is stored as raw little-endian int16 at storage/audio/<sha256>.s16
+and read back through numpy.memmap, so initial transcription, inline
+re-transcription, retries and any later audio analysis skip ffmpeg entirely.
+Entries are keyed by the media content hash: new content gets a new entry and
+byte-identical uploads share one. Video streams are dropped at the demuxer (-vn)
+instead of being decoded. Without ffmpeg on PATH, plain PCM WAV files are still
+decoded (stdlib wave + linear resampling), which keeps offline runs working.
+
+The cache is bounded by PCM_CACHE_MB: a hit refreshes the entry's mtime, and after
+each new decode the least recently used entries are deleted until the directory
+fits the budget again. The entry just decoded and entries used within the last
+PCM_CACHE_MIN_AGE_SECONDS (in-flight transcriptions) are never evicted; mappings
+that are already open stay valid after their file is unlinked.
+"""
+import os, subprocess, tempfile, threading, time, wave
+from pathlib import Path
+import numpy as np
+from .storage_access import STORAGE
+
+SAMPLE_RATE = 16000
+AUDIO_DIR = STORAGE / 'audio'
+PCM_DTYPE = np.dtype('<i2')
+CACHE_BYTES = int(float(os.getenv('PCM_CACHE_MB', '4096')) * 1024 * 1024)
+CACHE_MIN_AGE = float(os.getenv('PCM_CACHE_MIN_AGE_SECONDS', '600'))
+
+_evict_lock = threading.Lock()
+
+def pcm_path(sha256: str) -> Path:
+    return AUDIO_DIR / f"{sha256}.s16"
+
+def decode_to_pcm(src: str, dest: Path):
+    """Stream ffmpeg's 16 kHz mono s16le output into dest (atomic rename when complete)."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix=f".{dest.name}.", suffix='.tmp')
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-i", src, "-vn", "-sn", "-dn",
+           "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-"]
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            try:
+                proc = subprocess.run(cmd, stdout=out, stderr=subprocess.PIPE)
+            except FileNotFoundError:  # no ffmpeg: PCM WAV only
+                out.write(decode_wav(src).tobytes())
+                proc = None
+        if proc is not None and proc.returncode != 0:
+            raise RuntimeError(f"Failed to decode audio: {proc.stderr.decode(errors='ignore')[-500:]}")
+        os.replace(tmp, dest)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+def decode_wav(src: str) -> np.ndarray:
+    """16 kHz mono int16 samples from a PCM WAV file (raises ValueError for anything else)."""
+    try:
+        with wave.open(str(src), 'rb') as wf:
+            width, channels, rate = wf.getsampwidth(), wf.getnchannels(), wf.getframerate()
+            frames = wf.readframes(wf.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"ffmpeg not found and {src} is not a PCM WAV file: {e}")
+    if width != 2:
+        raise ValueError(f"ffmpeg not found and {src} is not 16-bit PCM")
+    audio = np.frombuffer(frames, dtype=PCM_DTYPE).reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE and len(audio):
+        n = int(round(len(audio) * SAMPLE_RATE / rate))
+        audio = np.interp(np.arange(n) * (rate / SAMPLE_RATE), np.arange(len(audio)), audio)
+    return np.round(audio).astype(PCM_DTYPE)
+
+def decode(src: str) -> np.ndarray:
+    """Decode src to in-memory 16 kHz mono int16 (for callers without a content hash)."""
+    fd, tmp = tempfile.mkstemp(suffix='.s16')
+    os.close(fd)
+    try:
+        decode_to_pcm(src, Path(tmp))
+        return np.fromfile(tmp, dtype=PCM_DTYPE)
+    finally:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+def _touch(path: Path) -> bool:
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def evict(keep: Path | None = None) -> int:
+    """Delete least recently used entries until the cache fits CACHE_BYTES; returns bytes freed."""
+    with _evict_lock:
+        try:
+            entries = [(de.stat().st_mtime, de.stat().st_size, Path(de.path))
+                       for de in os.scandir(AUDIO_DIR) if de.name.endswith('.s16') and not de.name.startswith('.')]
+        except FileNotFoundError:
+            return 0
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - CACHE_MIN_AGE
+        freed = 0
+        for mtime, size, path in sorted(entries):
+            if total <= CACHE_BYTES or mtime > cutoff:
+                break
+            if keep is not None and path == keep:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            freed += size
+        return freed
+
+def ensure(src: str, sha256: str) -> Path:
+    """Return the cached PCM file for this content, decoding src on a miss."""
+    path = pcm_path(sha256)
+    if not _touch(path):
+        decode_to_pcm(src, path)
+        evict(keep=path)
+    return path
+
+def open_pcm(path) -> np.ndarray:
+    """Memory-map a cached PCM file as int16 samples (empty files give an empty array)."""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=PCM_DTYPE)
+    return np.memmap(path, dtype=PCM_DTYPE, mode='r')
+
+def to_float32(audio: np.ndarray) -> np.ndarray:
+    """Whisper input format: float32 in [-1, 1]."""
+    if audio.dtype == np.float32:
+        return audio
+    return np.asarray(audio, dtype=np.float32) / 32768.0
+
+def load(src: str, sha256: str) -> np.ndarray:
+    return open_pcm(ensure(src, sha256))
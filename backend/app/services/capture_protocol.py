@@ -0,0 +1,83 @@
+"""Wire formats for the live capture websocket.
+
+'json' (default) is the original protocol: one JSON text frame per message and an
+ack per received blob. 'compact' is negotiated with {"type":"start","protocol":"compact"}
+(or ?protocol=compact): partials, acks and the final message become small binary
+frames, acks are batched (one per REALTIME_ACK_EVERY blobs and one per tick), and
+partials carry only newly committed segments plus the tentative tail, and only when
+something changed. Rare control messages (started, error, backpressure, ...) stay JSON.
+
+Binary frame, little-endian: kind u8, seq u32 (per-session message counter), then
+- PARTIAL (1): commit_index u32 (index of the first segment below in the session's
+  committed list), n u16, n segments, m u16, m tentative segments;
+  segment = start_ms u32, end_ms u32, text_len u16, utf-8 text
+- ACK (2): blobs u32 (blobs received so far), bytes u64 (bytes received so far)
+- FINAL (3): committed u32 (total committed segments), text_len u32, utf-8 text
+
+commit_index lets a client detect gaps and resume from the segments it already has.
+"""
+import os, struct
+
+PROTOCOLS = ('json', 'compact')
+PARTIAL, ACK, FINAL = 1, 2, 3
+ACK_EVERY = max(1, int(os.getenv('REALTIME_ACK_EVERY', '8')))
+
+_HEAD = struct.Struct('<BI')
+_SEG = struct.Struct('<IIH')
+_COUNT = struct.Struct('<H')
+_INDEX = struct.Struct('<I')
+_ACK = struct.Struct('<IQ')
+_FINAL = struct.Struct('<II')
+
+
+def _ms(seconds) -> int:
+    return max(0, int(round((seconds or 0.0) * 1000)))
+
+def _pack_segments(segments: list) -> bytes:
+    out = [_COUNT.pack(len(segments))]
+    for s in segments:
+        text = (s.get('text') or '').encode('utf-8')[:0xFFFF]
+        out.append(_SEG.pack(_ms(s.get('start')), _ms(s.get('end')), len(text)))
+        out.append(text)
+    return b''.join(out)
+
+def encode_partial(seq: int, commit_index: int, committed: list, tentative: list) -> bytes:
+    return _HEAD.pack(PARTIAL, seq) + _INDEX.pack(commit_index) + _pack_segments(committed) + _pack_segments(tentative)
+
+def encode_ack(seq: int, blobs: int, nbytes: int) -> bytes:
+    return _HEAD.pack(ACK, seq) + _ACK.pack(blobs, nbytes)
+
+def encode_final(seq: int, committed: int, text: str) -> bytes:
+    data = (text or '').encode('utf-8')
+    return _HEAD.pack(FINAL, seq) + _FINAL.pack(committed, len(data)) + data
+
+
+def _unpack_segments(frame: bytes, pos: int):
+    (n,) = _COUNT.unpack_from(frame, pos)
+    pos += _COUNT.size
+    segments = []
+    for _ in range(n):
+        start, end, size = _SEG.unpack_from(frame, pos)
+        pos += _SEG.size
+        segments.append({'start': start / 1000, 'end': end / 1000, 'text': frame[pos:pos + size].decode('utf-8')})
+        pos += size
+    return segments, pos
+
+def decode(frame: bytes) -> dict:
+    """Binary frame -> message dict shaped like the JSON protocol (for tests and Python clients)."""
+    kind, seq = _HEAD.unpack_from(frame)
+    pos = _HEAD.size
+    if kind == PARTIAL:
+        (commit_index,) = _INDEX.unpack_from(frame, pos)
+        segments, pos = _unpack_segments(frame, pos + _INDEX.size)
+        tentative, pos = _unpack_segments(frame, pos)
+        return {'type': 'partial', 'seq': seq, 'commit_index': commit_index, 'segments': segments,
+                'tentative': tentative, 'text': ''.join(s['text'] for s in segments + tentative)}
+    if kind == ACK:
+        blobs, nbytes = _ACK.unpack_from(frame, pos)
+        return {'type': 'ack', 'seq': seq, 'blobs': blobs, 'bytes': nbytes}
+    if kind == FINAL:
+        committed, size = _FINAL.unpack_from(frame, pos)
+        pos += _FINAL.size
+        return {'type': 'final', 'seq': seq, 'committed': committed, 'text': frame[pos:pos + size].decode('utf-8')}
+    raise ValueError(f'unknown capture frame kind {kind}')
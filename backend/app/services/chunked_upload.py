@@ -0,0 +1,239 @@
+"""Resumable chunked upload sessions.
+
+Each session lives in storage/uploads/<upload_id>/:
+
+  session.json   parameters (chunk_size, total_chunks, filename, ...) and final state
+  data.part      target file, preallocated; every chunk is written at its own offset
+  received.map   one byte per chunk (1 = stored). A byte per chunk instead of a packed
+                 bit lets concurrent chunk writers mark themselves without a
+                 read-modify-write of shared state.
+
+When the last missing chunk lands, completion is claimed exactly once through an
+O_EXCL marker file and data.part is renamed into place; there is no reassembly pass.
+The marker (finalize.lock) records the claiming pid and time. One whose process is
+gone, or older than UPLOAD_FINALIZE_TIMEOUT_SECONDS, belongs to a finalizer that
+died; it is reclaimed by the next chunk (the retried final chunk finalizes again)
+and removed at startup (purge_stale_locks).
+"""
+import asyncio, json, os, re, time, threading
+from pathlib import Path
+import numpy as np
+from .storage_access import STORAGE, UPLOAD_CHUNK_BYTES, write_json_atomic
+
+UPLOADS_DIR = STORAGE / 'uploads'
+_UPLOAD_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+_create_lock = threading.Lock()
+# A finalize claim this old is abandoned even if its pid is alive (e.g. reused)
+FINALIZE_TIMEOUT_SECONDS = float(os.getenv('UPLOAD_FINALIZE_TIMEOUT_SECONDS', '600'))
+
+def _session_dir(upload_id: str) -> Path:
+    if not _UPLOAD_ID_RE.match(upload_id or ''):
+        raise ValueError('upload_id must be 1-128 characters of [A-Za-z0-9_-]')
+    return UPLOADS_DIR / upload_id
+
+def _load(sdir: Path):
+    try:
+        with open(sdir / 'session.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _preallocate(path: Path, size: int):
+    with open(path, 'wb') as f:
+        if size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError:
+                pass
+        f.truncate(size)
+
+def open_session(upload_id: str, total_chunks: int, chunk_size: int, total_size: int | None = None,
+                 filename: str | None = None) -> dict:
+    """Create the session if needed and return its parameters (existing sessions win)."""
+    sdir = _session_dir(upload_id)
+    if total_chunks < 1 or chunk_size < 1:
+        raise ValueError('total_chunks and chunk_size must be positive')
+    if total_size is not None and not (chunk_size * (total_chunks - 1) < total_size <= chunk_size * total_chunks):
+        raise ValueError('total_size does not match chunk_size * total_chunks')
+    with _create_lock:
+        session = _load(sdir)
+        if session is not None:
+            return session
+        sdir.mkdir(parents=True, exist_ok=True)
+        _preallocate(sdir / 'data.part', total_size or chunk_size * total_chunks)
+        with open(sdir / 'received.map', 'wb') as f:
+            f.write(bytes(total_chunks))
+        session = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'total_chunks': total_chunks,
+            'chunk_size': chunk_size,
+            'total_size': total_size,
+            'state': 'open',
+            'created_at': time.time(),
+        }
+        write_json_atomic(sdir / 'session.json', session)
+        return session
+
+def _missing_ranges(received: bytes) -> list:
+    """Collapse missing chunk indices into inclusive [start, end] ranges."""
+    missing = np.flatnonzero(np.frombuffer(received, dtype=np.uint8) == 0)
+    if missing.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(missing) != 1)
+    starts = np.concatenate(([missing[0]], missing[breaks + 1]))
+    ends = np.concatenate((missing[breaks], [missing[-1]]))
+    return [[int(s), int(e)] for s, e in zip(starts, ends)]
+
+def get_status(upload_id: str):
+    """Return session progress (including missing chunk ranges for resume) or None if unknown."""
+    sdir = _session_dir(upload_id)
+    session = _load(sdir)
+    if session is None:
+        return None
+    status = dict(session)
+    if session['state'] == 'done':
+        status.update(received_chunks=session['total_chunks'], missing=[])
+        return status
+    try:
+        with open(sdir / 'received.map', 'rb') as f:
+            received = f.read()
+    except FileNotFoundError:  # completed concurrently
+        return get_status(upload_id)
+    status['received_chunks'] = session['total_chunks'] - received.count(0)
+    status['missing'] = _missing_ranges(received)
+    if status['received_chunks'] == session['total_chunks'] and _finalizing(sdir):
+        status['state'] = 'finalizing'
+    return status
+
+async def write_chunk(upload_id: str, chunk_index: int, upload, chunk_size: int | None = None,
+                      total_chunks: int | None = None, total_size: int | None = None,
+                      filename: str | None = None) -> dict:
+    """Write one chunk at its offset and return the session status.
+
+    The returned dict has claimed=True for exactly one caller once every chunk is
+    present; that caller must then call complete(). chunk_size may be omitted when
+    the session already exists or when this is not the final chunk (its own length
+    is used).
+    """
+    sdir = _session_dir(upload_id)
+    session = _load(sdir)
+    if session is None:
+        if total_chunks is None:
+            raise ValueError('total_chunks required for a new upload session')
+        if chunk_size is None:
+            size_hint = getattr(upload, 'size', None)
+            if size_hint is None or (chunk_index == total_chunks - 1 and total_chunks > 1):
+                raise ValueError('chunk_size required when the final chunk opens the session')
+            chunk_size = size_hint
+        session = open_session(upload_id, total_chunks, chunk_size, total_size, filename)
+    if session['state'] == 'done' or _finalizing(sdir, reclaim=True):
+        status = get_status(upload_id)
+        status['claimed'] = False
+        return status
+    n, size = session['total_chunks'], session['chunk_size']
+    if not 0 <= chunk_index < n:
+        raise ValueError(f'chunk_index must be in [0, {n})')
+    is_last = chunk_index == n - 1
+    expected = size
+    if is_last and session.get('total_size') is not None:
+        expected = session['total_size'] - size * (n - 1)
+    written = 0
+    with open(sdir / 'data.part', 'r+b') as out:
+        out.seek(chunk_index * size)
+        while True:
+            piece = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not piece:
+                break
+            written += len(piece)
+            if written > expected:
+                raise ValueError(f'chunk {chunk_index} exceeds {expected} bytes')
+            await asyncio.to_thread(out.write, piece)
+    if written != expected and not (is_last and session.get('total_size') is None and written > 0):
+        raise ValueError(f'chunk {chunk_index} has {written} bytes, expected {expected}')
+    if is_last and session.get('total_size') is None:
+        with open(sdir / 'last_chunk.len', 'w', encoding='utf-8') as f:
+            f.write(str(written))
+    with open(sdir / 'received.map', 'r+b') as f:
+        f.seek(chunk_index)
+        f.write(b'\x01')
+    status = get_status(upload_id)
+    status['claimed'] = status['received_chunks'] == n and _claim(sdir)
+    return status
+
+def _claim(sdir: Path) -> bool:
+    try:
+        fd = os.open(sdir / 'finalize.lock', os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({'pid': os.getpid(), 'claimed_at': time.time()}, f)
+    return True
+
+def _pid_alive(pid) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (OSError, TypeError, ValueError):
+        return True  # exists but not ours (EPERM), or unknown: let the timeout decide
+    return True
+
+def _lock_is_stale(lock: Path) -> bool:
+    try:
+        st = lock.stat()
+        owner = json.loads(lock.read_text(encoding='utf-8') or '{}')
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError):
+        owner = {}  # empty or partial: the claimer died between create and write
+    if time.time() - owner.get('claimed_at', st.st_mtime) > FINALIZE_TIMEOUT_SECONDS:
+        return True
+    return 'pid' in owner and not _pid_alive(owner['pid'])
+
+def _finalizing(sdir: Path, reclaim: bool = False) -> bool:
+    """True while a live finalizer holds the claim; with reclaim, a dead one's claim is dropped."""
+    lock = sdir / 'finalize.lock'
+    if not lock.exists():
+        return False
+    if not _lock_is_stale(lock):
+        return True
+    if not reclaim:
+        return False
+    if not (sdir / 'data.part').exists():
+        return True  # the dead finalizer already moved the file away; nothing left to finalize
+    try:
+        lock.unlink()
+    except FileNotFoundError:
+        pass
+    return False
+
+def purge_stale_locks(uploads_dir: Path | None = None) -> int:
+    """Drop finalize claims left by dead finalizers (startup); returns how many."""
+    uploads_dir = Path(uploads_dir or UPLOADS_DIR)
+    try:
+        sessions = [Path(de.path) for de in os.scandir(uploads_dir) if de.is_dir()]
+    except FileNotFoundError:
+        return 0
+    return sum(1 for sdir in sessions if (sdir / 'finalize.lock').exists() and not _finalizing(sdir, reclaim=True))
+
+def complete(upload_id: str, dest: Path, media_id: str) -> dict:
+    """Move the assembled file to dest and record the session as done (claimer only)."""
+    sdir = _session_dir(upload_id)
+    session = _load(sdir)
+    data = sdir / 'data.part'
+    if session.get('total_size') is None:
+        last_len = int((sdir / 'last_chunk.len').read_text(encoding='utf-8'))
+        session['total_size'] = session['chunk_size'] * (session['total_chunks'] - 1) + last_len
+        with open(data, 'r+b') as f:
+            f.truncate(session['total_size'])
+    os.replace(data, dest)
+    session.update(state='done', media_id=media_id, final_path=str(dest), completed_at=time.time())
+    write_json_atomic(sdir / 'session.json', session)
+    for name in ('received.map', 'last_chunk.len', 'finalize.lock'):
+        try:
+            (sdir / name).unlink()
+        except FileNotFoundError:
+            pass
+    return session
@@ -0,0 +1,93 @@
+"""Content-addressed transcript reuse.
+
+Maps the SHA-256 of uploaded bytes to media ids whose transcript was produced from
+those bytes. A repeated upload clones the stored artifacts (transcript, summary,
+embedding and BM25 indexes) instead of running Whisper again. The index lives in SQLite under
+storage/ so it survives restarts; entries whose transcript has been deleted are
+pruned lazily on lookup.
+"""
+import os, shutil, sqlite3, time
+from contextlib import closing
+from pathlib import Path
+from .storage_access import STORAGE, transcript_path, load_transcript
+from .embedding_service import EMB_DIR
+from . import lexical_index
+
+INDEX_PATH = STORAGE / 'content_index.sqlite3'
+
+def _connect():
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(INDEX_PATH), timeout=10)
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS content_index ('
+        ' sha256 TEXT NOT NULL, media_id TEXT NOT NULL, created_at REAL NOT NULL,'
+        ' PRIMARY KEY (sha256, media_id))'
+    )
+    return conn
+
+# Binary indexes are only ever (re)written to a temp file and renamed over the old one
+# (embedding_service.build_index, LexicalIndex.save), which gives the writer a new inode;
+# that is what makes sharing them by hard link safe. Keep it that way for any new writer.
+_LINKABLE = {'embeddings', 'lexical'}
+
+def _artifact_pairs(src_id: str, dst_id: str):
+    return [
+        ('transcript', transcript_path(src_id), transcript_path(dst_id)),
+        ('summary', STORAGE / f"{src_id}_summary.json", STORAGE / f"{dst_id}_summary.json"),
+        ('embeddings', EMB_DIR / f"{src_id}.index", EMB_DIR / f"{dst_id}.index"),
+        ('embeddings_meta', EMB_DIR / f"{src_id}.json", EMB_DIR / f"{dst_id}.json"),
+        ('lexical', lexical_index.index_path(src_id), lexical_index.index_path(dst_id)),
+    ]
+
+def _is_reusable(media_id: str) -> bool:
+    try:
+        data = load_transcript(media_id)
+    except Exception:
+        return False
+    return isinstance(data, dict) and 'error' not in data
+
+def lookup(sha256: str):
+    """Return a media id with a reusable transcript for these bytes, or None.
+
+    Stale entries (transcript deleted or unreadable) are removed as they are found.
+    """
+    with closing(_connect()) as conn, conn:
+        rows = conn.execute('SELECT media_id FROM content_index WHERE sha256=? ORDER BY created_at',
+                            (sha256,)).fetchall()
+        for (media_id,) in rows:
+            if _is_reusable(media_id):
+                return media_id
+            conn.execute('DELETE FROM content_index WHERE sha256=? AND media_id=?', (sha256, media_id))
+    return None
+
+def register(sha256: str, media_id: str):
+    """Record that media_id holds a finished transcript for content sha256."""
+    if not sha256:
+        return
+    with closing(_connect()) as conn, conn:
+        conn.execute('INSERT OR IGNORE INTO content_index (sha256, media_id, created_at) VALUES (?,?,?)',
+                     (sha256, media_id, time.time()))
+
+def _link_or_copy(src: Path, dst: Path):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def clone_artifacts(src_id: str, dst_id: str) -> dict:
+    """Give dst_id the artifacts of src_id; returns {kind: new_path} for what was cloned.
+
+    The small JSON artifacts are copied: some legacy writers rewrite them in place,
+    which through a shared inode would change the other item too. The binary indexes
+    are hard-linked when possible so no bytes are copied (see _LINKABLE).
+    """
+    cloned = {}
+    for kind, src, dst in _artifact_pairs(src_id, dst_id):
+        if not src.exists() or dst.exists():
+            continue
+        if kind in _LINKABLE:
+            _link_or_copy(src, dst)
+        else:
+            shutil.copyfile(src, dst)
+        cloned[kind] = dst
+    return cloned
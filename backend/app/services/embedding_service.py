@@ -1,12 +1,21 @@
-import os, json
+import os, json, hashlib
 import numpy as np
 from pathlib import Path
-from .storage_access import load_transcript
+from .storage_access import load_transcript, record_artifact, load_media_meta, write_json_atomic, transcript_hash
+from . import lexical_index
 
-try:
-    import faiss  # type: ignore
-except ImportError:  # Graceful degrade when faiss not available (e.g., Windows pip)
-    faiss = None  # type: ignore
+_faiss = None
+
+def _get_faiss():
+    """Import faiss on first use; None when unavailable (e.g., Windows pip)."""
+    global _faiss
+    if _faiss is None:
+        try:
+            import faiss  # type: ignore
+            _faiss = faiss
+        except ImportError:  # Graceful degrade
+            _faiss = False
+    return _faiss or None
 
 # Sentence-transformers real model (lazy load)
 _st_model = None
@@ -23,13 +32,16 @@ def _get_model():
     return _st_model
 
 EMB_DIR = Path('storage/embeddings')
-EMB_DIR.mkdir(parents=True, exist_ok=True)
+# Indexes are built by a background 'embed' job when the transcript is stored (0: on first search)
+EAGER = os.getenv('EMBED_EAGER', '1').lower() in ('1', 'true', 'yes')
+EMBED_PRIORITY = -20  # below refinement and first passes
 
 def _fallback_embed(texts):
     # Deterministic hash-based embedding fallback.
     vecs = []
     for t in texts:
-        rng = np.random.default_rng(abs(hash(t)) % (2**32))
+        # stable across processes (hash() is salted), so queue workers and the API agree
+        rng = np.random.default_rng(int.from_bytes(hashlib.blake2b(t.encode('utf-8'), digest_size=4).digest(), 'little'))
         vec = rng.normal(size=384).astype('float32')
         norm = np.linalg.norm(vec) + 1e-9
         vecs.append(vec / norm)
@@ -47,49 +59,123 @@ def _embed(texts):
     except Exception:
         return _fallback_embed(texts)
 
-def build_or_load_index(media_id: str):
+def _paths(media_id: str):
+    return EMB_DIR / f"{media_id}.index", EMB_DIR / f"{media_id}.json"
+
+def _index_meta(media_id: str):
+    idx_path, meta_path = _paths(media_id)
+    if not idx_path.exists() or not meta_path.exists():
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _is_current(media_id: str, entry: dict | None = None) -> bool:
+    entry = entry if entry is not None else (load_media_meta(media_id) or {})
+    if entry.get('segments') == 0:
+        return True  # nothing to embed
+    meta = _index_meta(media_id)
+    expected = entry.get('transcript_hash')
+    return meta is not None and (expected is None or meta.get('transcript_hash') == expected)
+
+def index_status(media_id: str) -> str:
+    """'ready' (index matches the stored transcript), 'building' or 'unavailable' (no FAISS).
+
+    Only reports: the build is queued by store_transcript, and jobs that were lost or
+    failed are queued again at startup (backfill), never by a search.
+    """
+    if _get_faiss() is None:
+        return 'unavailable'
+    if not EAGER:
+        return 'ready'  # built inline by the first search
+    return 'ready' if _is_current(media_id) else 'building'
+
+def backfill() -> int:
+    """Queue the build for finished items whose index is missing or stale; returns how many."""
+    if _get_faiss() is None or not EAGER:
+        return 0
+    from . import manifest
+    queued = 0
+    for media_id in manifest.ids(status='done'):
+        if not _is_current(media_id, manifest.get(media_id)) and enqueue(media_id):
+            queued += 1
+    return queued
+
+def enqueue(media_id: str) -> str | None:
+    """Queue the embedding stage for media_id on the background job workers (one active job per item)."""
+    if _get_faiss() is None or not EAGER:
+        return None
+    from . import job_queue
+    return job_queue.enqueue('embed', {'media_id': media_id}, priority=EMBED_PRIORITY, job_id=f"embed:{media_id}")
+
+def build_index(media_id: str) -> dict:
+    """Encode the transcript and write the FAISS index; a no-op when it already matches the transcript."""
+    faiss = _get_faiss()
     if faiss is None:
-        return None, None
-    idx_path = EMB_DIR / f"{media_id}.index"
-    meta_path = EMB_DIR / f"{media_id}.json"
-    if idx_path.exists() and meta_path.exists():
-        index = faiss.read_index(str(idx_path))
-        with open(meta_path,'r',encoding='utf-8') as f:
-            meta = json.load(f)
-        return index, meta
+        return {'skipped': 'faiss unavailable'}
     data = load_transcript(media_id)
-    if not data:
-        return None, None
-    segments = data.get('segments', [])
-    texts = [s.get('text','') for s in segments]
+    if not isinstance(data, dict) or 'error' in data:
+        return {'skipped': 'no transcript'}
+    digest = transcript_hash(data)
+    idx_path, meta_path = _paths(media_id)
+    meta = _index_meta(media_id)
+    if meta is not None and meta.get('transcript_hash') == digest:
+        _ensure_library_vector(media_id, idx_path)  # e.g. cloned by dedup together with the transcript
+        return {'skipped': 'up to date'}
+    texts = [s.get('text','') for s in data.get('segments', [])]
     if not texts:
-        return None, None
+        return {'skipped': 'no segments'}
     embeddings = _embed(texts)
+    EMB_DIR.mkdir(parents=True, exist_ok=True)
     index = faiss.IndexFlatIP(embeddings.shape[1])
     index.add(embeddings)
-    faiss.write_index(index, str(idx_path))
-    with open(meta_path,'w',encoding='utf-8') as f:
-        json.dump({'count': len(texts)}, f)
-    return index, {'count': len(texts)}
+    tmp = idx_path.with_name(idx_path.name + '.tmp')
+    faiss.write_index(index, str(tmp))
+    os.replace(tmp, idx_path)  # readers never load a partial index
+    write_json_atomic(meta_path, {'count': len(texts), 'transcript_hash': digest})
+    record_artifact(media_id, 'embeddings', idx_path)
+    from .library_search import set_media_vector  # the library's aggregated vector for this media
+    set_media_vector(media_id, embeddings)
+    return {'segments': len(texts)}
 
-def search_embeddings(media_id: str, query: str, top_k: int = 5):
+def _ensure_library_vector(media_id: str, idx_path: Path):
+    from . import library_search
+    if library_search.is_indexed(media_id) and not library_search.has_vector(media_id):
+        index = _get_faiss().read_index(str(idx_path))
+        library_search.set_media_vector(media_id, index.reconstruct_n(0, index.ntotal))
+
+def build_or_load_index(media_id: str):
+    """Load the index; built inline only when EMBED_EAGER=0 (otherwise the embed job builds it)."""
+    faiss = _get_faiss()
     if faiss is None:
+        return None, None
+    idx_path, _ = _paths(media_id)
+    meta = _index_meta(media_id)
+    if meta is None and not EAGER:
+        build_index(media_id)
+        meta = _index_meta(media_id)
+    if meta is None:
+        return None, None
+    return faiss.read_index(str(idx_path)), meta
+
+def search_embeddings(media_id: str, query: str, top_k: int = 5):
+    if _get_faiss() is None:
         return None  # triggers BM25 fallback upstream
     index, meta = build_or_load_index(media_id)
     if not index:
         return None
     q_vec = _embed([query])
     sims, ids = index.search(q_vec, top_k)
-    data = load_transcript(media_id)
-    segs = data.get('segments', []) if data else []
+    segs = lexical_index.get(media_id)  # segment texts and starts without parsing the transcript
     results = []
     for i, score in zip(ids[0], sims[0]):
-        if i < 0 or i >= len(segs):
+        if segs is None or i < 0 or i >= len(segs):
             continue
-        seg = segs[i]
         results.append({
-            'text': seg.get('text',''),
-            'timestamp': seg.get('start'),
+            'text': segs.texts[i],
+            'timestamp': float(segs.starts[i]),
             'score': float(score)
         })
-    return results
\ No newline at end of file
+    return results
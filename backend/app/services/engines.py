@@ -0,0 +1,186 @@
+"""Transcription engines behind one interface.
+
+Upload transcription (whisper_service), the long-media worker processes, realtime
+capture and the legacy helpers talk to a TranscriptionEngine instead of calling
+openai-whisper directly. An engine offers:
+
+- transcribe_pcm(audio): 16 kHz mono samples -> {'language', 'text', 'segments'}
+- transcribe_file(path): same for a media file
+- stream(): an incremental decoder (feed PCM, read partials, finish)
+- capabilities(): flags such as word timestamps and language detection
+
+TRANSCRIBE_ENGINE selects the engine ('whisper' by default, 'stub', or a
+'package.module:Class' path). The stub engine is deterministic and needs no model
+weights: it sleeps STUB_ENGINE_LATENCY seconds per second of audio, so the whole
+pipeline can be load-tested and benchmarked offline.
+"""
+import importlib, os, threading, time
+import numpy as np
+from . import model_registry, audio_cache
+
+SAMPLE_RATE = 16000
+ENGINE = os.getenv('TRANSCRIBE_ENGINE', 'whisper').lower()
+STUB_LATENCY = float(os.getenv('STUB_ENGINE_LATENCY', '0.05'))  # wall seconds per audio second
+STUB_SEGMENT_SECONDS = float(os.getenv('STUB_ENGINE_SEGMENT_SECONDS', '5'))
+STUB_LANGUAGE = os.getenv('STUB_ENGINE_LANGUAGE', 'en')
+
+
+class StreamingDecoder:
+    """Incremental decode on top of transcribe_pcm: feed audio, ask for partials.
+
+    This generic version re-decodes the buffered audio on every partial(); engines
+    with native streaming can return their own decoder from stream().
+    """
+
+    def __init__(self, engine, model_size: str | None = None, language: str | None = None):
+        self.engine = engine
+        self.model_size = model_size
+        self.language = language
+        self._chunks = []
+        self.samples = 0
+
+    def feed(self, pcm: np.ndarray):
+        self._chunks.append(np.asarray(pcm))
+        self.samples += len(pcm)
+
+    def audio(self) -> np.ndarray:
+        if len(self._chunks) > 1:
+            self._chunks = [np.concatenate(self._chunks)]
+        return self._chunks[0] if self._chunks else np.zeros(0, dtype=np.float32)
+
+    def partial(self) -> dict:
+        result = self.engine.transcribe_pcm(self.audio(), model_size=self.model_size, language=self.language)
+        self.language = self.language or result.get('language')
+        return result
+
+    def finish(self) -> dict:
+        return self.partial()
+
+
+class TranscriptionEngine:
+    name = 'base'
+    word_timestamps = False
+    language_detect = False
+    native_streaming = False
+
+    def capabilities(self) -> dict:
+        return {'name': self.name, 'word_timestamps': self.word_timestamps, 'language_detect': self.language_detect,
+                'native_streaming': self.native_streaming, 'pcm': True, 'file': True}
+
+    def available(self, model_size: str | None = None) -> bool:
+        return True
+
+    def transcribe_pcm(self, audio: np.ndarray, model_size: str | None = None, language: str | None = None,
+                       initial_prompt: str | None = None, word_timestamps: bool = False) -> dict:
+        raise NotImplementedError
+
+    def transcribe_file(self, path: str, model_size: str | None = None, language: str | None = None,
+                        word_timestamps: bool = False) -> dict:
+        return self.transcribe_pcm(audio_cache.decode(str(path)), model_size=model_size, language=language,
+                                   word_timestamps=word_timestamps)
+
+    def stream(self, model_size: str | None = None, language: str | None = None) -> StreamingDecoder:
+        return StreamingDecoder(self, model_size=model_size, language=language)
+
+
+def _segments(result: dict, word_timestamps: bool = False) -> list:
+    segments = []
+    for seg in result.get('segments', []):
+        item = {'start': seg.get('start'), 'end': seg.get('end'), 'text': seg.get('text')}
+        if word_timestamps and seg.get('words') is not None:
+            item['words'] = [{'start': w.get('start'), 'end': w.get('end'), 'word': w.get('word')} for w in seg['words']]
+        segments.append(item)
+    return segments
+
+
+class WhisperEngine(TranscriptionEngine):
+    """openai-whisper through the model registry (slot-bounded replicas)."""
+    name = 'whisper'
+    word_timestamps = True
+    language_detect = True
+
+    def available(self, model_size: str | None = None) -> bool:
+        return model_registry.get(model_size) is not None
+
+    def _run(self, source, model_size, **options):
+        with model_registry.acquire(model_size) as model:
+            if model is None:
+                raise RuntimeError('whisper is not installed')
+            result = model.transcribe(source, verbose=False, **{k: v for k, v in options.items() if v})
+        return {'language': result.get('language'), 'text': result.get('text'),
+                'segments': _segments(result, options.get('word_timestamps'))}
+
+    def transcribe_pcm(self, audio, model_size=None, language=None, initial_prompt=None, word_timestamps=False):
+        return self._run(audio_cache.to_float32(audio), model_size, language=language,
+                         initial_prompt=initial_prompt, word_timestamps=word_timestamps)
+
+    def transcribe_file(self, path, model_size=None, language=None, word_timestamps=False):
+        return self._run(str(path), model_size, language=language, word_timestamps=word_timestamps)
+
+
+_WORDS = ('alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel',
+          'india', 'juliet', 'kilo', 'lima', 'mike', 'november', 'oscar', 'papa')
+
+class StubEngine(TranscriptionEngine):
+    """Deterministic stand-in: fixed-length segments, latency proportional to audio length.
+
+    Text depends only on the samples, so identical audio gives identical output.
+    Concurrency is bounded like the Whisper engine (WHISPER_INFERENCE_SLOTS).
+    """
+    name = 'stub'
+    word_timestamps = True
+
+    def __init__(self, latency: float = STUB_LATENCY, segment_seconds: float = STUB_SEGMENT_SECONDS,
+                 language: str = STUB_LANGUAGE):
+        self.latency = latency
+        self.segment_seconds = segment_seconds
+        self.language = language
+        self._slots = threading.BoundedSemaphore(model_registry.INFERENCE_SLOTS)
+
+    def transcribe_pcm(self, audio, model_size=None, language=None, initial_prompt=None, word_timestamps=False):
+        audio = np.asarray(audio)
+        duration = len(audio) / SAMPLE_RATE
+        with self._slots:
+            time.sleep(self.latency * duration)
+            step = max(int(self.segment_seconds * SAMPLE_RATE), 1)
+            segments = []
+            for a in range(0, len(audio), step):
+                piece = audio_cache.to_float32(audio[a:a + step])
+                level = int(np.sqrt(np.mean(np.square(piece, dtype=np.float64))) * 1000) if len(piece) else 0
+                words = [_WORDS[(level + a // step + k) % len(_WORDS)] for k in range(3)]
+                start, end = a / SAMPLE_RATE, min(a + step, len(audio)) / SAMPLE_RATE
+                seg = {'start': start, 'end': end, 'text': ' ' + ' '.join(words)}
+                if word_timestamps:
+                    w = (end - start) / len(words)
+                    seg['words'] = [{'start': start + i * w, 'end': start + (i + 1) * w, 'word': ' ' + word}
+                                    for i, word in enumerate(words)]
+                segments.append(seg)
+        return {'language': language or self.language, 'text': ''.join(s['text'] for s in segments),
+                'segments': segments}
+
+
+ENGINES = {'whisper': WhisperEngine, 'stub': StubEngine}
+
+_lock = threading.Lock()
+_instances: dict = {}
+
+def register(name: str, factory):
+    """Add an engine: a TranscriptionEngine subclass/factory or a 'package.module:Class' path."""
+    ENGINES[name] = factory
+
+def get_engine(name: str | None = None) -> TranscriptionEngine:
+    """The configured engine instance (one per name per process)."""
+    name = (name or ENGINE).lower()
+    engine = _instances.get(name)
+    if engine is not None:
+        return engine
+    with _lock:
+        if name not in _instances:
+            factory = ENGINES.get(name, name)
+            if isinstance(factory, str):
+                if ':' not in factory:
+                    raise LookupError(f'Unknown transcription engine {name!r}')
+                module, _, attr = factory.partition(':')
+                factory = getattr(importlib.import_module(module), attr)
+            _instances[name] = factory()
+        return _instances[name]
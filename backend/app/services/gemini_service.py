@@ -1,7 +1,7 @@
 import httpx, os, json, re
 from typing import List, Dict
 from app.core.config import get_settings
-from .storage_access import load_transcript
+from .storage_access import load_transcript, write_json_atomic, record_artifact
 from pathlib import Path
 
 CACHE_DIR = Path('storage')
@@ -146,8 +146,8 @@ async def get_summary(media_id: str):
         return {'error': 'Transcript not found'}
     result = await call_gemini_summarize(data.get('text',''))
     try:
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2)
+        write_json_atomic(cache_file, result, indent=2)
+        record_artifact(media_id, 'summary', cache_file)
     except Exception:
         pass
     return result
@@ -0,0 +1,320 @@
+"""Durable local job queue.
+
+Jobs live in storage/jobs.sqlite3 (WAL, one connection per thread) so queued and
+in-flight work survives restarts. Workers claim the highest-priority due job under a
+lease; a worker that dies mid-job simply lets its lease expire and the job is picked
+up again. Failed attempts are retried with exponential backoff until max_attempts.
+
+Workers run either in-process (a small thread pool started from the app lifespan,
+JOB_WORKERS) or as a separate process: `python -m app.worker`. With JOB_BACKEND=celery
+jobs are still recorded here (status API, retries) but dispatched to Celery; when the
+broker cannot be reached they stay with the local workers.
+
+Handlers are referenced by dotted path and imported on first use, so the queue does not
+pull in Whisper or the routers. A handler is called as handler(payload, job) and
+signals failure by raising. Async handlers run their coroutine through run_async(),
+which keeps one event loop per worker thread instead of building one per job.
+"""
+import asyncio, importlib, json, os, socket, sqlite3, threading, time, uuid
+from pathlib import Path
+
+STORAGE = Path('storage')
+JOBS_PATH = STORAGE / 'jobs.sqlite3'
+
+BACKEND = os.getenv('JOB_BACKEND', 'local').lower()
+WORKERS = int(os.getenv('JOB_WORKERS', '1'))
+LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '300'))
+MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+RETRY_BASE_SECONDS = float(os.getenv('JOB_RETRY_BASE_SECONDS', '5'))
+RETRY_MAX_SECONDS = float(os.getenv('JOB_RETRY_MAX_SECONDS', '600'))
+POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '2'))
+
+HANDLERS = {
+    'transcribe': 'app.services.media_pipeline:transcribe_job',
+    'refine': 'app.services.media_pipeline:refine_job',
+    'embed': 'app.services.media_pipeline:embed_job',
+    'transcribe_db': 'app.services.tasks:transcribe_db_job',
+}
+
+ACTIVE = ('queued', 'running')
+
+_local = threading.local()
+_wake = threading.Event()
+_pool = None
+_pool_lock = threading.Lock()
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and getattr(_local, 'path', None) == JOBS_PATH:
+        return conn
+    JOBS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(JOBS_PATH), timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS jobs ('
+        ' id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT, priority INTEGER DEFAULT 0,'
+        ' status TEXT NOT NULL, attempts INTEGER DEFAULT 0, max_attempts INTEGER,'
+        ' run_after REAL, lease_owner TEXT, lease_expires REAL, backend TEXT,'
+        ' result TEXT, error TEXT, created_at REAL, updated_at REAL, finished_at REAL)'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, priority, run_after)')
+    _local.conn, _local.path = conn, JOBS_PATH
+    return conn
+
+def _row_to_dict(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job['payload'] = json.loads(job['payload'] or '{}')
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+def register(kind: str, target: str):
+    """Map a job kind to a handler given as 'package.module:function'."""
+    HANDLERS[kind] = target
+
+def _handler(kind: str):
+    target = HANDLERS.get(kind)
+    if not target:
+        raise LookupError(f'No handler registered for job kind {kind!r}')
+    module, _, attr = target.partition(':')
+    return getattr(importlib.import_module(module), attr)
+
+def backoff(attempts: int) -> float:
+    """Delay before the next try after `attempts` failed attempts."""
+    return min(RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), RETRY_MAX_SECONDS)
+
+def get(job_id: str):
+    """Return the job as a dict or None."""
+    row = _conn().execute('SELECT * FROM jobs WHERE id=?', (job_id,)).fetchone()
+    return _row_to_dict(row) if row else None
+
+def list_jobs(status: str | None = None, kind: str | None = None, limit: int = 50) -> list:
+    sql, args = 'SELECT * FROM jobs WHERE 1=1', []
+    if status:
+        sql += ' AND status=?'; args.append(status)
+    if kind:
+        sql += ' AND kind=?'; args.append(kind)
+    sql += ' ORDER BY created_at DESC LIMIT ?'
+    args.append(int(limit))
+    return [_row_to_dict(r) for r in _conn().execute(sql, args)]
+
+def counts() -> dict:
+    return {r['status']: r['n'] for r in _conn().execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status')}
+
+def enqueue(kind: str, payload: dict, priority: int = 0, job_id: str | None = None,
+            max_attempts: int | None = None, delay: float = 0.0) -> str:
+    """Add a job and return its id.
+
+    Enqueueing an id that is already queued or running is a no-op, so callers can use
+    deterministic ids (e.g. 'transcribe:<media_id>') to avoid duplicate work; a finished
+    or failed job with that id is reset and run again.
+    """
+    job_id = job_id or uuid.uuid4().hex
+    now = time.time()
+    backend = 'celery' if BACKEND == 'celery' else 'local'
+    conn = _conn()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute('SELECT status FROM jobs WHERE id=?', (job_id,)).fetchone()
+        if row is not None and row['status'] in ACTIVE:
+            conn.execute('COMMIT')
+            return job_id
+        conn.execute(
+            'INSERT OR REPLACE INTO jobs (id, kind, payload, priority, status, attempts, max_attempts, run_after,'
+            ' backend, created_at, updated_at) VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?)',
+            (job_id, kind, json.dumps(payload), int(priority), 'queued', int(max_attempts or MAX_ATTEMPTS),
+             now + delay, backend, now, now))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    if backend == 'celery':
+        _dispatch_celery(job_id, priority, delay)
+    _wake.set()
+    return job_id
+
+def _dispatch_celery(job_id: str, priority: int = 0, countdown: float = 0.0):
+    try:
+        from app.services.tasks import run_job  # celery imported on demand
+        run_job.apply_async((job_id,), countdown=countdown or None, priority=priority)
+    except Exception:  # broker down / celery missing: local workers take it
+        _conn().execute("UPDATE jobs SET backend='local', updated_at=? WHERE id=?", (time.time(), job_id))
+        _wake.set()
+
+def claim(worker_id: str, job_id: str | None = None, lease_seconds: float | None = None):
+    """Lease the next due job (or a specific one) to worker_id; None when nothing is due.
+
+    Jobs whose lease expired are claimable again; ones that already used their last
+    attempt are marked failed instead.
+    """
+    now = time.time()
+    lease = lease_seconds or LEASE_SECONDS
+    conn = _conn()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute("UPDATE jobs SET status='failed', error='lease expired', finished_at=?, updated_at=?"
+                     " WHERE status='running' AND lease_expires<? AND attempts>=max_attempts", (now, now, now))
+        due = "((status='queued' AND run_after<=?) OR (status='running' AND lease_expires<?))"
+        if job_id is None:
+            row = conn.execute(f"SELECT id FROM jobs WHERE backend='local' AND {due}"
+                               ' ORDER BY priority DESC, run_after, created_at LIMIT 1', (now, now)).fetchone()
+        else:
+            row = conn.execute(f'SELECT id FROM jobs WHERE id=? AND {due}', (job_id, now, now)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE jobs SET status='running', attempts=attempts+1, lease_owner=?, lease_expires=?,"
+                         ' updated_at=? WHERE id=?', (worker_id, now + lease, now, row['id']))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return get(row['id']) if row is not None else None
+
+def heartbeat(job_id: str, worker_id: str, lease_seconds: float | None = None) -> bool:
+    """Extend the lease; False if the worker no longer owns the job."""
+    now = time.time()
+    cur = _conn().execute("UPDATE jobs SET lease_expires=?, updated_at=? WHERE id=? AND lease_owner=? AND status='running'",
+                          (now + (lease_seconds or LEASE_SECONDS), now, job_id, worker_id))
+    return cur.rowcount == 1
+
+def complete(job_id: str, worker_id: str, result=None):
+    now = time.time()
+    _conn().execute("UPDATE jobs SET status='done', result=?, error=NULL, lease_expires=NULL, finished_at=?, updated_at=?"
+                    " WHERE id=? AND lease_owner=? AND status='running'",
+                    (json.dumps(result) if result is not None else None, now, now, job_id, worker_id))
+
+def fail(job_id: str, worker_id: str, error: str) -> str:
+    """Record a failed attempt; requeue with backoff or mark failed. Returns the new status."""
+    now = time.time()
+    conn = _conn()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute('SELECT attempts, max_attempts, backend, priority FROM jobs WHERE id=? AND lease_owner=?'
+                           " AND status='running'", (job_id, worker_id)).fetchone()
+        if row is None:
+            status = 'lost'
+        elif row['attempts'] < row['max_attempts']:
+            status, delay = 'queued', backoff(row['attempts'])
+            conn.execute("UPDATE jobs SET status='queued', error=?, run_after=?, lease_owner=NULL, lease_expires=NULL,"
+                         ' updated_at=? WHERE id=?', (error, now + delay, now, job_id))
+        else:
+            status = 'failed'
+            conn.execute("UPDATE jobs SET status='failed', error=?, lease_expires=NULL, finished_at=?, updated_at=?"
+                         ' WHERE id=?', (error, now, now, job_id))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    if status == 'queued' and row['backend'] == 'celery':
+        _dispatch_celery(job_id, row['priority'], delay)
+    return status
+
+def run_async(coro):
+    """Run a coroutine to completion on the calling thread's event loop (created once and reused)."""
+    loop = getattr(_local, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = _local.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(coro)
+
+def _close_loop():
+    loop = getattr(_local, 'loop', None)
+    if loop is not None and not loop.is_closed():
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+    _local.loop = None
+
+def execute(job: dict, worker_id: str) -> str:
+    """Run a claimed job, keeping its lease alive, and record the outcome."""
+    stop = threading.Event()
+
+    def _beat():
+        while not stop.wait(LEASE_SECONDS / 3):
+            if not heartbeat(job['id'], worker_id):
+                return
+
+    beat = threading.Thread(target=_beat, name=f"lease-{job['id']}", daemon=True)
+    beat.start()
+    try:
+        result = _handler(job['kind'])(job['payload'], job)
+    except Exception as e:
+        return fail(job['id'], worker_id, f'{type(e).__name__}: {e}')
+    finally:
+        stop.set()
+    complete(job['id'], worker_id, result)
+    return 'done'
+
+def run_job(job_id: str, worker_id: str | None = None):
+    """Claim and run one specific job (used by the Celery task); None if it is not due."""
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+    job = claim(worker_id, job_id=job_id)
+    return execute(job, worker_id) if job else None
+
+def drain(worker_id: str = 'drain', limit: int | None = None) -> int:
+    """Run due jobs in the calling thread until none are left; returns how many ran."""
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim(worker_id)
+        if job is None:
+            break
+        execute(job, worker_id)
+        ran += 1
+    return ran
+
+
+class WorkerPool:
+    """Threads that poll the queue; woken immediately by local enqueues."""
+
+    def __init__(self, workers: int = WORKERS, poll_seconds: float = POLL_SECONDS):
+        self.workers = max(int(workers), 0)
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._threads = []
+        self._prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+    def _loop(self, worker_id: str):
+        try:
+            while not self._stop.is_set():
+                try:
+                    job = claim(worker_id)
+                except sqlite3.Error:
+                    job = None
+                if job is None:
+                    _wake.wait(self.poll_seconds)
+                    _wake.clear()
+                    continue
+                try:
+                    execute(job, worker_id)
+                except Exception as e:  # e.g. complete()/fail() hit "database is locked"
+                    # the lease expires and the job is delivered again; the worker keeps going
+                    print(f"[jobs] {worker_id}: recording job {job['id']} failed: {type(e).__name__}: {e}")  # noqa: T201
+        finally:
+            _close_loop()
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, args=(f'{self._prefix}:{i}',), name=f'job-worker-{i}', daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout: float | None = None):
+        self._stop.set()
+        _wake.set()
+        for t in self._threads:
+            t.join(timeout)
+
+
+def start_workers(workers: int | None = None):
+    """Start the in-process pool once (JOB_WORKERS=0 leaves jobs to `python -m app.worker`)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool(WORKERS if workers is None else workers).start()
+        return _pool
+
+def stop_workers(timeout: float | None = 5):
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.stop(timeout)
@@ -0,0 +1,200 @@
+"""Persistent BM25 inverted index per media item.
+
+Built once when the transcript is written (media_pipeline.store_transcript) and
+stored as storage/lexical/<media_id>.npz: a vocabulary, postings (segment id + term
+frequency per term, CSR layout), the per-segment length normalisation and the
+precomputed IDF, plus the segment start times and texts so a query never opens the
+transcript JSON. Loaded indexes are kept in a small in-process LRU.
+
+A query scores only the postings of its terms (vectorized NumPy) and takes the top k
+with argpartition. Scores equal rank_bm25.BM25Okapi (k1=1.5, b=0.75, epsilon=0.25)
+over the same tokens; tokens are lowercased word characters, so "Budget," matches
+"budget".
+"""
+import os, re, tempfile, threading
+from collections import OrderedDict
+from typing import Dict, List
+import numpy as np
+from .storage_access import STORAGE, load_transcript, record_artifact, transcript_path
+
+LEX_DIR = STORAGE / 'lexical'
+K1, B, EPSILON = 1.5, 0.75, 0.25
+CACHE_ITEMS = int(os.getenv('LEXICAL_CACHE_ITEMS', '64'))
+
+_TOKEN = re.compile(r'\w+')
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall((text or '').lower())
+
+def index_path(media_id: str):
+    return LEX_DIR / f"{media_id}.npz"
+
+
+def _pack_strings(items: List[str]):
+    """utf-8 blob + offsets: far smaller than a fixed-width unicode array."""
+    encoded = [s.encode('utf-8') for s in items]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+def _unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    return [data[a:b].decode('utf-8') for a, b in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+class LexicalIndex:
+    """BM25 postings over a list of documents (transcript segments)."""
+
+    def __init__(self, terms: List[str], offsets: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray,
+                 idf: np.ndarray, norm: np.ndarray, starts: np.ndarray, texts: List[str]):
+        self.terms = {t: i for i, t in enumerate(terms)}
+        self.offsets = offsets  # postings of term i: doc_ids/tfs[offsets[i]:offsets[i+1]]
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.idf = idf
+        self.norm = norm  # K1 * (1 - B + B * doc_len / avgdl), per document
+        self.starts = starts
+        self.texts = texts
+
+    def __len__(self):
+        return len(self.norm)
+
+    @classmethod
+    def build(cls, texts: List[str], starts=None) -> 'LexicalIndex':
+        n = len(texts)
+        term_ids: Dict[str, int] = {}
+        rows, cols = [], []
+        doc_len = np.zeros(n, dtype=np.float64)
+        for d, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_len[d] = len(tokens)
+            for tok in tokens:
+                cols.append(term_ids.setdefault(tok, len(term_ids)))
+                rows.append(d)
+        terms = sorted(term_ids, key=term_ids.get)
+        # (term, doc) pairs -> postings with term frequencies, grouped by term
+        pairs = np.array(cols, dtype=np.int64) * max(n, 1) + np.array(rows, dtype=np.int64)
+        keys, tf = np.unique(pairs, return_counts=True)
+        post_terms, doc_ids = np.divmod(keys, max(n, 1))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(post_terms, minlength=len(terms)), out=offsets[1:])
+        df = np.diff(offsets).astype(np.float64)
+        idf = np.log(n - df + 0.5) - np.log(df + 0.5)
+        if len(idf):
+            idf[idf < 0] = EPSILON * idf.mean()  # BM25Okapi's floor for terms in most documents
+        avgdl = doc_len.mean() if n and doc_len.sum() else 1.0
+        norm = K1 * (1 - B + B * doc_len / avgdl)
+        return cls(terms, offsets, doc_ids.astype(np.uint32), np.minimum(tf, 0xFFFF).astype(np.uint16),
+                   idf.astype(np.float32), norm.astype(np.float32),
+                   np.asarray(starts if starts is not None else np.zeros(n), dtype=np.float64), list(texts))
+
+    @classmethod
+    def from_segments(cls, segments: List[dict]) -> 'LexicalIndex':
+        return cls.build([s.get('text', '') or '' for s in segments], [s.get('start') or 0.0 for s in segments])
+
+    def save(self, path):
+        """Atomic write (temp file + replace) so readers never see a partial index."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        terms_blob, term_offsets = _pack_strings(sorted(self.terms, key=self.terms.get))
+        texts_blob, text_offsets = _pack_strings(self.texts)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.npz.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, terms=terms_blob, term_offsets=term_offsets, offsets=self.offsets, doc_ids=self.doc_ids,
+                         tfs=self.tfs, idf=self.idf, norm=self.norm, starts=self.starts, texts=texts_blob,
+                         text_offsets=text_offsets)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path) -> 'LexicalIndex':
+        with np.load(path, allow_pickle=False) as z:
+            return cls(_unpack_strings(z['terms'], z['term_offsets']), z['offsets'], z['doc_ids'], z['tfs'],
+                       z['idf'], z['norm'], z['starts'], _unpack_strings(z['texts'], z['text_offsets']))
+
+    def _score(self, tokens: List[str]):
+        scores = np.zeros(len(self), dtype=np.float32)
+        matched = np.zeros(len(self), dtype=bool)
+        for tok in tokens:  # a repeated query term counts again, as in BM25Okapi
+            t = self.terms.get(tok)
+            if t is None:
+                continue
+            a, b = self.offsets[t], self.offsets[t + 1]
+            docs = self.doc_ids[a:b]
+            tf = self.tfs[a:b].astype(np.float32)
+            scores[docs] += self.idf[t] * tf * (K1 + 1) / (tf + self.norm[docs])
+            matched[docs] = True
+        return scores, matched
+
+    def scores(self, tokens: List[str]) -> np.ndarray:
+        """BM25 score of every document; only the postings of the query terms are touched."""
+        return self._score(tokens)[0]
+
+    def top_k(self, query: str, k: int = 5):
+        """[(doc, score)] of the k best documents containing a query term, best first."""
+        scores, matched = self._score(tokenize(query))
+        hits = np.flatnonzero(matched)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind='stable')]
+        return [(int(d), float(scores[d])) for d in hits]
+
+    def search(self, query: str, k: int = 5) -> List[dict]:
+        return [{'text': self.texts[d], 'timestamp': float(self.starts[d]), 'score': score}
+                for d, score in self.top_k(query, k)]
+
+
+_cache: 'OrderedDict[str, tuple]' = OrderedDict()
+_lock = threading.Lock()
+
+def build(media_id: str, segments: List[dict]) -> LexicalIndex:
+    """(Re)build and persist the index for a transcript; registered as the 'lexical' artifact."""
+    index = LexicalIndex.from_segments(segments)
+    path = index_path(media_id)
+    index.save(path)
+    record_artifact(media_id, 'lexical', path)
+    with _lock:
+        _cache.pop(media_id, None)
+    return index
+
+def _mtime(path):
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def get(media_id: str):
+    """Cached index for media_id, (re)built when missing or older than the transcript. None without one."""
+    path = index_path(media_id)
+    mtime = _mtime(path)
+    written = _mtime(transcript_path(media_id))
+    if mtime is not None and written is not None and written > mtime:
+        mtime = None  # transcript rewritten outside store_transcript (legacy routes)
+    with _lock:
+        hit = _cache.get(media_id)
+        if hit and mtime is not None and hit[0] == mtime:
+            _cache.move_to_end(media_id)
+            return hit[1]
+    if mtime is None:
+        data = load_transcript(media_id)
+        if not isinstance(data, dict) or 'error' in data:
+            return None
+        index = build(media_id, data.get('segments') or [])
+        mtime = _mtime(path)
+    else:
+        index = LexicalIndex.load(path)
+    with _lock:
+        _cache[media_id] = (mtime, index)
+        _cache.move_to_end(media_id)
+        while len(_cache) > CACHE_ITEMS:
+            _cache.popitem(last=False)
+    return index
+
+def search(media_id: str, query: str, k: int = 5) -> List[dict]:
+    index = get(media_id)
+    return index.search(query, k) if index is not None else []
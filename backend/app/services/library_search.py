@@ -0,0 +1,279 @@
+"""Library-wide search across every media item.
+
+Lexical: segments are spread over LIBRARY_SHARDS SQLite FTS5 databases
+(storage/search/shard_XX.sqlite3, shard = hash of the media id). A query runs on all
+shards in parallel threads (SQLite releases the GIL), each returning its best
+offset+limit+1 hits by FTS5 bm25, and the shard lists are merged. Filters (language,
+created date, user) are columns of the per-shard `media` table joined to the hits.
+user_id scopes results to one user's media (None: anonymous media only); only
+ANY_USER, for internal callers, searches every user.
+BM25 statistics are per shard; with hash sharding they converge on the global ones.
+
+Vector: an aggregated index with one vector per media item (the normalized mean of
+its segment embeddings, stored beside the lexical rows). A semantic query ranks
+media by that vector, then searches the segments of the best LIBRARY_VECTOR_MEDIA
+items with their per-media embedding index. Media without embeddings yet are
+found by the lexical side only. Hybrid mode fuses both rankings (reciprocal rank).
+
+Items are indexed when their transcript is stored; items transcribed before the
+index existed are added by the warm-up backfill.
+"""
+import hashlib, os, sqlite3, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+from .storage_access import STORAGE, load_transcript, transcript_hash
+from . import lexical_index
+
+SEARCH_DIR = STORAGE / 'search'
+SHARDS = max(1, int(os.getenv('LIBRARY_SHARDS', '8')))
+THREADS = max(1, int(os.getenv('LIBRARY_SEARCH_THREADS', '4')))
+MAX_DEPTH = int(os.getenv('LIBRARY_SEARCH_MAX_DEPTH', '1000'))  # offset + limit
+VECTOR_MEDIA = int(os.getenv('LIBRARY_VECTOR_MEDIA', '20'))
+MODES = ('hybrid', 'lexical', 'semantic')
+ANY_USER = object()  # user_id value that does not scope by user (internal callers only)
+RRF_K = 60
+
+_local = threading.local()
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+_vectors: Dict[tuple, tuple] = {}  # (shard, dim) -> (version, arrays) of the aggregated media vectors
+_vectors_lock = threading.Lock()
+
+
+def shard_of(media_id: str) -> int:
+    return int(hashlib.sha1(media_id.encode('utf-8')).hexdigest()[:8], 16) % SHARDS
+
+def _path(shard: int):
+    return SEARCH_DIR / f"shard_{shard:02d}.sqlite3"
+
+def _conn(shard: int) -> sqlite3.Connection:
+    """One connection per thread and shard (WAL, like the manifest)."""
+    conns = getattr(_local, 'conns', None)
+    if conns is None or getattr(_local, 'dir', None) != SEARCH_DIR:
+        conns = _local.conns = {}
+        _local.dir = SEARCH_DIR
+    conn = conns.get(shard)
+    if conn is not None:
+        return conn
+    SEARCH_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(_path(shard)), timeout=10, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS media ('
+        ' media_id TEXT PRIMARY KEY, filename TEXT, language TEXT, created_at REAL, user_id TEXT,'
+        ' transcript_hash TEXT, indexed_at REAL, vector BLOB)'
+    )
+    conn.execute('CREATE TABLE IF NOT EXISTS segments (id INTEGER PRIMARY KEY, media_id TEXT NOT NULL, start REAL, "end" REAL)')
+    conn.execute('CREATE INDEX IF NOT EXISTS segments_media ON segments (media_id)')
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(text, tokenize='unicode61')")
+    conn.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER)')
+    conns[shard] = conn
+    return conn
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix='library-search')
+        return _pool
+
+def _bump_version(conn: sqlite3.Connection):
+    conn.execute("INSERT INTO state (key, value) VALUES ('version', 1) "
+                 "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+
+
+def index_media(media_id: str, data: dict, meta: dict | None = None) -> bool:
+    """Add or replace a transcript's segments; a no-op when the same transcript is already indexed."""
+    if not isinstance(data, dict) or 'error' in data:
+        return False
+    meta = meta or {}
+    digest = transcript_hash(data)
+    conn = _conn(shard_of(media_id))
+    row = conn.execute('SELECT transcript_hash FROM media WHERE media_id=?', (media_id,)).fetchone()
+    if row and row[0] == digest:
+        return False
+    segments = data.get('segments') or []
+    user_id = meta.get('user_id')
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DELETE FROM segments_fts WHERE rowid IN (SELECT id FROM segments WHERE media_id=?)', (media_id,))
+        conn.execute('DELETE FROM segments WHERE media_id=?', (media_id,))
+        for s in segments:
+            cur = conn.execute('INSERT INTO segments (media_id, start, "end") VALUES (?,?,?)',
+                               (media_id, s.get('start'), s.get('end')))
+            conn.execute('INSERT INTO segments_fts (rowid, text) VALUES (?,?)', (cur.lastrowid, s.get('text') or ''))
+        # a new transcript invalidates the media vector; it is set again when embeddings are rebuilt
+        conn.execute(
+            'INSERT OR REPLACE INTO media (media_id, filename, language, created_at, user_id, transcript_hash, indexed_at, vector)'
+            ' VALUES (?,?,?,?,?,?,?,NULL)',
+            (media_id, meta.get('filename'), data.get('language') or meta.get('language'),
+             meta.get('created_at') or time.time(), None if user_id is None else str(user_id), digest, time.time()))
+        _bump_version(conn)
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    return True
+
+def set_media_vector(media_id: str, embeddings: np.ndarray):
+    """Store the aggregated (mean, normalized) vector of a media item's segment embeddings."""
+    if embeddings is None or not len(embeddings):
+        return
+    vec = np.asarray(embeddings, dtype=np.float32).mean(axis=0)
+    vec /= np.linalg.norm(vec) + 1e-9
+    conn = _conn(shard_of(media_id))
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('UPDATE media SET vector=? WHERE media_id=?', (vec.astype(np.float16).tobytes(), media_id))
+        _bump_version(conn)
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+
+def has_vector(media_id: str) -> bool:
+    row = _conn(shard_of(media_id)).execute('SELECT vector IS NOT NULL FROM media WHERE media_id=?', (media_id,)).fetchone()
+    return bool(row and row[0])
+
+def is_indexed(media_id: str) -> bool:
+    return _conn(shard_of(media_id)).execute('SELECT 1 FROM media WHERE media_id=?', (media_id,)).fetchone() is not None
+
+def backfill() -> int:
+    """Index finished items that are missing from the library (transcribed before it existed)."""
+    from . import manifest
+    added = 0
+    for media_id in manifest.ids(status='done'):
+        if is_indexed(media_id):
+            continue
+        data = load_transcript(media_id)
+        if index_media(media_id, data, manifest.get(media_id)):
+            added += 1
+    return added
+
+
+def _filters(language, since, until, user_id):
+    clauses, params = [], []
+    if language:
+        clauses.append('m.language = ?'); params.append(language)
+    if since is not None:
+        clauses.append('m.created_at >= ?'); params.append(since)
+    if until is not None:
+        clauses.append('m.created_at < ?'); params.append(until)
+    if user_id is not ANY_USER:  # IS also matches NULL: anonymous callers see anonymous media
+        clauses.append('m.user_id IS ?'); params.append(None if user_id is None else str(user_id))
+    return ''.join(f' AND {c}' for c in clauses), params
+
+def _lexical_shard(shard: int, match: str, depth: int, where: str, params: list) -> List[dict]:
+    if not _path(shard).exists():
+        return []
+    rows = _conn(shard).execute(
+        'SELECT s.media_id, s.start, s."end", f.text, bm25(segments_fts) AS bm25, m.filename, m.language'
+        ' FROM segments_fts f JOIN segments s ON s.id = f.rowid JOIN media m ON m.media_id = s.media_id'
+        f' WHERE segments_fts MATCH ?{where} ORDER BY bm25 LIMIT ?', (match, *params, depth)).fetchall()
+    return [{'media_id': r[0], 'timestamp': r[1], 'end': r[2], 'text': r[3], 'score': -float(r[4]),
+             'filename': r[5], 'language': r[6]} for r in rows]
+
+def lexical(query: str, depth: int, language=None, since=None, until=None, user_id=ANY_USER) -> List[dict]:
+    """Best `depth` segments over all shards, by bm25 (terms OR-ed, like the per-media search)."""
+    tokens = list(dict.fromkeys(lexical_index.tokenize(query)))
+    if not tokens:
+        return []
+    match = ' OR '.join(f'"{t}"' for t in tokens)
+    where, params = _filters(language, since, until, user_id)
+    parts = _executor().map(lambda s: _lexical_shard(s, match, depth, where, params), range(SHARDS))
+    hits = [h for part in parts for h in part]
+    hits.sort(key=lambda h: -h['score'])
+    return hits[:depth]
+
+
+def _shard_vectors(shard: int, dim: int):
+    """(ids, matrix, language, created_at, user_id, filename) of the shard's `dim`-sized media vectors.
+
+    Cached per shard version; vectors of another size (an older embedding model) are left out.
+    """
+    conn = _conn(shard)
+    row = conn.execute("SELECT value FROM state WHERE key='version'").fetchone()
+    version = row[0] if row else 0
+    with _vectors_lock:
+        hit = _vectors.get((shard, dim))
+        if hit and hit[0] == version:
+            return hit[1]
+    rows = conn.execute('SELECT media_id, vector, language, created_at, user_id, filename FROM media'
+                        ' WHERE length(vector) = ?', (dim * 2,)).fetchall()  # float16
+    if rows:
+        matrix = np.vstack([np.frombuffer(r[1], dtype=np.float16) for r in rows]).astype(np.float32)
+    else:
+        matrix = np.zeros((0, dim), dtype=np.float32)
+    arrays = ([r[0] for r in rows], matrix, np.array([r[2] or '' for r in rows], dtype=object),
+              np.array([r[3] or 0.0 for r in rows], dtype=np.float64), np.array([r[4] for r in rows], dtype=object),
+              [r[5] for r in rows])
+    with _vectors_lock:
+        _vectors[(shard, dim)] = (version, arrays)
+    return arrays
+
+def _semantic_shard(shard: int, q_vec: np.ndarray, n: int, language, since, until, user_id):
+    if not _path(shard).exists():
+        return []
+    ids, matrix, languages, created, users, names = _shard_vectors(shard, len(q_vec))
+    if not ids:
+        return []
+    keep = np.ones(len(ids), dtype=bool)
+    if language:
+        keep &= languages == language
+    if since is not None:
+        keep &= created >= since
+    if until is not None:
+        keep &= created < until
+    if user_id is not ANY_USER:
+        keep &= users == (None if user_id is None else str(user_id))
+    rows = np.flatnonzero(keep)
+    if not len(rows):
+        return []
+    sims = matrix[rows] @ q_vec
+    if len(rows) > n:
+        top = np.argpartition(-sims, n - 1)[:n]
+        rows, sims = rows[top], sims[top]
+    return [(float(s), ids[r], names[r], languages[r] or None) for r, s in zip(rows, sims)]
+
+def semantic(query: str, depth: int, language=None, since=None, until=None, user_id=ANY_USER) -> Optional[List[dict]]:
+    """Segments from the media whose aggregated vector is closest to the query; None without embeddings."""
+    from . import embedding_service
+    if embedding_service._get_faiss() is None:
+        return None
+    q_vec = embedding_service._embed([query])[0].astype(np.float32)
+    parts = _executor().map(lambda s: _semantic_shard(s, q_vec, VECTOR_MEDIA, language, since, until, user_id),
+                            range(SHARDS))
+    media = sorted((m for part in parts for m in part), reverse=True)[:VECTOR_MEDIA]
+    per_media = max(1, min(depth, 50))
+    hits = []
+    for _, media_id, filename, lang in media:
+        for r in embedding_service.search_embeddings(media_id, query, top_k=per_media) or []:
+            hits.append(dict(r, media_id=media_id, filename=filename, language=lang, end=r.get('end')))
+    hits.sort(key=lambda h: -h['score'])
+    return hits[:depth]
+
+
+def _fuse(*rankings: List[dict]) -> List[dict]:
+    """Reciprocal rank fusion; the same segment found by both sides counts twice."""
+    fused: Dict[tuple, dict] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking):
+            key = (hit['media_id'], round(float(hit.get('timestamp') or 0.0), 2))
+            entry = fused.setdefault(key, dict(hit, score=0.0))
+            entry['score'] += 1.0 / (RRF_K + rank + 1)
+    return sorted(fused.values(), key=lambda h: -h['score'])
+
+def search(query: str, offset: int = 0, limit: int = 20, mode: str = 'hybrid', language: str | None = None,
+           since: float | None = None, until: float | None = None, user_id=ANY_USER) -> dict:
+    """One page of library-wide results: media id, segment timestamp and score, best first."""
+    depth = offset + limit + 1  # one extra hit tells whether another page exists
+    lex = lexical(query, depth, language, since, until, user_id) if mode != 'semantic' else []
+    sem = semantic(query, depth, language, since, until, user_id) if mode != 'lexical' else None
+    if mode == 'hybrid' and sem:
+        hits = _fuse(lex, sem)
+    else:
+        hits = (sem or []) if mode == 'semantic' else lex
+    return {'query': query, 'mode': mode, 'semantic': sem is not None, 'offset': offset, 'limit': limit,
+            'has_more': len(hits) > offset + limit, 'results': hits[offset:offset + limit]}
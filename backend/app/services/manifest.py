@@ -0,0 +1,149 @@
+"""Persistent media manifest.
+
+Maps media id -> raw file, size, content type, duration, content hash, status and
+generated artifact paths, stored in storage/manifest.sqlite3 (WAL mode, one
+connection per thread). Routes resolve media through a primary-key lookup here
+instead of scanning the storage directory with glob on every request.
+
+A manifest created next to an existing storage directory is backfilled once with a
+single scandir pass.
+"""
+import json, os, sqlite3, threading, time
+from pathlib import Path
+
+STORAGE = Path('storage')
+MANIFEST_PATH = STORAGE / 'manifest.sqlite3'
+
+# Scalar fields stored as columns; anything else passed to upsert() lands in `info`
+COLUMNS = ('raw', 'filename', 'content_type', 'size', 'sha256', 'duration', 'status',
+           'language', 'segments', 'created_at', 'updated_at')
+ARTIFACT_SUFFIXES = {'_transcript.json': 'transcript', '_summary.json': 'summary', '_meta.json': 'meta'}
+
+_local = threading.local()
+_backfill_lock = threading.Lock()
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and getattr(_local, 'path', None) == MANIFEST_PATH:
+        return conn
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    fresh = not MANIFEST_PATH.exists()
+    conn = sqlite3.connect(str(MANIFEST_PATH), timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS media ('
+        ' id TEXT PRIMARY KEY, raw TEXT, filename TEXT, content_type TEXT, size INTEGER,'
+        ' sha256 TEXT, duration REAL, status TEXT, language TEXT, segments INTEGER,'
+        ' created_at REAL, updated_at REAL, artifacts TEXT, info TEXT)'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS media_sha256 ON media (sha256)')
+    _local.conn, _local.path = conn, MANIFEST_PATH
+    if fresh:
+        with _backfill_lock:
+            _backfill(conn)
+    return conn
+
+def _row_to_dict(row: sqlite3.Row) -> dict:
+    entry = json.loads(row['info'] or '{}')
+    entry.update({k: row[k] for k in COLUMNS if row[k] is not None})
+    entry['id'] = row['id']
+    entry['artifacts'] = json.loads(row['artifacts'] or '{}')
+    return entry
+
+def get(media_id: str):
+    """Return the manifest entry for media_id or None."""
+    row = _conn().execute('SELECT * FROM media WHERE id=?', (media_id,)).fetchone()
+    return _row_to_dict(row) if row else None
+
+def ids(status: str | None = None) -> list:
+    """Media ids, optionally only those with the given status."""
+    if status is None:
+        rows = _conn().execute('SELECT id FROM media').fetchall()
+    else:
+        rows = _conn().execute('SELECT id FROM media WHERE status=?', (status,)).fetchall()
+    return [r[0] for r in rows]
+
+def _upsert(conn: sqlite3.Connection, media_id: str, fields: dict, artifacts: dict | None = None):
+    row = conn.execute('SELECT * FROM media WHERE id=?', (media_id,)).fetchone()
+    info = json.loads(row['info'] or '{}') if row else {}
+    arts = json.loads(row['artifacts'] or '{}') if row else {}
+    values = {k: row[k] for k in COLUMNS} if row else {k: None for k in COLUMNS}
+    for k, v in fields.items():
+        if k in ('id', 'artifacts'):
+            continue
+        if k in values:
+            values[k] = v
+        else:
+            info[k] = v
+    for kind, path in (artifacts or {}).items():
+        if path is None:
+            arts.pop(kind, None)
+        else:
+            arts[kind] = str(path)
+    values['updated_at'] = time.time()
+    if values['created_at'] is None:
+        values['created_at'] = values['updated_at']
+    cols = ('id',) + COLUMNS + ('artifacts', 'info')
+    params = (media_id,) + tuple(values[k] for k in COLUMNS) + (json.dumps(arts), json.dumps(info))
+    conn.execute(f"INSERT OR REPLACE INTO media ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})", params)
+
+def upsert(media_id: str, artifacts: dict | None = None, **fields):
+    """Create or update an entry. artifacts maps kind -> path (None removes the kind)."""
+    conn = _conn()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        _upsert(conn, media_id, fields, artifacts)
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+
+def set_artifact(media_id: str, kind: str, path):
+    upsert(media_id, artifacts={kind: path})
+
+def _backfill(conn: sqlite3.Connection):
+    """Populate a new manifest from files already present in storage (one directory pass)."""
+    entries: dict = {}
+    for de in os.scandir(STORAGE):
+        name = de.name
+        if name.startswith('.') or not de.is_file() or '.sqlite3' in name or '_chat_' in name:
+            continue
+        suffix = next((s for s in ARTIFACT_SUFFIXES if name.endswith(s)), None)
+        if suffix:
+            media_id = name[:-len(suffix)]
+            kind = ARTIFACT_SUFFIXES[suffix]
+            fields, arts = entries.setdefault(media_id, ({}, {}))
+            if kind == 'meta':
+                try:
+                    with open(de.path, 'r', encoding='utf-8') as f:
+                        fields.update(json.load(f))
+                except Exception:
+                    pass
+            else:
+                arts[kind] = str(STORAGE / name)
+                if kind == 'transcript':
+                    fields.setdefault('status', 'done')
+            continue
+        media_id = name.split('.', 1)[0]
+        fields, _ = entries.setdefault(media_id, ({}, {}))
+        fields['raw'] = name
+        fields.setdefault('size', de.stat().st_size)
+        fields.setdefault('created_at', de.stat().st_mtime)
+    emb_dir = STORAGE / 'embeddings'
+    if emb_dir.is_dir():
+        for de in os.scandir(emb_dir):
+            if de.name.endswith('.index'):
+                media_id = de.name[:-len('.index')]
+                if media_id in entries:
+                    entries[media_id][1]['embeddings'] = str(emb_dir / de.name)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for media_id, (fields, arts) in entries.items():
+            fields.setdefault('status', 'processing' if fields.get('raw') else 'done')
+            _upsert(conn, media_id, fields, arts)
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
@@ -0,0 +1,161 @@
+"""Transcription pipeline steps shared by the API process and queue workers.
+
+Kept free of FastAPI so `python -m app.worker` can run jobs without importing the
+routers.
+
+With TRANSCRIBE_TWO_PASS=1 the first pass uses the fast WHISPER_DRAFT_MODEL and is
+stored with quality 'draft'; a low-priority 'refine' job then re-transcribes with
+WHISPER_FINAL_MODEL, atomically replaces the transcript (quality 'final') and drops
+artifacts derived from the draft (summary cache, embedding index).
+
+Every stored transcript queues an 'embed' job (when FAISS is available), so the
+embedding index is ready before the first search instead of built inside it.
+"""
+import os
+from pathlib import Path
+from app.services import whisper_service, dedup_service, progress_hub, job_queue, lexical_index, library_search, embedding_service
+from app.services.storage_access import (STORAGE, transcript_path, save_media_meta, load_media_meta, load_transcript,
+                                         write_json_atomic, hash_file, record_artifact, transcript_hash)
+
+TWO_PASS = os.getenv('TRANSCRIBE_TWO_PASS', '0').lower() in ('1', 'true', 'yes')
+DRAFT_MODEL = os.getenv('WHISPER_DRAFT_MODEL', 'tiny')
+FINAL_MODEL = os.getenv('WHISPER_FINAL_MODEL', 'small')
+REFINE_PRIORITY = -10  # refinement yields to first passes of other uploads
+
+def store_transcript(media_id: str, result: dict, quality: str = 'final'):
+    """Persist a transcript (atomic replace) with its BM25 index, update the manifest and index it by content hash.
+
+    Also adds it to the library search index and queues the embedding index build
+    (kind 'embed' on the job workers). Only final transcripts are registered for
+    dedup, so identical uploads never clone a draft.
+    """
+    t_path = transcript_path(media_id)
+    if 'error' not in result:
+        result['quality'] = quality
+    write_json_atomic(t_path, result, indent=2)
+    segments = result.get('segments') or []
+    if 'error' not in result:
+        lexical_index.build(media_id, segments)
+    save_media_meta(media_id, {
+        'status': 'error' if 'error' in result else 'done',
+        'language': result.get('language'),
+        'segments': len(segments),
+        'duration': segments[-1].get('end') if segments else None,
+        'quality': None if 'error' in result else quality,
+        'vad_saved_seconds': result.get('vad_saved_seconds'),
+        'transcript_hash': None if 'error' in result else transcript_hash(result),
+    }, artifacts={'transcript': t_path})
+    meta = load_media_meta(media_id) or {}
+    if meta.get('sha256') and 'error' not in result and quality == 'final':
+        dedup_service.register(meta['sha256'], media_id)
+    if 'error' not in result:
+        _index_library(media_id, result, meta)
+        embedding_service.enqueue(media_id)
+    if 'error' in result:
+        progress_hub.publish(media_id, 'error', error=result['error'])
+    elif quality == 'draft':
+        progress_hub.publish(media_id, 'draft', segments_count=len(segments), language=result.get('language'))
+        progress_hub.publish(media_id, 'state', status='refining')
+    else:
+        progress_hub.publish(media_id, 'done', segments_count=len(segments), language=result.get('language'),
+                             quality=quality)
+
+def _index_library(media_id: str, result: dict, meta: dict):
+    """Add the transcript to the library-wide search index; a failure there never fails the transcript."""
+    try:
+        library_search.index_media(media_id, result, meta)
+    except Exception as e:
+        print(f'[search] library index failed for {media_id}: {e}')  # noqa: T201
+
+def invalidate_derived(media_id: str):
+    """Drop artifacts computed from an older transcript; they are rebuilt on next use."""
+    artifacts = (load_media_meta(media_id) or {}).get('artifacts') or {}
+    defaults = {'summary': STORAGE / f"{media_id}_summary.json", 'embeddings': embedding_service.EMB_DIR / f"{media_id}.index",
+                'embeddings_meta': embedding_service.EMB_DIR / f"{media_id}.json"}
+    for kind, default in defaults.items():
+        for path in {Path(artifacts[kind]), default} if artifacts.get(kind) else {default}:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        if kind in artifacts:
+            record_artifact(media_id, kind, None)
+
+def reuse_identical(media_id: str, meta: dict):
+    """Save meta; if its sha256 matches a finished item, clone that item's artifacts.
+
+    Returns the cloned transcript, or None when the content has not been seen before.
+    """
+    source_id = dedup_service.lookup(meta['sha256'])
+    cloned = dedup_service.clone_artifacts(source_id, media_id) if source_id else {}
+    if 'transcript' in cloned:
+        source = load_media_meta(source_id) or {}
+        meta.update({k: source.get(k) for k in ('language', 'segments', 'duration')}, quality=source.get('quality', 'final'),
+                    status='done', dedup_of=source_id)
+        save_media_meta(media_id, meta, artifacts=cloned)
+        dedup_service.register(meta['sha256'], media_id)
+        transcript = load_transcript(media_id) or {}
+        save_media_meta(media_id, {'transcript_hash': transcript_hash(transcript)})
+        _index_library(media_id, transcript, meta)
+        embedding_service.enqueue(media_id)  # reuses the cloned index; sets the library vector
+        return transcript
+    save_media_meta(media_id, meta)
+    return None
+
+def first_pass(mid: str, path: str, sha256: str | None, on_progress=None) -> dict:
+    """Transcribe and store the first result: final, or the draft plus a queued refine job."""
+    result = whisper_service.transcribe_to_segments(path, sha256=sha256, on_progress=on_progress,
+                                                    model_size=DRAFT_MODEL if TWO_PASS else None, media_id=mid)
+    store_transcript(mid, result, quality='draft' if TWO_PASS else 'final')
+    if TWO_PASS:
+        job_queue.enqueue('refine', {'media_id': mid, 'path': path}, priority=REFINE_PRIORITY, job_id=f"refine:{mid}")
+    return result
+
+def transcribe_media(mid: str, path: str):
+    """Hash (if needed), dedup, transcribe and store; raises on failure."""
+    progress_hub.publish(mid, 'state', status='running')
+    meta = load_media_meta(mid) or {'id': mid}
+    if not meta.get('sha256'):  # chunked uploads are hashed here, off the request path
+        meta['sha256'] = hash_file(Path(path))
+        cloned = reuse_identical(mid, meta)
+        if cloned is not None:
+            progress_hub.publish(mid, 'done', segments_count=len(cloned.get('segments') or []),
+                                 language=cloned.get('language'))
+            return
+    first_pass(mid, path, meta['sha256'], on_progress=progress_hub.progress_callback(mid))
+
+def transcribe_job(payload: dict, job: dict):
+    """Queue handler for kind='transcribe'.
+
+    Failures are re-raised so the queue can retry; the error marker is only written
+    once the last attempt has failed.
+    """
+    try:
+        transcribe_media(payload['media_id'], payload['path'])
+    except Exception as e:
+        if job.get('attempts', 0) >= job.get('max_attempts', 1):
+            try:
+                store_transcript(payload['media_id'], {"error": str(e)})
+            except Exception:
+                pass
+        else:
+            progress_hub.publish(payload['media_id'], 'state', status='retrying', error=str(e))
+        raise
+
+def refine_job(payload: dict, job: dict):
+    """Queue handler for kind='refine': replace a draft with the WHISPER_FINAL_MODEL transcript."""
+    mid = payload['media_id']
+    meta = load_media_meta(mid)
+    if not meta or meta.get('quality') != 'draft' or not Path(payload['path']).exists():
+        return {'skipped': True}
+    result = whisper_service.transcribe_to_segments(payload['path'], sha256=meta.get('sha256'), model_size=FINAL_MODEL,
+                                                    media_id=mid)
+    if 'error' in result:
+        raise RuntimeError(result['error'])
+    invalidate_derived(mid)  # before the store: that queues the embedding build for the final transcript
+    store_transcript(mid, result, quality='final')
+    return {'segments': len(result.get('segments') or [])}
+
+def embed_job(payload: dict, job: dict):
+    """Queue handler for kind='embed': build the embedding index of a stored transcript (no-op when current)."""
+    return embedding_service.build_index(payload['media_id'])
@@ -0,0 +1,156 @@
+"""Process-wide Whisper model registry.
+
+Every Whisper user (upload transcription, realtime capture, legacy helpers) goes
+through here so each (model size, device) is loaded from disk once per process.
+
+Inference runs in slots: `acquire()` blocks on a semaphore of WHISPER_INFERENCE_SLOTS
+slots per model and hands out a private replica. Whisper installs kv-cache hooks on
+the model during decoding, so two threads must never run `.transcribe` on the same
+instance; extra replicas are deep copies of the loaded model (no second disk load)
+created only when concurrent demand needs them. Torch intra-op threads are sized to
+cpu_count // slots so concurrent slots do not oversubscribe the CPU.
+"""
+import copy, os, threading, warnings
+from contextlib import contextmanager
+
+DEFAULT_SIZE = os.getenv('WHISPER_MODEL', 'base')
+INFERENCE_SLOTS = max(1, int(os.getenv('WHISPER_INFERENCE_SLOTS', '1')))
+
+_lock = threading.Lock()
+_entries: dict = {}
+_threads_configured = False
+_whisper_missing = False
+
+
+class _Entry:
+    def __init__(self, size: str, device: str, model):
+        self.size = size
+        self.device = device
+        self.replicas = [model]
+        self.idle = [model]
+        self.slots = threading.BoundedSemaphore(INFERENCE_SLOTS)
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.waiting = 0
+
+    def checkout(self):
+        with self.lock:
+            self.waiting += 1
+        self.slots.acquire()
+        with self.lock:
+            self.waiting -= 1
+            self.in_use += 1
+            model = self.idle.pop() if self.idle else None
+        if model is None:
+            try:
+                model = copy.deepcopy(self.replicas[0])
+            except BaseException:
+                with self.lock:
+                    self.in_use -= 1
+                self.slots.release()  # no replica, no slot: a failed copy must not leak it
+                raise
+            with self.lock:
+                self.replicas.append(model)
+        return model
+
+    def checkin(self, model):
+        with self.lock:
+            self.idle.append(model)
+            self.in_use -= 1
+        self.slots.release()
+
+    def stats(self) -> dict:
+        try:
+            per_replica = sum(p.numel() * p.element_size() for p in self.replicas[0].parameters())
+        except Exception:
+            per_replica = None
+        return {
+            'model': self.size,
+            'device': self.device,
+            'slots': INFERENCE_SLOTS,
+            'replicas': len(self.replicas),
+            'in_use': self.in_use,
+            'queue_depth': self.waiting,
+            'memory_bytes': per_replica * len(self.replicas) if per_replica is not None else None,
+        }
+
+
+def _resolve_device(device: str | None) -> str:
+    device = device or os.getenv('WHISPER_DEVICE')
+    if device:
+        return device
+    try:
+        import torch  # type: ignore
+        return 'cuda' if torch.cuda.is_available() else 'cpu'
+    except Exception:
+        return 'cpu'
+
+def _configure_threads():
+    global _threads_configured
+    if _threads_configured:
+        return
+    _threads_configured = True
+    try:
+        import torch  # type: ignore
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // INFERENCE_SLOTS))
+    except Exception:
+        pass
+
+def _entry(size: str | None, device: str | None):
+    size = size or DEFAULT_SIZE
+    device = _resolve_device(device)
+    key = (size, device)
+    entry = _entries.get(key)
+    if entry is not None:
+        return entry
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            return entry
+        global _whisper_missing
+        if _whisper_missing:
+            return None
+        try:
+            import whisper  # type: ignore
+        except ImportError:
+            _whisper_missing = True
+            return None
+        _configure_threads()
+        try:
+            # Suppress torch.load future warning emitted inside whisper
+            with warnings.catch_warnings():
+                warnings.filterwarnings(
+                    "ignore",
+                    message=r"You are using `torch.load` with `weights_only=False`.*",
+                    category=FutureWarning,
+                )
+                model = whisper.load_model(size, device=device)
+        except Exception:
+            return None
+        entry = _entries[key] = _Entry(size, device, model)
+        return entry
+
+def get(size: str | None = None, device: str | None = None):
+    """Load (once) and return the primary model for (size, device), or None if unavailable.
+
+    Use only for metadata/availability checks; run inference through acquire().
+    """
+    entry = _entry(size, device)
+    return entry.replicas[0] if entry else None
+
+@contextmanager
+def acquire(size: str | None = None, device: str | None = None):
+    """Hold an inference slot and yield a model replica (None if Whisper is unavailable)."""
+    entry = _entry(size, device)
+    if entry is None:
+        yield None
+        return
+    model = entry.checkout()
+    try:
+        yield model
+    finally:
+        entry.checkin(model)
+
+def stats() -> list:
+    """Loaded models with replica count, busy slots, queue depth and parameter memory."""
+    return [e.stats() for e in list(_entries.values())]
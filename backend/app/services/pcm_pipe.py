@@ -0,0 +1,124 @@
+"""Live-capture audio decoding: one long-lived ffmpeg per session.
+
+MediaRecorder blobs are continuation fragments of a single webm/opus stream (only
+the first one carries the container header), so they are written straight into the
+stdin of one ffmpeg process that runs for the whole session. Its 16 kHz mono s16le
+stdout is read asynchronously into a PcmRingBuffer that the transcriber reads from
+by absolute sample position. Nothing touches the disk and no process is spawned per
+blob.
+"""
+import asyncio, os, subprocess, threading
+import numpy as np
+
+SAMPLE_RATE = 16000
+PCM_DTYPE = np.dtype('<i2')
+RING_SECONDS = float(os.getenv('REALTIME_RING_SECONDS', '120'))
+READ_BYTES = 32768
+
+FFMPEG_CMD = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-fflags", "+nobuffer", "-probesize", "32768",
+              "-i", "pipe:0", "-vn", "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"]
+
+
+class PcmRingBuffer:
+    """Fixed-size int16 ring addressed by absolute sample index (samples since session start).
+
+    Only the newest `seconds` of audio are kept; reads of older positions are clamped to
+    what is still buffered. Safe to read from executor threads while the event loop appends.
+    """
+
+    def __init__(self, seconds: float = RING_SECONDS, sample_rate: int = SAMPLE_RATE):
+        self.capacity = max(int(seconds * sample_rate), 1)
+        self._buf = np.zeros(self.capacity, dtype=PCM_DTYPE)
+        self.total = 0
+        self._lock = threading.Lock()
+
+    @property
+    def start(self) -> int:
+        """Oldest absolute sample index still available."""
+        return max(0, self.total - self.capacity)
+
+    def append(self, samples: np.ndarray):
+        added = len(samples)
+        if not added:
+            return
+        samples = samples[-self.capacity:]
+        n = len(samples)
+        with self._lock:
+            pos = (self.total + added - n) % self.capacity
+            first = min(n, self.capacity - pos)
+            self._buf[pos:pos + first] = samples[:first]
+            self._buf[:n - first] = samples[first:]
+            self.total += added
+
+    def read(self, start: int, end: int | None = None) -> np.ndarray:
+        """Copy of samples [start, end) (absolute indices), clamped to the buffered range."""
+        with self._lock:
+            end = self.total if end is None else min(end, self.total)
+            start = max(start, self.start)
+            if end <= start:
+                return np.zeros(0, dtype=PCM_DTYPE)
+            a, n = start % self.capacity, end - start
+            if a + n <= self.capacity:
+                return self._buf[a:a + n].copy()
+            return np.concatenate((self._buf[a:], self._buf[:a + n - self.capacity]))
+
+
+class FfmpegPcmDecoder:
+    """webm/opus (or any ffmpeg-readable stream) on stdin -> PCM samples in a ring buffer."""
+
+    def __init__(self, ring: PcmRingBuffer | None = None, debug: bool = False, cmd: list | None = None):
+        self.ring = ring or PcmRingBuffer()
+        self.debug = debug
+        self.cmd = cmd or FFMPEG_CMD
+        self.proc = None
+        self.bytes_in = 0
+        self._reader = None
+        self._carry = b''
+
+    async def start(self):
+        """Spawn ffmpeg (raises FileNotFoundError when it is not installed)."""
+        self.proc = await asyncio.create_subprocess_exec(
+            *self.cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=None if self.debug else subprocess.DEVNULL)
+        self._reader = asyncio.create_task(self._read())
+        return self
+
+    async def _read(self):
+        while True:
+            data = await self.proc.stdout.read(READ_BYTES)
+            if not data:
+                return
+            data = self._carry + data
+            usable = len(data) - len(data) % PCM_DTYPE.itemsize
+            self._carry = data[usable:]
+            self.ring.append(np.frombuffer(data[:usable], dtype=PCM_DTYPE))
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.returncode is None and not self.proc.stdin.is_closing()
+
+    async def feed(self, data: bytes):
+        """Write one blob; waits (backpressure) while ffmpeg's stdin pipe is full."""
+        if not self.alive:
+            raise RuntimeError('ffmpeg decoder is not running')
+        self.proc.stdin.write(data)
+        self.bytes_in += len(data)
+        await self.proc.stdin.drain()
+
+    async def close(self, timeout: float = 10.0):
+        """End of input: let ffmpeg flush the tail into the ring, then reap it."""
+        if self.proc is None:
+            return
+        try:
+            if not self.proc.stdin.is_closing():
+                self.proc.stdin.close()
+            await asyncio.wait_for(asyncio.shield(self._reader), timeout)
+            await asyncio.wait_for(self.proc.wait(), timeout)
+        except (asyncio.TimeoutError, ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            if self.proc.returncode is None:
+                self.proc.kill()
+                await self.proc.wait()
+            if not self._reader.done():
+                self._reader.cancel()
@@ -0,0 +1,188 @@
+"""Per-media progress fan-out for the SSE / WebSocket event streams.
+
+Transcription code (job worker threads) publishes events here; every watcher of a
+media id receives them from one shared channel instead of polling the REST routes.
+A channel keeps a snapshot (state, percent, segments finalized so far) so late
+joiners start from the current picture, and while it has watchers one poller task
+per channel follows the manifest and job queue, which also covers jobs running in a
+separate `python -m app.worker` process.
+
+Events are dicts: {'event': 'state'|'progress'|'segments'|'draft'|'done'|'error'|'snapshot', ...};
+in two-pass mode 'draft' (draft transcript stored) is followed by state 'refining' and
+the stream ends with 'done' once the final transcript replaced it;
+a 'state' event with status 'running' starts a fresh attempt (discard earlier segments).
+"""
+import asyncio, json, threading, time
+
+POLL_SECONDS = 1.0
+QUEUE_SIZE = 512
+KEEPALIVE_SECONDS = 15.0
+TERMINAL = ('done', 'error')
+
+_lock = threading.Lock()
+_channels: dict = {}
+
+
+class _Subscriber:
+    __slots__ = ('loop', 'queue', 'overflow')
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflow = False
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:  # slow watcher: drop its backlog, it resyncs from the snapshot
+            self.overflow = True
+
+
+class _Channel:
+    def __init__(self, media_id: str):
+        self.media_id = media_id
+        self.seq = 0
+        self.state = {'status': None, 'percent': 0.0, 'processed_seconds': 0.0, 'total_seconds': None}
+        self.segments = []
+        self.subscribers = set()
+        self.poller = None
+
+    def snapshot(self) -> dict:
+        return dict(self.state, event='snapshot', id=self.seq, media_id=self.media_id, segments=list(self.segments))
+
+
+def _channel(media_id: str) -> _Channel:
+    ch = _channels.get(media_id)
+    if ch is None:
+        ch = _channels[media_id] = _Channel(media_id)
+    return ch
+
+def publish(media_id: str, event: str, **data):
+    """Record an event in the channel snapshot and fan it out (callable from any thread)."""
+    with _lock:
+        if media_id not in _channels and event in ('state', 'draft', 'done', 'error'):
+            return  # unwatched and not producing: subscribers rebuild state from the manifest/job queue
+        ch = _channel(media_id)
+        if event == 'segments':
+            ch.segments.extend(data.get('segments') or [])
+        elif event == 'progress':
+            ch.state.update({k: data[k] for k in ('percent', 'processed_seconds', 'total_seconds') if k in data})
+        elif event in ('state', 'done', 'error'):
+            status = data.setdefault('status', event)
+            if ch.state['status'] == status:  # the poller and the worker both report transitions
+                return
+            ch.state['status'] = status
+            if event == 'done':
+                ch.state['percent'] = 100.0
+            elif status == 'running':  # (re)started attempt: segments are produced again from the start
+                ch.segments = []
+                ch.state.update(percent=0.0, processed_seconds=0.0)
+        ch.seq += 1
+        payload = dict(data, event=event, id=ch.seq, media_id=media_id, ts=time.time())
+        subs = list(ch.subscribers)
+        if event in TERMINAL and not subs:
+            _channels.pop(media_id, None)  # nobody watching: the stored transcript is the record
+    for sub in subs:
+        sub.loop.call_soon_threadsafe(sub.push, payload)
+
+def progress_callback(media_id: str):
+    """on_progress(processed_s, total_s, new_segments) adapter for whisper_service."""
+    def on_progress(processed: float, total: float, segments: list):
+        if segments:
+            publish(media_id, 'segments', segments=segments)
+        publish(media_id, 'progress', processed_seconds=round(processed, 2), total_seconds=round(total, 2),
+                percent=round(100.0 * processed / total, 1) if total else None)
+    return on_progress
+
+def _current_state(media_id: str):
+    """(status, details) from the manifest and job queue, for watchers and the poller."""
+    from app.services import job_queue
+    from app.services.storage_access import load_media_meta
+    meta = load_media_meta(media_id) or {}
+    job = job_queue.get(meta['job_id']) if meta.get('job_id') else None
+    if meta.get('status') == 'done' and meta.get('quality') == 'draft':
+        return 'refining', {'segments_count': meta.get('segments'), 'quality': 'draft'}
+    if meta.get('status') in ('done', 'error'):
+        return meta['status'], {'segments_count': meta.get('segments'), 'language': meta.get('language'),
+                                'quality': meta.get('quality')}
+    if job is not None and job['status'] == 'failed':
+        return 'error', {'error': job['error']}
+    if job is not None:
+        return job['status'], {'attempts': job['attempts']}
+    return meta.get('status'), {}
+
+async def _poll(ch: _Channel):
+    while True:
+        await asyncio.sleep(POLL_SECONDS)
+        status, details = await asyncio.to_thread(_current_state, ch.media_id)
+        if status is not None:
+            publish(ch.media_id, status if status in TERMINAL else 'state', status=status, **details)
+            if status in TERMINAL:
+                return
+
+async def subscribe(media_id: str):
+    """Async generator of events for media_id: a snapshot first, then live events until done/error."""
+    status, details = await asyncio.to_thread(_current_state, media_id)
+    sub = _Subscriber(asyncio.get_running_loop())
+    with _lock:
+        ch = _channel(media_id)
+        if status in TERMINAL and ch.state['status'] not in TERMINAL:
+            ch.state['status'] = status
+        if ch.state['status'] is None:
+            ch.state['status'] = status
+        first = dict(ch.snapshot(), **details)
+        ch.subscribers.add(sub)
+        if ch.poller is None and ch.state['status'] not in TERMINAL:
+            ch.poller = asyncio.create_task(_poll(ch))
+    try:
+        yield first
+        if first['status'] in TERMINAL:
+            return
+        while True:
+            event = await sub.queue.get()
+            if sub.overflow:
+                with _lock:
+                    event = ch.snapshot()
+                sub.overflow = False
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+            yield event
+            if event['event'] in TERMINAL or event.get('status') in TERMINAL:
+                return
+    finally:
+        with _lock:
+            ch.subscribers.discard(sub)
+            if not ch.subscribers:
+                if ch.poller is not None:
+                    ch.poller.get_loop().call_soon_threadsafe(ch.poller.cancel)
+                    ch.poller = None
+                if ch.state['status'] in TERMINAL or ch.state['status'] is None:
+                    _channels.pop(media_id, None)
+
+async def sse(media_id: str, keepalive: float = KEEPALIVE_SECONDS):
+    """subscribe() rendered as text/event-stream frames, with keep-alive comments."""
+    events = subscribe(media_id)
+    pending = None
+    try:
+        while True:
+            pending = pending or asyncio.ensure_future(events.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=keepalive)
+            if not done:
+                yield ': keepalive\n\n'
+                continue
+            try:
+                event = pending.result()
+            except StopAsyncIteration:
+                return
+            finally:
+                pending = None
+            yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        if pending is not None:  # client went away mid-wait: let the generator run its cleanup
+            pending.cancel()
+            await asyncio.wait({pending})
+        await events.aclose()
+
+def watchers(media_id: str) -> int:
+    ch = _channels.get(media_id)
+    return len(ch.subscribers) if ch else 0
@@ -0,0 +1,166 @@
+"""Cross-session scheduler for realtime (live capture) inference.
+
+All capture sessions share REALTIME_WORKERS inference threads (default: one per
+WHISPER_INFERENCE_SLOTS slot) instead of each piling work onto the default executor.
+
+- Fairness: sessions with work wait in one round-robin queue; a session is never
+  decoded on two workers at once and goes to the back of the queue after each run.
+- Coalescing: a session has at most one queued request. A newer tick replaces the
+  queued one, whose future resolves to None (its partial is superseded: the newer
+  decode covers the same audio and more). Final requests are never superseded.
+- Backpressure: per-session wait and run times are tracked; when a session's
+  wait + run exceeds its tick interval, `advice()` suggests a larger buffer_seconds.
+
+Everything except the inference itself runs on the event loop thread.
+"""
+import asyncio, os, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from . import model_registry
+
+WORKERS = max(1, int(os.getenv('REALTIME_WORKERS') or model_registry.INFERENCE_SLOTS))
+MAX_BUFFER_SECONDS = float(os.getenv('REALTIME_MAX_BUFFER_SECONDS', '15'))
+
+
+class _Job:
+    __slots__ = ('fn', 'args', 'future', 'enqueued', 'final')
+
+    def __init__(self, fn, args, future, final):
+        self.fn = fn
+        self.args = args
+        self.future = future
+        self.enqueued = time.monotonic()
+        self.final = final
+
+
+class _Session:
+    def __init__(self, key: str):
+        self.key = key
+        self.pending = None
+        self.running = False
+        self.closed = False
+        self.runs = 0
+        self.dropped = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+        self.last_run = 0.0
+        self.run_total = 0.0
+
+    def stats(self) -> dict:
+        return {'runs': self.runs, 'dropped': self.dropped, 'queued': self.pending is not None, 'running': self.running,
+                'last_wait_ms': round(self.last_wait * 1000, 1), 'max_wait_ms': round(self.max_wait * 1000, 1),
+                'last_run_ms': round(self.last_run * 1000, 1),
+                'avg_run_ms': round(self.run_total / self.runs * 1000, 1) if self.runs else None}
+
+
+def _resolve(future, result=None, error=None):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class RealtimeScheduler:
+    def __init__(self, workers: int = WORKERS):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='realtime')
+        self._sessions: dict = {}
+        self._ready = deque()
+        self._running = 0
+
+    def submit(self, key: str, fn, *args, final: bool = False) -> asyncio.Future:
+        """Queue fn(*args) for session `key`; the future resolves to its result, or None if superseded."""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(key)
+        if session is None:
+            session = self._sessions[key] = _Session(key)
+        job = _Job(fn, args, loop.create_future(), final)
+        old = session.pending
+        if old is not None and old.final and not final:
+            session.dropped += 1
+            _resolve(job.future)
+            return job.future
+        if old is not None:
+            job.enqueued = old.enqueued  # waiting time counts from the oldest request it replaces
+            session.dropped += 1
+            _resolve(old.future)
+        session.pending = job
+        if old is None and not session.running:
+            self._ready.append(key)
+        self._pump(loop)
+        return job.future
+
+    def _pump(self, loop):
+        while self._running < self.workers and self._ready:
+            session = self._sessions.get(self._ready.popleft())
+            if session is None or session.pending is None:
+                continue
+            job, session.pending = session.pending, None
+            if job.future.done():  # cancelled by the caller
+                continue
+            started = time.monotonic()
+            session.last_wait = started - job.enqueued
+            session.max_wait = max(session.max_wait, session.last_wait)
+            session.running = True
+            self._running += 1
+            fut = loop.run_in_executor(self._executor, job.fn, *job.args)
+            fut.add_done_callback(lambda f, s=session, j=job, t=started: self._finished(loop, s, j, f, t))
+
+    def _finished(self, loop, session: _Session, job: _Job, fut, started: float):
+        self._running -= 1
+        session.running = False
+        session.runs += 1
+        session.last_run = time.monotonic() - started
+        session.run_total += session.last_run
+        if fut.cancelled():
+            job.future.cancel()
+        elif fut.exception() is not None:
+            _resolve(job.future, error=fut.exception())
+        else:
+            _resolve(job.future, fut.result())
+        if session.pending is not None:
+            self._ready.append(session.key)  # back of the queue: other sessions go first
+        elif session.closed:
+            self._sessions.pop(session.key, None)
+        self._pump(loop)
+
+    def remove(self, key: str):
+        """Forget a finished session (its queued request, if any, resolves to None)."""
+        session = self._sessions.get(key)
+        if session is None:
+            return
+        session.closed = True
+        if session.pending is not None:
+            _resolve(session.pending.future)
+            session.pending = None
+        if not session.running:
+            self._sessions.pop(key, None)
+
+    def advice(self, key: str, interval: float):
+        """Suggested buffer_seconds when the session cannot keep up with ticks every `interval` s, else None."""
+        session = self._sessions.get(key)
+        if session is None or not session.runs:
+            return None
+        needed = session.last_wait + session.last_run
+        if needed <= interval or interval >= MAX_BUFFER_SECONDS:
+            return None
+        return round(min(MAX_BUFFER_SECONDS, max(interval * 1.5, needed * 1.25)), 1)
+
+    def session_stats(self, key: str) -> dict | None:
+        session = self._sessions.get(key)
+        return session.stats() if session else None
+
+    def stats(self) -> dict:
+        return {'workers': self.workers, 'busy': self._running, 'queued': len(self._ready),
+                'sessions': {key: s.stats() for key, s in self._sessions.items()}}
+
+
+_scheduler = None
+
+def get_scheduler() -> RealtimeScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RealtimeScheduler()
+    return _scheduler
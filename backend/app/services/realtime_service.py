@@ -2,20 +2,41 @@ import os, tempfile, time, asyncio, json
 import threading
 from typing import Callable, Optional
 from concurrent.futures import ThreadPoolExecutor
-from .whisper_service import get_model
+import numpy as np
+from . import engines, vad
+from .pcm_pipe import FfmpegPcmDecoder, PcmRingBuffer, SAMPLE_RATE, RING_SECONDS
+
+DECODE_MODE = os.getenv('REALTIME_DECODE_MODE', 'window').lower()  # window | full (legacy whole-buffer re-decode)
+WINDOW_SECONDS = float(os.getenv('REALTIME_WINDOW_SECONDS', '15'))
+OVERLAP_SECONDS = float(os.getenv('REALTIME_OVERLAP_SECONDS', '1'))
+PROMPT_CHARS = 200  # committed text carried into the next window as initial_prompt
+STABLE_START_TOLERANCE = 0.5  # seconds a segment start may move between passes and still match
+
+
+def _normalize(text: str) -> str:
+    return ' '.join((text or '').lower().split())
 
 
 class RealtimeTranscriber:
-    """Naive pseudo-streaming wrapper around Whisper.
+    """Pseudo-streaming wrapper around the transcription engine.
 
-    Strategy: accumulate compressed audio bytes (e.g. webm/opus) as received.
-    Throttle decoding (default every 2s) by writing current buffer to a temp file,
-    invoking Whisper transcription on the full audio so far, and diffing from the
-    previous emitted text. This is NOT low-latency token streaming, but provides
-    incremental partials without waiting for full upload.
+    mode='window' (default): audio lives in a bounded PCM ring buffer (compressed
+    chunks go through one long-lived ffmpeg, PCM can be added directly). Each tick
+    decodes only the audio after the committed point (plus `overlap_seconds` of
+    context), capped at `window_seconds`, with the committed text tail as prompt.
+    A segment is committed once two consecutive passes agree on it; if the
+    uncommitted span would outgrow the window, all but the newest segment are
+    committed anyway. Per-tick work and memory therefore stay constant however long
+    the session runs.
+
+    mode='full': the original strategy; accumulate compressed bytes and re-decode
+    the whole buffer through a temp file on every tick (cost grows with session length).
     """
 
-    def __init__(self, decode_interval: float = 2.0):
+    def __init__(self, decode_interval: float = 2.0, mode: str = DECODE_MODE, window_seconds: float = WINDOW_SECONDS,
+                 overlap_seconds: float = OVERLAP_SECONDS, model_size: Optional[str] = None,
+                 ring: Optional[PcmRingBuffer] = None, engine: Optional[engines.TranscriptionEngine] = None,
+                 use_vad: bool = vad.ENABLED):
         self.buffer = bytearray()
         self.last_emit_text = ""
         self.last_decode_time = 0.0
@@ -23,15 +44,137 @@ class RealtimeTranscriber:
         self._lock = threading.Lock()
         self._executor = ThreadPoolExecutor(max_workers=1)
         self._closing = False
+        self.mode = mode
+        self.model_size = model_size
+        self.engine = engine
+        self.window = int(window_seconds * SAMPLE_RATE)
+        self.overlap = int(overlap_seconds * SAMPLE_RATE)
+        self.ring = ring or PcmRingBuffer(seconds=max(RING_SECONDS, window_seconds + overlap_seconds))
+        self.decoder: Optional[FfmpegPcmDecoder] = None
+        self.commit_at = 0  # absolute sample index where committed audio ends
+        self._decoded_to = 0  # ring.total at the last pass
+        self.committed = []  # committed segments (session timeline)
+        self.committed_text = ""
+        self.tentative = []  # segments of the last pass after commit_at, not yet stable
+        self.language = None
+        self.decoded_seconds = 0.0  # audio fed to the engine, for cost tracking
+        self.use_vad = use_vad
+        self.vad_saved_seconds = 0.0  # audio not fed to the engine because the VAD found no speech
 
     def add_chunk(self, data: bytes):
         with self._lock:
-            self.buffer.extend(data)
+            self.buffer.extend(data)  # window mode: drained into the decoder on the next tick
+
+    def add_pcm(self, pcm: np.ndarray):
+        """Append 16 kHz mono int16 samples (window mode)."""
+        self.ring.append(pcm)
+
+    async def _feed_pending(self):
+        with self._lock:
+            data = bytes(self.buffer)
+            self.buffer.clear()
+        if not data:
+            return
+        if self.decoder is None:
+            self.decoder = await FfmpegPcmDecoder(self.ring).start()
+        await self.decoder.feed(data)
+
+    # --- window mode ---------------------------------------------------------------
+
+    def step(self, final: bool = False) -> Optional[dict]:
+        """Decode the trailing window once; returns a partial message (or None when there is no new audio).
+
+        final=True commits everything decoded.
+        """
+        total = self.ring.total
+        start = max(self.commit_at - self.overlap, total - self.window, self.ring.start)
+        if total - start < SAMPLE_RATE // 10 or (total <= self._decoded_to and not final):
+            return None
+        previous, self._decoded_to = self._decoded_to, total
+        audio = self.ring.read(start, total)
+        if self.use_vad:
+            skipped = self._skip_silence(audio, total - max(previous, start), final)
+            if skipped is not False:
+                return skipped
+        engine = self.engine or engines.get_engine()
+        result = engine.transcribe_pcm(audio, model_size=self.model_size, language=self.language,
+                                       initial_prompt=self.committed_text[-PROMPT_CHARS:] or None)
+        self.decoded_seconds += len(audio) / SAMPLE_RATE
+        self.language = self.language or result.get('language')
+        offset, edge = start / SAMPLE_RATE, self.commit_at / SAMPLE_RATE
+        hypothesis = [{'start': (s.get('start') or 0.0) + offset, 'end': (s.get('end') or 0.0) + offset,
+                       'text': s.get('text') or ''} for s in result.get('segments', [])]
+        # overlap context: segments mostly inside already-committed audio were emitted before
+        hypothesis = [s for s in hypothesis if (s['start'] + s['end']) / 2 >= edge and s['text'].strip()]
+
+        stable = 0
+        if final:
+            stable = len(hypothesis)
+        else:
+            for new, old in zip(hypothesis, self.tentative):
+                if _normalize(new['text']) != _normalize(old['text']) or abs(new['start'] - old['start']) > STABLE_START_TOLERANCE:
+                    break
+                stable += 1
+            if total - self.commit_at >= self.window - min(int(2 * self.decode_interval * SAMPLE_RATE), self.window // 2):
+                stable = max(stable, len(hypothesis) - 1)  # window nearly full: force all but the newest
+        message = self._commit(hypothesis[:stable], hypothesis[stable:])
+        if not hypothesis and total - self.commit_at > self.window:
+            self.commit_at = total - self.overlap  # long silence: drop it
+        if final:
+            self.commit_at = total
+        return message
+
+    def _commit(self, commit: list, tentative: list) -> dict:
+        self.tentative = tentative
+        if commit:
+            self.commit_at = max(self.commit_at, int(round(commit[-1]['end'] * SAMPLE_RATE)))
+        self.committed.extend(commit)
+        delta = ''.join(s['text'] for s in commit)
+        self.committed_text += delta
+        self.last_emit_text = self.committed_text
+        return {"type": "partial", "text": ''.join(s['text'] for s in commit + tentative), "delta": delta,
+                "segments": commit, "tentative": tentative}
+
+    def _skip_silence(self, audio: np.ndarray, new_samples: int, final: bool):
+        """Answer a tick without inference when the VAD allows it; False means decode as usual.
+
+        A window without speech is dropped (the committed point moves past it). When only
+        the newly arrived audio is silent the speaker paused: the tentative tail is
+        committed as it stands.
+        """
+        total = self.ring.total
+        if vad.is_silent(audio):
+            self.vad_saved_seconds += len(audio) / SAMPLE_RATE
+            message = self._commit(self.tentative, []) if self.tentative else None
+            self.commit_at = max(self.commit_at, total if final else total - self.overlap)
+            return message
+        if self.tentative and not final and new_samples > 0 and vad.is_silent(audio[-new_samples:]):
+            self.vad_saved_seconds += len(audio) / SAMPLE_RATE
+            return self._commit(self.tentative, [])
+        return False
+
+    async def decode(self, final: bool = False) -> Optional[dict]:
+        """step() on the transcriber's own worker thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.step, final)
+
+    # --- shared ---------------------------------------------------------------------
 
     async def maybe_decode(self, send_cb: Callable[[dict], asyncio.Future]):
         now = time.time()
         if now - self.last_decode_time < self.decode_interval:
             return
+        if self.mode == 'window':
+            self.last_decode_time = now
+            try:
+                await self._feed_pending()
+                message = await self.decode()
+            except Exception as e:
+                await send_cb({"type": "error", "message": f"decode_failed: {e}"})
+                return
+            if message and (message['delta'] or message['tentative']):
+                await send_cb(message)
+            return
         with self._lock:
             data = bytes(self.buffer)
         if len(data) < 4000:  # wait for some audio (~few KB)
@@ -56,25 +199,28 @@ class RealtimeTranscriber:
 
     def _decode_bytes(self, data: bytes):
         # Persist current buffer to a temporary file and run Whisper.
-        # We assume data is webm/opus. We'll write to .webm and rely on ffmpeg (installed by whisper dependency) for decode.
-        model = get_model()
+        # We assume data is webm/opus. We'll write to .webm and rely on ffmpeg for decode.
         with tempfile.NamedTemporaryFile(suffix=".webm", delete=True) as tmp:
             tmp.write(data)
             tmp.flush()
-            result = model.transcribe(tmp.name, verbose=False)
-        segments = []
-        for seg in result.get('segments', []):
-            segments.append({
-                'start': seg.get('start'),
-                'end': seg.get('end'),
-                'text': seg.get('text')
-            })
-        return result.get('text'), segments
+            result = engines.get_engine().transcribe_file(tmp.name)
+        return result.get('text'), result.get('segments', [])
 
     async def finalize(self, send_cb: Callable[[dict], asyncio.Future]):
         if self._closing:
             return
         self._closing = True
+        if self.mode == 'window':
+            try:
+                await self._feed_pending()
+                if self.decoder is not None:
+                    await self.decoder.close()
+                await self.decode(final=True)
+            except Exception as e:
+                await send_cb({"type": "error", "message": f"finalize_failed: {e}"})
+                return
+            await send_cb({"type": "final", "text": self.committed_text, "segments": self.committed})
+            return
         with self._lock:
             data = bytes(self.buffer)
         if not data:
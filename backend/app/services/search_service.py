@@ -1,27 +1,26 @@
-from rank_bm25 import BM25Okapi
-from typing import List, Dict
-from .storage_access import load_transcript
-from .embedding_service import search_embeddings
+from .storage_access import transcript_path
+from . import embedding_service, lexical_index
+
+async def search_with_status(media_id: str, query: str):
+    """(index status, top segments) for a query; the status tells which path answered.
+
+    'ready': the embedding index (built in the background when the transcript was stored).
+    'building' (still being built) and 'unavailable' (no FAISS): BM25 over the lexical index.
+    None when there is no transcript. The transcript JSON is not parsed per query: segment
+    texts and start times come from the persisted lexical index.
+    """
+    if not transcript_path(media_id).exists():
+        return None, []
+    index = lexical_index.get(media_id)
+    if index is None:  # error transcript
+        return None, []
+    status = embedding_service.index_status(media_id)
+    if status == 'ready':
+        emb_results = embedding_service.search_embeddings(media_id, query)
+        if emb_results:
+            return status, emb_results
+    # Fallback BM25 over the persisted inverted index (built with the transcript)
+    return status, index.search(query, k=5)
 
 async def search(media_id: str, query: str):
-    data = load_transcript(media_id)
-    if not data:
-        return []
-    segments = data.get('segments', [])
-    # Try embedding search first
-    emb_results = search_embeddings(media_id, query)
-    if emb_results:
-        return emb_results
-    # Fallback BM25
-    docs = [seg.get('text','') for seg in segments]
-    tokenized = [doc.split() for doc in docs if doc]
-    if not tokenized:
-        return []
-    bm25 = BM25Okapi(tokenized)
-    scores = bm25.get_scores(query.split())
-    ranked = sorted(zip(segments, scores), key=lambda x: x[1], reverse=True)[:5]
-    return [{
-        'text': seg.get('text',''),
-        'timestamp': seg.get('start'),
-        'score': float(score)
-    } for seg, score in ranked]
+    return (await search_with_status(media_id, query))[1]
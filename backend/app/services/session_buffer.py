@@ -0,0 +1,138 @@
+"""Memory-backed buffers for live capture sessions, under a global memory budget.
+
+Each session keeps the compressed audio it received (the MediaRecorder webm stream)
+in memory up to REALTIME_SESSION_BUFFER_MB; beyond that cap the buffer spills to a
+temporary file under storage/realtime_spill and continues there. Spill writes run on
+a worker thread so the event loop never waits on the disk. Spill files left behind
+by a crash are removed at startup (purge_stale_spills).
+
+Sessions reserve their worst-case memory (buffer cap + PCM ring) from one
+process-wide budget, REALTIME_MEMORY_BUDGET_MB; a session that does not fit is
+refused up front instead of pushing the process into swap.
+"""
+import asyncio, os, tempfile, threading, time
+from pathlib import Path
+from app.services.storage_access import STORAGE
+
+MB = 1024 * 1024
+SESSION_BUFFER_BYTES = int(float(os.getenv('REALTIME_SESSION_BUFFER_MB', '8')) * MB)
+MEMORY_BUDGET_BYTES = int(float(os.getenv('REALTIME_MEMORY_BUDGET_MB', '512')) * MB)
+SPILL_DIR = STORAGE / 'realtime_spill'
+# Spill files untouched for this long belong to no live session (live ones grow with every blob)
+SPILL_STALE_SECONDS = float(os.getenv('REALTIME_SPILL_STALE_SECONDS', '300'))
+
+
+class MemoryBudget:
+    def __init__(self, total: int = MEMORY_BUDGET_BYTES):
+        self.total = total
+        self.used = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, n: int) -> bool:
+        with self._lock:
+            if self.used + n > self.total:
+                self.rejected += 1
+                return False
+            self.used += n
+            return True
+
+    def release(self, n: int):
+        with self._lock:
+            self.used = max(0, self.used - n)
+
+    def stats(self) -> dict:
+        return {'budget_bytes': self.total, 'reserved_bytes': self.used, 'rejected_sessions': self.rejected}
+
+
+BUDGET = MemoryBudget()
+
+
+class SessionBuffer:
+    """Append-only byte buffer: in memory up to `cap` bytes, then spilled to a temp file."""
+
+    def __init__(self, cap: int = SESSION_BUFFER_BYTES, spill_dir: Path = SPILL_DIR):
+        self.cap = cap
+        self.spill_dir = Path(spill_dir)
+        self.size = 0
+        self._mem = bytearray()
+        self._file = None
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._mem)
+
+    def _spill(self, data: bytes):
+        if self._file is None:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            self._file = tempfile.NamedTemporaryFile(dir=self.spill_dir, suffix='.webm', delete=False)
+            self._file.write(self._mem)
+            self._mem = bytearray()
+        self._file.write(data)
+
+    async def write(self, data: bytes):
+        if self._file is None and len(self._mem) + len(data) <= self.cap:
+            self._mem.extend(data)
+        else:
+            await asyncio.to_thread(self._spill, data)
+        self.size += len(data)
+
+    def _read_all(self) -> bytes:
+        if self._file is None:
+            return bytes(self._mem)
+        self._file.flush()
+        return Path(self._file.name).read_bytes()
+
+    async def read(self) -> bytes:
+        """Everything written so far."""
+        if self._file is None:
+            return bytes(self._mem)
+        return await asyncio.to_thread(self._read_all)
+
+    def _save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self._file is None:
+            path.write_bytes(self._mem)
+        else:
+            self._file.close()
+            os.replace(self._file.name, path)
+            self._file = None
+
+    async def save(self, path: Path):
+        """Move the buffered bytes to `path` (renamed when spilled); the buffer is empty afterwards."""
+        await asyncio.to_thread(self._save, Path(path))
+        self._mem = bytearray()
+        self.size = 0
+
+    def close(self):
+        self._mem = bytearray()
+        if self._file is not None:
+            self._file.close()
+            try:
+                os.unlink(self._file.name)
+            except OSError:
+                pass
+            self._file = None
+
+
+def purge_stale_spills(spill_dir: Path | None = None, older_than: float | None = None) -> int:
+    """Delete spill files not written for `older_than` seconds (crash leftovers); returns how many."""
+    spill_dir = Path(spill_dir or SPILL_DIR)
+    cutoff = time.time() - (SPILL_STALE_SECONDS if older_than is None else older_than)
+    removed = 0
+    try:
+        entries = list(os.scandir(spill_dir))
+    except FileNotFoundError:
+        return 0
+    for de in entries:
+        try:
+            if de.is_file() and de.stat().st_mtime < cutoff:
+                os.unlink(de.path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
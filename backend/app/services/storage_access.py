@@ -1,8 +1,22 @@
-import json, os
+import asyncio, json, os, hashlib, tempfile
 from pathlib import Path
+from . import manifest
 
 STORAGE = Path('storage')
-STORAGE.mkdir(exist_ok=True)
+
+# Read size used when streaming uploads to disk (bounded memory per upload)
+UPLOAD_CHUNK_BYTES = int(os.getenv('UPLOAD_CHUNK_KB', '1024')) * 1024
+
+# mkstemp creates 0600 files; renamed-into-place files get the mode open() would give them
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def _default_mode(fd: int):
+    os.fchmod(fd, 0o666 & ~_UMASK)
+
+def ensure_storage():
+    """Create the storage directory (done lazily by writers rather than at import)."""
+    STORAGE.mkdir(parents=True, exist_ok=True)
 
 def transcript_path(media_id: str) -> Path:
     return STORAGE / f"{media_id}_transcript.json"
@@ -10,9 +24,89 @@ def transcript_path(media_id: str) -> Path:
 def media_raw_path(media_id: str, original_ext: str = '.bin') -> Path:
     return STORAGE / f"{media_id}{original_ext}"
 
+def find_raw_media(media_id: str, meta: dict | None = None):
+    """Return the original uploaded file for media_id (manifest lookup, no directory scan) or None."""
+    meta = meta if meta is not None else manifest.get(media_id)
+    if not meta or not meta.get('raw'):
+        return None
+    path = STORAGE / meta['raw']
+    return path if path.exists() else None
+
 def load_transcript(media_id: str):
     path = transcript_path(media_id)
     if not path.exists():
         return None
     with open(path, 'r', encoding='utf-8') as f:
         return json.load(f)
+
+def write_json_atomic(path: Path, data, indent: int | None = None):
+    """Write JSON to a sibling temp file then rename, so readers never see partial content."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        _default_mode(fd)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+def transcript_hash(data: dict) -> str:
+    """Content hash of a transcript's segments (keys derived indexes to the transcript they came from)."""
+    segments = [(s.get('start'), s.get('end'), s.get('text')) for s in data.get('segments') or []]
+    return hashlib.sha256(json.dumps(segments, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def save_media_meta(media_id: str, meta: dict, artifacts: dict | None = None):
+    """Create/update the manifest entry for media_id (artifacts maps kind -> path)."""
+    fields = {k: v for k, v in meta.items() if k != 'artifacts'}  # meta may come from load_media_meta()
+    manifest.upsert(media_id, artifacts=artifacts, **fields)
+
+def load_media_meta(media_id: str):
+    return manifest.get(media_id)
+
+def record_artifact(media_id: str, kind: str, path):
+    """Register (or with path=None, drop) a generated artifact in the manifest."""
+    manifest.set_artifact(media_id, kind, path)
+
+def hash_file(path: Path, chunk_size: int = UPLOAD_CHUNK_BYTES) -> str:
+    """SHA-256 of a file on disk, read sequentially in bounded chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+async def save_upload_stream(upload, dest: Path, chunk_size: int = UPLOAD_CHUNK_BYTES):
+    """Stream an UploadFile to dest in bounded chunks.
+
+    Bytes are written to a temp file in the destination directory and renamed into
+    place once complete, with the same permissions a plain open() would give it.
+    Disk writes run in a worker thread so the event loop is not blocked.
+    Returns (size_bytes, sha256_hex) computed while streaming.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix='.upload-', suffix='.part')
+    try:
+        _default_mode(fd)
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                await asyncio.to_thread(out.write, chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        os.replace(tmp, dest)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return size, digest.hexdigest()
@@ -1,8 +1,10 @@
 import os, json, asyncio
+from pathlib import Path
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import update, select
 from app.services.celery_app import celery_app
 from app.services.whisper_service import transcribe_to_segments
+from app.services.storage_access import hash_file
 from app.services.gemini_service import call_gemini_summarize
 from app.db.database import SessionLocal, engine
 from app.models.media import Media
@@ -13,11 +15,14 @@ def transcribe_media(media_id: int, path: str):
     import asyncio as _asyncio
     _asyncio.run(_transcribe(media_id, path))
 
-async def _transcribe(media_id: int, path: str):
+async def _transcribe(media_id: int, path: str, final: bool = True):
+    """Transcribe into the Media row; unless this is the final attempt, failures are re-raised
+    so the job is retried (and resumes from its checkpoint) instead of marking the row as error."""
     db: AsyncSession
     async with SessionLocal() as db:
         try:
-            result = transcribe_to_segments(path)
+            # content hash keys the decoded-audio cache; the row id keys the transcription checkpoint
+            result = transcribe_to_segments(path, sha256=hash_file(Path(path)), media_id=f"db-{media_id}")
             segments_json = json.dumps(result.get('segments', []))
             await db.execute(update(Media).where(Media.id==media_id).values(
                 transcript=result.get('text'),
@@ -27,9 +32,23 @@ async def _transcribe(media_id: int, path: str):
             ))
             await db.commit()
         except Exception:
+            if not final:
+                raise
             await db.execute(update(Media).where(Media.id==media_id).values(status='error'))
             await db.commit()
 
+def transcribe_db_job(payload: dict, job: dict):
+    """Queue handler for kind='transcribe_db' (legacy DB-backed media rows)."""
+    from app.services import job_queue
+    job_queue.run_async(_transcribe(payload['media_id'], payload['path'],
+                                final=job.get('attempts', 0) >= job.get('max_attempts', 1)))
+
+@celery_app.task(name='jobs.run')
+def run_job(job_id: str):
+    """Celery entry point for JOB_BACKEND=celery: runs a job recorded in the local queue."""
+    from app.services import job_queue
+    return job_queue.run_job(job_id)
+
 @celery_app.task(name='summarize.media')
 def summarize_media(media_id: int):
     import asyncio as _asyncio
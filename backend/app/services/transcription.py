@@ -1,18 +1,12 @@
 import os, tempfile, subprocess
-import whisper
 from app.core.config import get_settings
+from . import model_registry, engines
 
 settings = get_settings()
-_model = None
 
 def get_model():
-    global _model
-    if _model is None:
-        _model = whisper.load_model("base")
-    return _model
+    return model_registry.get("base")
 
 async def transcribe_file(path: str):
-    model = get_model()
-    # Whisper is sync; run in thread if needed (FastAPI will handle if using run_in_threadpool)
-    result = model.transcribe(path)
-    return result  # includes text, segments (with timestamps), language
+    # Engine calls are sync; run in thread if needed (FastAPI will handle if using run_in_threadpool)
+    return engines.get_engine().transcribe_file(path, model_size="base")  # text, segments (with timestamps), language
@@ -0,0 +1,168 @@
+"""Energy-based voice activity detection (vectorized NumPy, no model).
+
+A frame (VAD_FRAME_MS) is speech when its RMS level is above VAD_THRESHOLD_DB (dBFS);
+speech frames are extended by VAD_HANGOVER_MS so trailing word endings and short
+pauses stay inside the speech region.
+
+- Realtime: windows without any speech frame are not sent to the engine.
+- Batch: silences longer than VAD_MIN_SILENCE_SECONDS are cut out before
+  transcription (VAD_PAD_SECONDS of each kept around speech); a SpeechMap maps
+  timestamps on the trimmed audio back to the original timeline. SpeechMap.view()
+  exposes the kept spans of a memory-mapped recording as one virtual array, so
+  long media is planned and decoded piece by piece without a trimmed copy.
+"""
+import os
+from typing import Dict, List
+import numpy as np
+
+SAMPLE_RATE = 16000
+ENABLED = os.getenv('VAD_ENABLED', '1').lower() in ('1', 'true', 'yes')
+THRESHOLD_DB = float(os.getenv('VAD_THRESHOLD_DB', '-45'))
+FRAME_MS = float(os.getenv('VAD_FRAME_MS', '30'))
+HANGOVER_MS = float(os.getenv('VAD_HANGOVER_MS', '300'))
+MIN_SILENCE_SECONDS = float(os.getenv('VAD_MIN_SILENCE_SECONDS', '2'))
+PAD_SECONDS = float(os.getenv('VAD_PAD_SECONDS', '0.3'))
+
+
+def frame_energy(audio: np.ndarray, frame: int, block_frames: int = 4096) -> np.ndarray:
+    """RMS per frame, computed block by block so memory-mapped audio is never fully loaded."""
+    n_frames = len(audio) // frame
+    energy = np.empty(n_frames, dtype=np.float64)
+    for i in range(0, n_frames, block_frames):
+        j = min(i + block_frames, n_frames)
+        block = np.asarray(audio[i * frame:j * frame], dtype=np.float64).reshape(-1, frame)
+        energy[i:j] = np.sqrt(np.mean(np.square(block), axis=1))
+    return energy
+
+def frame_db(audio: np.ndarray, sr: int = SAMPLE_RATE, frame_ms: float = FRAME_MS) -> np.ndarray:
+    """dBFS per frame (int16 full scale 32768, float full scale 1.0); a partial last frame counts."""
+    frame = max(1, int(sr * frame_ms / 1000))
+    full_scale = 32768.0 if np.issubdtype(np.asarray(audio[:0]).dtype, np.integer) else 1.0
+    energy = frame_energy(audio, frame)
+    if len(audio) % frame:
+        tail = np.asarray(audio[len(energy) * frame:], dtype=np.float64)
+        energy = np.append(energy, np.sqrt(np.mean(np.square(tail))))
+    return 20 * np.log10(energy / full_scale + 1e-10)
+
+def speech_frames(audio: np.ndarray, sr: int = SAMPLE_RATE, frame_ms: float = FRAME_MS,
+                  threshold_db: float = THRESHOLD_DB, hangover_ms: float = HANGOVER_MS) -> np.ndarray:
+    """Boolean speech flag per frame, with each speech frame held for the hangover period."""
+    active = frame_db(audio, sr, frame_ms) > threshold_db
+    hang = int(round(hangover_ms / frame_ms))
+    if hang and active.any():
+        # frame i is speech if any of frames i-hang..i is active (a causal dilation)
+        active = np.convolve(active.astype(np.int32), np.ones(hang + 1, dtype=np.int32))[:len(active)] > 0
+    return active
+
+def is_silent(audio: np.ndarray, sr: int = SAMPLE_RATE, **kwargs) -> bool:
+    return len(audio) == 0 or not speech_frames(audio, sr, **kwargs).any()
+
+
+class SpeechMap:
+    """Kept (speech) spans of a recording and the mapping trimmed time -> original time."""
+
+    def __init__(self, spans: List[tuple], n_samples: int, sr: int = SAMPLE_RATE):
+        self.spans = spans  # [(start, end)] original sample indices, sorted and disjoint
+        self.sr = sr
+        self.n_samples = n_samples
+        lengths = np.array([b - a for a, b in spans], dtype=np.int64)
+        self._cum = np.concatenate(([0], np.cumsum(lengths)))  # trimmed sample index where each span starts
+        self._starts = np.array([a for a, _ in spans], dtype=np.int64)
+
+    @property
+    def kept_samples(self) -> int:
+        return int(self._cum[-1])
+
+    @property
+    def saved_seconds(self) -> float:
+        return (self.n_samples - self.kept_samples) / self.sr
+
+    def trim(self, audio: np.ndarray) -> np.ndarray:
+        if not self.spans:
+            return np.asarray(audio[:0])
+        return np.concatenate([np.asarray(audio[a:b]) for a, b in self.spans])
+
+    def view(self, audio: np.ndarray) -> 'SpeechView':
+        return SpeechView(audio, self)
+
+    def pieces(self, start: int, stop: int):
+        """Original [a, b) ranges holding trimmed samples start..stop, in order."""
+        i = int(np.searchsorted(self._cum[1:], start, side='right'))
+        while i < len(self.spans) and self._cum[i] < stop:
+            offset = self.spans[i][0] - self._cum[i]
+            yield int(max(start, self._cum[i]) + offset), int(min(stop, self._cum[i + 1]) + offset)
+            i += 1
+
+    def to_original(self, t: np.ndarray | float, end: bool = False):
+        """Trimmed seconds -> original seconds; with end=True a time on a cut maps to the earlier span."""
+        x = np.asarray(t, dtype=np.float64) * self.sr
+        idx = np.searchsorted(self._cum[1:], x, side='left' if end else 'right')
+        idx = np.clip(idx, 0, max(len(self.spans) - 1, 0))
+        out = (self._starts[idx] + (x - self._cum[idx])) / self.sr if self.spans else x / self.sr
+        return float(out) if np.ndim(out) == 0 else out
+
+    def remap(self, segments: List[Dict]) -> List[Dict]:
+        if not segments:
+            return []
+        starts = self.to_original([s['start'] for s in segments])
+        ends = self.to_original([s['end'] for s in segments], end=True)
+        return [dict(s, start=round(float(a), 3), end=round(float(b), 3)) for s, a, b in zip(segments, starts, ends)]
+
+    def progress(self, on_progress):
+        """Wrap an on_progress(processed_s, total_s, segments) callback to report original times."""
+        if on_progress is None:
+            return None
+        total = self.n_samples / self.sr
+        def wrapped(processed, _total, segments):
+            on_progress(self.to_original(processed, end=True), total, self.remap(segments))
+        return wrapped
+
+
+class SpeechView:
+    """The kept spans of `audio` as one array on the trimmed timeline.
+
+    Supports len() and contiguous slices; a slice reads only its own pieces from the
+    source (e.g. a numpy.memmap), so nothing larger than the slice is loaded.
+    """
+
+    def __init__(self, audio: np.ndarray, speech: SpeechMap):
+        self.audio = audio
+        self.speech = speech
+        self.dtype = audio.dtype
+
+    def __len__(self):
+        return self.speech.kept_samples
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError('SpeechView supports contiguous slices only')
+        start, stop, _ = key.indices(len(self))
+        parts = [np.asarray(self.audio[a:b]) for a, b in self.speech.pieces(start, stop)]
+        if not parts:
+            return np.asarray(self.audio[:0])
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+
+def speech_map(audio: np.ndarray, sr: int = SAMPLE_RATE, min_silence_s: float = MIN_SILENCE_SECONDS,
+               pad_s: float = PAD_SECONDS, **kwargs) -> SpeechMap:
+    """Spans to keep: everything except silences longer than min_silence_s (minus pad_s on each side)."""
+    n = len(audio)
+    frame = max(1, int(sr * kwargs.get('frame_ms', FRAME_MS) / 1000))
+    active = speech_frames(audio, sr, **kwargs)
+    # silent runs from the flag transitions
+    edges = np.flatnonzero(np.diff(np.concatenate(([1], active.astype(np.int8), [1]))))
+    runs = edges.reshape(-1, 2)  # [start_frame, end_frame) of each silent run
+    pad = int(pad_s * sr)
+    spans, pos = [], 0
+    for a, b in runs:
+        a, b = a * frame, min(b * frame, n)
+        cut_a = a + pad if a > 0 else 0
+        cut_b = b - pad if b < n else n
+        if (b - a) / sr < min_silence_s or cut_b <= cut_a:
+            continue
+        if cut_a > pos:
+            spans.append((pos, cut_a))
+        pos = cut_b
+    if pos < n:
+        spans.append((pos, n))
+    return SpeechMap(spans, n, sr)
@@ -1,52 +1,348 @@
-import os
+import json, os, re, tempfile, threading, time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from typing import List, Dict
-import warnings
+import numpy as np
+from . import model_registry, audio_cache, engines, vad
+from .vad import frame_energy
+from .storage_access import STORAGE, write_json_atomic
 
-try:
-    import whisper  # type: ignore
-except ImportError:
-    whisper = None  # type: ignore
+SAMPLE_RATE = 16000
+# Long-media mode: audio longer than this is split at silences and transcribed in parallel
+LONG_MEDIA_SECONDS = float(os.getenv('WHISPER_LONG_MEDIA_SECONDS', '600'))
+WINDOW_SECONDS = float(os.getenv('WHISPER_WINDOW_SECONDS', '300'))
+WINDOW_OVERLAP_SECONDS = float(os.getenv('WHISPER_WINDOW_OVERLAP_SECONDS', '2'))
+_WORKERS_ENV = os.getenv('WHISPER_WORKERS')
+PARALLEL_WORKERS = int(_WORKERS_ENV) if _WORKERS_ENV else max(1, (os.cpu_count() or 2) // 2)
+# Every worker process holds its own model: rough resident MB per model, to cap the default worker count
+MODEL_MEMORY_MB = {'tiny': 1000, 'base': 1000, 'small': 2000, 'medium': 5000, 'large': 10000, 'turbo': 6000}
+WORKERS_MEMORY_MB = float(os.getenv('WHISPER_WORKERS_MEMORY_MB', '0'))  # 0 = half of physical memory
+# Worker pools with no transcription for this long are shut down (models freed)
+POOL_IDLE_SECONDS = float(os.getenv('WHISPER_POOL_IDLE_SECONDS', '300'))
+# Audio longer than this is decoded in silence-aligned pieces with a checkpoint after each one
+CHECKPOINT_SECONDS = float(os.getenv('WHISPER_CHECKPOINT_SECONDS', '300'))
+CHECKPOINT_DIR = STORAGE / 'checkpoints'
+PROMPT_CHARS = 200  # committed text carried into the next piece as initial_prompt
 
-_model = None
+_pools: dict = {}  # model size -> [executor, transcriptions using it, last release (monotonic)]
+_pools_lock = threading.Lock()
+
+def load_audio(path: str) -> np.ndarray:
+    """Decode any media file to 16 kHz mono float32 samples."""
+    return audio_cache.to_float32(audio_cache.decode(path))
 
 def get_model():
-    global _model
-    if _model is None and whisper is not None:
-        size = os.getenv('WHISPER_MODEL','base')
-        try:
-            # Suppress torch.load future warning emitted inside whisper
-            with warnings.catch_warnings():
-                warnings.filterwarnings(
-                    "ignore",
-                    message=r"You are using `torch.load` with `weights_only=False`.*",
-                    category=FutureWarning,
-                )
-                _model = whisper.load_model(size)
-        except Exception:
-            _model = None
-    return _model
-
-def transcribe_to_segments(path: str) -> Dict:
-    model = get_model()
-    if model is None:
-        # Fallback placeholder if whisper not installed
-        return {
+    """Shared WHISPER_MODEL instance from the registry (availability/metadata only).
+
+    Inference goes through engines.get_engine(), which is slot-bounded.
+    """
+    return model_registry.get()
+
+def _result_to_segments(result: Dict, offset: float = 0.0) -> List[Dict]:
+    segments = []
+    for seg in result.get('segments', []):
+        segments.append({
+            'start': seg.get('start') + offset,
+            'end': seg.get('end') + offset,
+            'text': seg.get('text')
+        })
+    return segments
+
+def transcribe_to_segments(path: str, sha256: str | None = None, on_progress=None, model_size: str | None = None,
+                           media_id: str | None = None) -> Dict:
+    """Transcribe a media file to {'language','text','segments'}.
+
+    With the content sha256 the audio comes from the decoded-audio cache (decoded at
+    most once per content, memory-mapped); without it the file is decoded directly.
+    Long audio transcribed for a media_id is checkpointed under that id (concurrent
+    uploads of the same bytes keep separate checkpoints), so a retried job resumes
+    where the previous attempt stopped. Silences longer than VAD_MIN_SILENCE_SECONDS are skipped
+    (timestamps stay on the original timeline; 'vad_saved_seconds' reports the audio
+    not sent to the engine). on_progress(processed_seconds, total_seconds, new_segments) is called as parts of
+    the audio are finalized. model_size overrides WHISPER_MODEL (e.g. draft/refine passes).
+    """
+    engine = engines.get_engine()
+    if not engine.available(model_size):
+        # Fallback placeholder if the engine (whisper) is not installed
+        result = {
             'language': 'en',
             'text': '[transcription unavailable – whisper not installed]',
             'segments': [
                 {'start': 0.0, 'end': 0.1, 'text': '[transcription unavailable]'}
             ]
         }
-    result = model.transcribe(path, verbose=False)
-    segments = []
-    for seg in result.get('segments', []):
-        segments.append({
-            'start': seg.get('start'),
-            'end': seg.get('end'),
-            'text': seg.get('text')
-        })
+        if on_progress:
+            on_progress(0.1, 0.1, result['segments'])
+        return result
+    pcm = audio_cache.ensure(path, sha256) if sha256 else None
+    audio = audio_cache.open_pcm(pcm) if pcm else load_audio(path)
+    speech = vad.speech_map(audio) if vad.ENABLED else None
+    if speech is None or not speech.saved_seconds:
+        return _transcribe_audio(audio, pcm, media_id, on_progress, model_size)
+    # Long silences are cut out before inference; timestamps are mapped back afterwards
+    if not speech.kept_samples:
+        result = {'language': None, 'text': '', 'segments': []}
+        if on_progress:
+            on_progress(speech.n_samples / SAMPLE_RATE, speech.n_samples / SAMPLE_RATE, [])
+    else:
+        # cached PCM: read the speech spans from the memmap piece by piece; otherwise it is in memory already
+        kept = speech.view(audio) if pcm else speech.trim(audio)
+        result = _transcribe_audio(kept, pcm, media_id and f"{media_id}_vad", speech.progress(on_progress),
+                                   model_size, spans=speech.spans if pcm else None)
+        result['segments'] = speech.remap(result['segments'])
+    result['vad_saved_seconds'] = round(speech.saved_seconds, 2)
+    return result
+
+def _transcribe_audio(audio: np.ndarray, pcm, key: str | None, on_progress, model_size: str | None,
+                      spans=None) -> Dict:
+    """audio may be a vad.SpeechView over the cached PCM (spans: its kept ranges of that file)."""
+    total = len(audio) / SAMPLE_RATE
+    if total > LONG_MEDIA_SECONDS and pool_workers(model_size) > 1:
+        return transcribe_long(audio, pcm_path=pcm, on_progress=on_progress, model_size=model_size,
+                               checkpoint_key=key and f"{key}_{model_size or model_registry.DEFAULT_SIZE}", spans=spans)
+    if key and total > CHECKPOINT_SECONDS:
+        return transcribe_resumable(audio, f"{key}_{model_size or model_registry.DEFAULT_SIZE}",
+                                    on_progress=on_progress, model_size=model_size)
+    result = engines.get_engine().transcribe_pcm(audio[:], model_size=model_size)
+    segments = _result_to_segments(result)
+    if on_progress:
+        on_progress(total, total, segments)
     return {
         'language': result.get('language'),
         'text': result.get('text'),
         'segments': segments
-    }
\ No newline at end of file
+    }
+
+# ---------------------------------------------------------------------------
+# Checkpoints: committed segments + position, keyed by media id
+# ---------------------------------------------------------------------------
+def checkpoint_path(key: str):
+    return CHECKPOINT_DIR / f"{key}.json"
+
+def _load_checkpoint(key: str, plan_id: dict):
+    """Saved state for key if it was written for the same audio, cut plan and model."""
+    try:
+        with open(checkpoint_path(key), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if state.get('plan') == plan_id else None
+
+def _save_checkpoint(key: str, state: dict):
+    write_json_atomic(checkpoint_path(key), state)
+
+def _drop_checkpoint(key: str):
+    try:
+        checkpoint_path(key).unlink()
+    except FileNotFoundError:
+        pass
+
+def _plan_id(audio: np.ndarray, plan, model_size: str | None = None) -> dict:
+    return {'samples': len(audio), 'cuts': [int(p[0]) for p in plan], 'engine': engines.get_engine().name,
+            'model': model_size or model_registry.DEFAULT_SIZE}
+
+def transcribe_resumable(audio: np.ndarray, key: str, on_progress=None, piece_s: float | None = None,
+                         model_size: str | None = None) -> Dict:
+    """Sequential transcription in silence-aligned pieces, checkpointed after each piece.
+
+    The first piece detects the language; later pieces are decoded with that language and
+    the tail of the committed text as initial_prompt. Both come from the checkpoint, so a
+    resumed run decodes the remaining pieces exactly as an uninterrupted run would.
+    """
+    plan = plan_windows(audio, window_s=piece_s or CHECKPOINT_SECONDS, overlap_s=0)
+    plan_id = _plan_id(audio, plan, model_size)
+    state = _load_checkpoint(key, plan_id) or {'plan': plan_id, 'done': 0, 'language': None, 'segments': []}
+    total = len(audio) / SAMPLE_RATE
+    if state['done'] and on_progress:
+        on_progress(plan[state['done'] - 1][1] / SAMPLE_RATE, total, list(state['segments']))
+    for i in range(state['done'], len(plan)):
+        a, b = plan[i][0], plan[i][1]
+        prompt = ''.join(s['text'] or '' for s in state['segments'])[-PROMPT_CHARS:] or None
+        result = engines.get_engine().transcribe_pcm(audio[a:b], model_size=model_size,
+                                                     language=state['language'], initial_prompt=prompt)
+        segments = _result_to_segments(result, a / SAMPLE_RATE)
+        state['language'] = state['language'] or result.get('language')
+        state['segments'].extend(segments)
+        state['done'] = i + 1
+        _save_checkpoint(key, state)
+        if on_progress:
+            on_progress(b / SAMPLE_RATE, total, segments)
+    _drop_checkpoint(key)
+    return {
+        'language': state['language'],
+        'text': ''.join(s['text'] or '' for s in state['segments']),
+        'segments': state['segments']
+    }
+
+# ---------------------------------------------------------------------------
+# Long-media mode: silence-aligned windows transcribed on a process pool
+# ---------------------------------------------------------------------------
+def plan_windows(audio: np.ndarray, sr: int = SAMPLE_RATE, window_s: float = WINDOW_SECONDS,
+                 overlap_s: float = WINDOW_OVERLAP_SECONDS, search_s: float = 15.0, frame_s: float = 0.05):
+    """Split audio into windows cut at the quietest frame near each target boundary.
+
+    Returns [(own_start, own_end, decode_start, decode_end)] in samples. Windows own
+    disjoint spans covering the whole file; each is decoded with `overlap_s` extra
+    audio on both sides so words straddling a cut are heard in full.
+    """
+    n = len(audio)
+    frame = max(1, int(frame_s * sr))
+    energy = frame_energy(audio, frame)
+    cuts = [0]
+    target = int(window_s * sr)
+    while n - cuts[-1] > target + int(search_s * sr):
+        lo = max((cuts[-1] + target - int(search_s * sr)) // frame, cuts[-1] // frame + 1)
+        hi = min((cuts[-1] + target + int(search_s * sr)) // frame, len(energy))
+        cuts.append(int(lo + np.argmin(energy[lo:hi])) * frame + frame // 2)
+    cuts.append(n)
+    pad = int(overlap_s * sr)
+    return [(a, b, max(0, a - pad), min(n, b + pad)) for a, b in zip(cuts[:-1], cuts[1:])]
+
+def owned_segments(window: Dict, sr: int = SAMPLE_RATE) -> List[Dict]:
+    """Segments of one window whose midpoint lies in the span the window owns."""
+    lo, hi = window['own'][0] / sr, window['own'][1] / sr
+    return [s for s in window['segments'] if lo <= (s['start'] + s['end']) / 2 < hi]
+
+def merge_window_segments(windows: List[Dict], sr: int = SAMPLE_RATE) -> Dict:
+    """Merge per-window results into one transcript on the global timeline.
+
+    windows: [{'own': (start, end) samples, 'segments': [...global times], 'language': ...}].
+    A segment is kept by the window owning its midpoint, which drops the duplicate
+    copies decoded in the overlap on either side of a cut.
+    """
+    segments = []
+    votes = Counter()
+    for w in sorted(windows, key=lambda w: w['own'][0]):
+        kept = owned_segments(w, sr)
+        segments.extend(kept)
+        if w.get('language'):
+            votes[w['language']] += sum(s['end'] - s['start'] for s in kept) or 1e-6
+    return {
+        'language': votes.most_common(1)[0][0] if votes else None,
+        'text': ''.join(s['text'] or '' for s in segments),
+        'segments': segments
+    }
+
+_worker_engine = None
+_worker_size = None
+
+def _init_worker(engine: str, size: str, threads: int):
+    global _worker_engine, _worker_size
+    try:
+        import torch  # type: ignore
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+    _worker_engine, _worker_size = engines.get_engine(engine), size  # worker processes have their own registry
+    _worker_engine.available(size)  # load the model once, up front
+
+def _transcribe_window(pcm_path: str, decode_start: int, decode_end: int, spans=None) -> Dict:
+    audio = audio_cache.open_pcm(pcm_path)
+    if spans is not None:  # offsets are on the VAD-trimmed timeline of the file
+        audio = vad.SpeechMap(spans, len(audio)).view(audio)
+    audio = audio[decode_start:decode_end]
+    result = _worker_engine.transcribe_pcm(audio, model_size=_worker_size)
+    return {'language': result.get('language'),
+            'segments': _result_to_segments(result, decode_start / SAMPLE_RATE)}
+
+def _physical_mb():
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def pool_workers(model_size: str | None = None) -> int:
+    """Worker processes for long-media mode.
+
+    WHISPER_WORKERS when set; otherwise cpu_count // 2, capped so that one model per
+    worker fits in WHISPER_WORKERS_MEMORY_MB (default: half of physical memory).
+    """
+    if _WORKERS_ENV:
+        return PARALLEL_WORKERS
+    size = model_size or model_registry.DEFAULT_SIZE
+    per_model = MODEL_MEMORY_MB.get(re.split(r'[-.]', size)[0], 2000)
+    budget = WORKERS_MEMORY_MB or (_physical_mb() or 0) / 2
+    if not budget:
+        return PARALLEL_WORKERS
+    return max(1, min(PARALLEL_WORKERS, int(budget // per_model)))
+
+def shutdown_pools(idle_for: float = 0.0) -> int:
+    """Shut down worker pools no transcription is using (and idle for idle_for seconds); returns how many."""
+    now = time.monotonic()
+    with _pools_lock:
+        idle = [size for size, (_, users, released) in _pools.items() if not users and now - released >= idle_for]
+        pools = [_pools.pop(size)[0] for size in idle]
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return len(pools)
+
+@contextmanager
+def _pool(workers: int, model_size: str | None = None):
+    """The worker pool of a model size, held for the duration of one transcription.
+
+    Pools of other sizes that are not in use are shut down first, so draft and refine
+    models are only resident together while both actually run. A pool left idle for
+    POOL_IDLE_SECONDS is shut down by a timer.
+    """
+    size = model_size or model_registry.DEFAULT_SIZE
+    with _pools_lock:
+        stale = [other for other, (_, users, _) in _pools.items() if other != size and not users]
+        for other in stale:
+            _pools.pop(other)[0].shutdown(wait=False, cancel_futures=True)
+        entry = _pools.get(size)
+        if entry is None:
+            threads = max(1, (os.cpu_count() or workers) // workers)
+            entry = _pools[size] = [ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                        initargs=(engines.ENGINE, size, threads)), 0, 0.0]
+        entry[1] += 1
+    try:
+        yield entry[0]
+    finally:
+        with _pools_lock:
+            entry[1] -= 1
+            entry[2] = time.monotonic()
+        if POOL_IDLE_SECONDS > 0:
+            timer = threading.Timer(POOL_IDLE_SECONDS, shutdown_pools, kwargs={'idle_for': POOL_IDLE_SECONDS})
+            timer.daemon = True
+            timer.start()
+
+def transcribe_long(audio: np.ndarray, workers: int | None = None, pcm_path=None, on_progress=None,
+                    checkpoint_key: str | None = None, model_size: str | None = None, spans=None) -> Dict:
+    """Transcribe long audio as silence-aligned windows in parallel worker processes.
+
+    Each worker process loads its own model once and memory-maps the decoded PCM
+    (the audio cache file, or a temporary one), so only sample offsets cross process
+    boundaries. Progress is reported window by window, in timeline order. With a
+    checkpoint_key finished windows are checkpointed and skipped when resuming. With
+    spans, audio is the VAD view of pcm_path and the workers read the same spans.
+    workers defaults to pool_workers(model_size).
+    """
+    plan = plan_windows(audio)
+    plan_id = _plan_id(audio, plan, model_size)
+    state = (_load_checkpoint(checkpoint_key, plan_id) if checkpoint_key else None) or {'plan': plan_id, 'windows': {}}
+    tmp = None
+    if pcm_path is None:
+        fd, tmp = tempfile.mkstemp(suffix='.s16')
+        with os.fdopen(fd, 'wb') as f:
+            f.write((np.clip(audio_cache.to_float32(audio), -1, 1) * 32767).astype(audio_cache.PCM_DTYPE).tobytes())
+        pcm_path = tmp
+    try:
+        with _pool(workers or pool_workers(model_size), model_size) as pool:
+            futures = [(own_a, own_b, state['windows'].get(str(i)) or pool.submit(_transcribe_window, str(pcm_path), dec_a, dec_b, spans))
+                       for i, (own_a, own_b, dec_a, dec_b) in enumerate(plan)]
+            windows = []
+            for i, (a, b, f) in enumerate(futures):
+                if not isinstance(f, dict):
+                    state['windows'][str(i)] = f = f.result()
+                    if checkpoint_key:
+                        _save_checkpoint(checkpoint_key, state)
+                windows.append(dict(f, own=(a, b)))
+                if on_progress:
+                    on_progress(b / SAMPLE_RATE, len(audio) / SAMPLE_RATE, owned_segments(windows[-1]))
+    finally:
+        if tmp:
+            os.unlink(tmp)
+    if checkpoint_key:
+        _drop_checkpoint(checkpoint_key)
+    return merge_window_segments(windows)
@@ -1,20 +1,17 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request, Response, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from pathlib import Path
+from contextlib import aclosing
 import time, uuid, json, hashlib, os
-from app.services import whisper_service, gemini_service, search_service
-from app.services.storage_access import transcript_path
-from app.services.tasks import transcribe_media as celery_transcribe
+from app.services import gemini_service, search_service, chunked_upload, job_queue, progress_hub
+from app.services.media_pipeline import reuse_identical as _reuse_identical, first_pass as _first_pass
+from app.services.storage_access import (transcript_path, find_raw_media, save_upload_stream, save_media_meta,
+                                         load_media_meta, record_artifact)
 from fastapi.responses import PlainTextResponse
+from app.utils.http_range import RangeFileResponse
+from app.api.deps import get_current_user
 from io import BytesIO
 
-try:  # optional heavy dependency already in requirements
-    from reportlab.lib.pagesizes import letter
-    from reportlab.pdfgen import canvas
-except Exception:  # pragma: no cover
-    letter = None  # type: ignore
-    canvas = None  # type: ignore
-
 try:
     from fastapi_limiter import FastAPILimiter  # noqa: F401
     from fastapi_limiter.depends import RateLimiter
@@ -23,7 +20,81 @@ except Exception:
 
 router = APIRouter(prefix="/media", tags=["media"])
 STORAGE = Path('storage')
-STORAGE.mkdir(exist_ok=True)
+
+def _queue_transcription(media_id: str, path: str, priority: int = 0) -> str:
+    """Hand a stored upload to the durable job queue; the id is stable per media item."""
+    job_id = job_queue.enqueue('transcribe', {'media_id': media_id, 'path': path}, priority=priority,
+                               job_id=f"transcribe:{media_id}")
+    save_media_meta(media_id, {'job_id': job_id})
+    progress_hub.publish(media_id, 'state', status=job_queue.get(job_id)['status'])
+    return job_id
+
+@router.post('/upload/init')
+def init_chunked_upload(payload: dict):
+    """Open (or re-open) a resumable chunked upload session.
+
+    Body: {upload_id?, filename, total_chunks, chunk_size, total_size?}. Returns the session
+    status including missing chunk ranges, so calling it again resumes an interrupted upload.
+    """
+    payload = payload or {}
+    upload_id = payload.get('upload_id') or uuid.uuid4().hex
+    try:
+        chunked_upload.open_session(upload_id, int(payload.get('total_chunks') or 0), int(payload.get('chunk_size') or 0),
+                                    payload.get('total_size'), payload.get('filename'))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return chunked_upload.get_status(upload_id)
+
+@router.post('/upload/chunk')
+async def upload_chunk(chunk: UploadFile = File(...), chunk_index: int = Form(...), total_chunks: int = Form(...),
+                       upload_id: str = Form(...), chunk_size: int | None = Form(None), total_size: int | None = Form(None),
+                       filename: str | None = Form(None), user=Depends(get_current_user)):
+    """Store one chunk of a resumable upload directly at its offset in the target file.
+
+    The request that completes the upload registers the file as a media item and queues
+    transcription; concurrent or retried final chunks get the same media id back. With a
+    bearer token the item is recorded under that user (the /search user_id filter).
+    """
+    try:
+        state = await chunked_upload.write_chunk(upload_id, chunk_index, chunk, chunk_size=chunk_size,
+                                                 total_chunks=total_chunks, total_size=total_size,
+                                                 filename=filename or chunk.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if state.pop('claimed'):
+        media_id = str(uuid.uuid4())
+        name = state.get('filename') or f"{upload_id}.bin"
+        raw_path = STORAGE / f"{media_id}{''.join(Path(name).suffixes) or '.bin'}"
+        state = chunked_upload.complete(upload_id, raw_path, media_id)
+        save_media_meta(media_id, {
+            'id': media_id,
+            'filename': name,
+            'raw': raw_path.name,
+            'content_type': chunk.content_type,
+            'size': state['total_size'],
+            'sha256': None,
+            'status': 'processing',
+            'upload_id': upload_id,
+            'user_id': user,
+            'created_at': time.time(),
+        })
+        _queue_transcription(media_id, str(raw_path))
+    done = state['state'] == 'done'
+    return {"received": chunk_index, "assembled": done, "upload_id": upload_id, "final_path": state.get('final_path'),
+            "media_id": state.get('media_id'), "state": state['state'],
+            "received_chunks": state.get('received_chunks', state['total_chunks']), "total_chunks": state['total_chunks'],
+            "missing": state.get('missing', [])}
+
+@router.get('/upload/{upload_id}/status')
+def get_chunked_upload_status(upload_id: str):
+    """Resume helper: report received/missing chunk ranges (and media id once complete)."""
+    try:
+        status = chunked_upload.get_status(upload_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if status is None:
+        raise HTTPException(status_code=404, detail='Upload session not found')
+    return status
 
 @router.get('/{media_id}')
 def get_media_meta(media_id: str):
@@ -31,13 +102,12 @@ def get_media_meta(media_id: str):
 
     This endpoint was added to satisfy frontend polling that expected /media/{id}.
     """
-    # Identify raw/original file (exclude generated _transcript/_summary files)
-    raw = next((p for p in STORAGE.glob(f"{media_id}.*")
-                if not p.name.endswith('_transcript.json') and not p.name.endswith('_summary.json')),
-               None)
+    meta = load_media_meta(media_id)
+    raw = find_raw_media(media_id, meta or {})
     transcript_file = transcript_path(media_id)
     transcript_data = None
-    if transcript_file.exists():
+    # Items the manifest knows are still processing are answered without touching the transcript
+    if (meta or {}).get('status') != 'processing' and transcript_file.exists():
         try:
             import json as _json
             with open(transcript_file, 'r', encoding='utf-8') as f:
@@ -56,71 +126,114 @@ def get_media_meta(media_id: str):
         except Exception:
             transcript_text = None
     status = 'done' if transcript_data else 'processing'
+    meta = meta or {}
     return {
         'id': media_id,
         'filename': raw.name if raw else None,
         'status': status,
         'segments': len(segments_list),
         'language': language,
-        'transcript': transcript_text
+        'transcript': transcript_text,
+        'size': meta.get('size'),
+        'sha256': meta.get('sha256'),
+        'content_type': meta.get('content_type'),
+        'duration': meta.get('duration'),
+        'job_id': meta.get('job_id'),
+        'vad_saved_seconds': meta.get('vad_saved_seconds'),
+        'quality': (transcript_data.get('quality', 'final') if isinstance(transcript_data, dict) and segments_list
+                    else None)
     }
 
+@router.get('/{media_id}/events')
+async def media_events(media_id: str):
+    """Server-Sent Events stream of transcription progress for one media item.
+
+    Starts with a `snapshot` event (status, percent, segments finalized so far), then
+    `state`, `progress` (percent of audio seconds processed), `segments` (newly
+    finalized segments) and finally `done` or `error`, after which the stream ends.
+    All watchers of a media id share one producer; use this instead of polling.
+    """
+    if not load_media_meta(media_id) and not transcript_path(media_id).exists():
+        raise HTTPException(status_code=404, detail='Media not found')
+    return StreamingResponse(progress_hub.sse(media_id), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@router.websocket('/{media_id}/events/ws')
+async def media_events_ws(websocket: WebSocket, media_id: str):
+    """WebSocket variant of /media/{id}/events: one JSON message per event."""
+    await websocket.accept()
+    try:
+        async with aclosing(progress_hub.subscribe(media_id)) as events:
+            async for event in events:
+                await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
 @router.get('/{media_id}/raw')
-def get_media_file(media_id: str):
+def get_media_file(media_id: str, request: Request):
     """Stream the original uploaded media file (video/audio) for playback.
 
-    Looks up a file named {media_id}.* in storage excluding generated transcript/summary artifacts.
+    The raw file is resolved through the media manifest (no storage directory scan).
+    Supports single/multi byte ranges (206), If-Range and conditional requests; the
+    ETag is the content SHA-256 and Last-Modified the upload time from the manifest.
     """
-    raw = next((p for p in STORAGE.glob(f"{media_id}.*")
-                if not p.name.endswith('_transcript.json') and not p.name.endswith('_summary.json')),
-               None)
+    meta = load_media_meta(media_id) or {}
+    raw = find_raw_media(media_id, meta)
     if not raw:
         raise HTTPException(status_code=404, detail='Media file not found')
     import mimetypes
-    mt, _ = mimetypes.guess_type(str(raw))
-    return FileResponse(str(raw), media_type=mt or 'application/octet-stream', filename=raw.name)
+    mt = meta.get('content_type') or mimetypes.guess_type(str(raw))[0]
+    st = raw.stat()
+    etag = f'"{meta["sha256"]}"' if meta.get('sha256') else None
+    return RangeFileResponse(raw, request.headers, size=st.st_size, mtime=meta.get('created_at') or st.st_mtime,
+                             etag=etag, media_type=mt, filename=raw.name)
 
 @router.post('/upload')
-async def upload_media(file: UploadFile = File(...), background: BackgroundTasks = None):
+async def upload_media(file: UploadFile = File(...), user=Depends(get_current_user)):
     """Upload a media file.
 
+    The body is streamed to disk in bounded chunks (never fully buffered in memory) while
+    its size and SHA-256 digest are computed; both are recorded in the media manifest.
+    Bytes identical to an earlier upload reuse its transcript/summary/embeddings and
+    return status=done immediately without running Whisper.
     Small files (<= SYNC_TRANSCRIBE_MAX_MB, default 8MB) are transcribed synchronously so
     the client immediately receives segments.
-    Larger files return quickly with status=processing and are transcribed in a background task.
+    Larger files return quickly with status=processing and a job_id; they are transcribed by the
+    job queue workers (see /jobs/{job_id}).
+    With a bearer token the item is recorded under that user (the /search user_id filter).
     """
     media_id = str(uuid.uuid4())
     ext = ''.join(Path(file.filename).suffixes)
     raw_path = STORAGE / f"{media_id}{ext}"
-    data = await file.read()
-    with open(raw_path, 'wb') as f:
-        f.write(data)
-    size_mb = len(data) / (1024*1024)
+    size_bytes, sha256 = await save_upload_stream(file, raw_path)
+    meta = {
+        'id': media_id,
+        'filename': file.filename,
+        'raw': raw_path.name,
+        'content_type': file.content_type,
+        'size': size_bytes,
+        'sha256': sha256,
+        'status': 'processing',
+        'user_id': user,
+        'created_at': time.time(),
+    }
+    cloned = _reuse_identical(media_id, meta)
+    if cloned is not None:
+        return {"id": media_id, "filename": file.filename, "segments": len(cloned.get('segments', [])), "status": "done",
+                "size": size_bytes, "sha256": sha256, "deduplicated_from": meta['dedup_of'], "quality": meta['quality']}
+    size_mb = size_bytes / (1024*1024)
     sync_limit_mb = float(os.getenv('SYNC_TRANSCRIBE_MAX_MB', '8'))
 
-    def _do_transcribe(mid: str, path: str):  # background safe function
-        try:
-            result_local = whisper_service.transcribe_to_segments(path)
-            with open(transcript_path(mid), 'w', encoding='utf-8') as tf:
-                json.dump(result_local, tf, indent=2)
-        except Exception as e:  # write minimal error marker
-            try:
-                with open(transcript_path(mid), 'w', encoding='utf-8') as tf:
-                    json.dump({"error": str(e)}, tf)
-            except Exception:
-                pass
-
     if size_mb <= sync_limit_mb:
-        # synchronous (keeps test behavior for tiny fixtures)
-        result = whisper_service.transcribe_to_segments(str(raw_path))
-        with open(transcript_path(media_id), 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2)
-        return {"id": media_id, "filename": file.filename, "segments": len(result.get('segments', [])), "status": "done"}
+        # synchronous (keeps test behavior for tiny fixtures); a draft in two-pass mode
+        result = _first_pass(media_id, str(raw_path), sha256)
+        return {"id": media_id, "filename": file.filename, "segments": len(result.get('segments', [])), "status": "done",
+                "size": size_bytes, "sha256": sha256, "quality": result.get('quality')}
     else:
-        if background is not None:
-            background.add_task(_do_transcribe, media_id, str(raw_path))
-        else:  # fallback run inline if background not provided
-            _do_transcribe(media_id, str(raw_path))
-        return {"id": media_id, "filename": file.filename, "segments": 0, "status": "processing", "detail": "Transcription queued"}
+        job_id = _queue_transcription(media_id, str(raw_path))
+        return {"id": media_id, "filename": file.filename, "segments": 0, "status": "processing", "detail": "Transcription queued",
+                "size": size_bytes, "sha256": sha256, "job_id": job_id}
 
 @router.post('/summarize')
 async def summarize_media(payload: dict):
@@ -145,7 +258,10 @@ async def summarize_media(payload: dict):
 
 @router.get('/{media_id}/status')
 async def get_status(media_id: str):
-    return {"ready": transcript_path(media_id).exists()}
+    """ready once any transcript exists; quality tells a two-pass draft from the final one."""
+    meta = load_media_meta(media_id) or {}
+    ready = transcript_path(media_id).exists()
+    return {"ready": ready, "quality": (meta.get('quality') or 'final') if ready and meta.get('status') == 'done' else None}
 
 @router.get('/{media_id}/transcript')
 async def get_transcript_primary(media_id: str):
@@ -162,11 +278,11 @@ async def get_transcript_primary(media_id: str):
         # Ensure a status field for consistency
         if isinstance(data, dict) and 'status' not in data:
             data['status'] = 'done'
+        if isinstance(data, dict) and 'error' not in data:
+            data.setdefault('quality', 'final')  # transcripts written before two-pass mode
         return data
-    # Determine if raw file exists (any extension except generated *_transcript/_summary)
-    raw = next((p for p in STORAGE.glob(f"{media_id}.*")
-                if not p.name.endswith('_transcript.json') and not p.name.endswith('_summary.json')),
-               None)
+    # Determine if raw file exists (any extension except generated artifacts)
+    raw = find_raw_media(media_id)
     if raw:
         return JSONResponse({"id": media_id, "status": "processing"}, status_code=202)
     raise HTTPException(status_code=404, detail='Media not found')
@@ -196,16 +312,13 @@ def force_inline_transcription(media_id: str):
     t_path = transcript_path(media_id)
     if t_path.exists():
         return {"status": "already_done"}
-    raw = next((p for p in STORAGE.glob(f"{media_id}.*")
-                if not p.name.endswith('_transcript.json') and not p.name.endswith('_summary.json')),
-               None)
+    meta = load_media_meta(media_id) or {}
+    raw = find_raw_media(media_id, meta)
     if not raw:
         raise HTTPException(status_code=404, detail='Raw media not found')
     try:
-        result = whisper_service.transcribe_to_segments(str(raw))
-        with open(t_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2)
-        return {"status": "done", "segments": len(result.get('segments', []))}
+        result = _first_pass(media_id, str(raw), meta.get('sha256'))
+        return {"status": "done", "segments": len(result.get('segments', [])), "quality": result.get('quality')}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Inline transcription failed: {e}")
 
@@ -257,6 +370,7 @@ async def invalidate_summary(media_id: str):
     if cache_file.exists():
         try:
             cache_file.unlink()
+            record_artifact(media_id, 'summary', None)
         except Exception:
             pass
     return {"status": "invalidated"}
@@ -285,26 +399,33 @@ async def get_chat_history(media_id: str):
     return {"history": hist[-50:]}
 
 @router.get('/{media_id}/search')
-async def search(media_id: str, q: str):
+async def search(media_id: str, q: str, response: Response):
+    """Top segments for q; the X-Index-Status header says which index answered (see search_service)."""
     if RateLimiter is None:
         _rate_limit("search", media_id)
-    return await search_service.search(media_id, q)
+    status, results = await search_service.search_with_status(media_id, q)
+    if status:
+        response.headers['X-Index-Status'] = status
+    return results
 
 @router.post('/{media_id}/transcribe')
-async def enqueue_transcription(media_id: str):
-    raw_guess = next((p for p in (Path('storage').glob(f"{media_id}.*")) if not str(p).endswith('_transcript.json')), None)
+async def enqueue_transcription(media_id: str, priority: int = 0):
+    """(Re)queue transcription of a stored upload; returns the job id to poll at /jobs/{job_id}."""
+    raw_guess = find_raw_media(media_id)
     if not raw_guess:
         raise HTTPException(status_code=404, detail='Media file not found')
-    try:
-        celery_transcribe.delay(media_id, str(raw_guess))
-    except Exception:
-        return {"queued": False, "detail": "Celery not available"}
-    return {"queued": True, "job_id": f"transcribe:{media_id}"}
+    job_id = _queue_transcription(media_id, str(raw_guess), priority=priority)
+    return {"queued": True, "job_id": job_id, "status": job_queue.get(job_id)['status']}
 
 @router.get('/{media_id}/transcript_poll')
 async def get_transcript_poll(media_id: str, job_id: str | None = None):
     if not transcript_path(media_id).exists():
-        return {"status": "processing", "job_id": job_id}
+        job_id = job_id or (load_media_meta(media_id) or {}).get('job_id')
+        job = job_queue.get(job_id) if job_id else None
+        if job and job['status'] == 'failed':
+            return {"status": "error", "job_id": job_id, "error": job['error']}
+        return {"status": "processing", "job_id": job_id, "job_status": job['status'] if job else None,
+                "attempts": job['attempts'] if job else None}
     with open(transcript_path(media_id), 'r', encoding='utf-8') as f:
         return json.load(f)
 
@@ -367,7 +488,10 @@ def export_pdf(media_id: str):
     t_path = transcript_path(media_id)
     if not t_path.exists():
         raise HTTPException(status_code=404, detail='Transcript not found')
-    if canvas is None or letter is None:
+    try:  # optional heavy dependency already in requirements; imported on first export
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
+    except Exception:  # pragma: no cover
         raise HTTPException(status_code=500, detail='PDF generation library missing')
     try:
         with open(t_path, 'r', encoding='utf-8') as f:
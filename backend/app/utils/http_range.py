@@ -0,0 +1,166 @@
+"""Byte-range file responses for media playback (RFC 9110 ranges).
+
+RangeFileResponse answers plain GETs with 200, `Range: bytes=...` with 206 (single
+range, or multipart/byteranges for several), unsatisfiable ranges with 416 and
+matching validators with 304. If-Range is honoured so a seek after the file changed
+restarts from byte 0 instead of splicing two versions.
+
+Bodies are sent as bounded reads starting at the requested offset, so memory per
+viewer is one chunk regardless of file size or seek position. When the ASGI server
+advertises the `http.response.zerocopysend` (ranges) or `http.response.pathsend`
+(whole file) extension the kernel does the copy instead.
+"""
+import os, stat, uuid
+from email.utils import formatdate, parsedate_to_datetime
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 64 * 1024
+MAX_RANGES = 16
+
+def parse_range(header: str | None, size: int):
+    """Return a sorted, merged list of inclusive (start, end) ranges.
+
+    None means "ignore the header and send the whole file" (absent/malformed/too many
+    ranges); an empty list means no range is satisfiable (416).
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    ranges = []
+    for part in spec.split(','):
+        first, sep, last = part.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if first == '':  # suffix range: last N bytes
+                n = int(last)
+                if n <= 0:
+                    continue
+                ranges.append((max(size - n, 0), size - 1))
+                continue
+            start = int(first)
+            end = int(last) if last else None
+        except ValueError:
+            return None
+        if end is not None and start > end:
+            return None
+        if start >= size:
+            continue
+        end = size - 1 if end is None else end
+        ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def _validator_matches(if_range: str, etag: str, last_modified: str) -> bool:
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return not if_range.startswith('W/') and if_range == etag  # If-Range needs a strong match
+    try:
+        return parsedate_to_datetime(if_range) == parsedate_to_datetime(last_modified)
+    except (TypeError, ValueError):
+        return False
+
+class RangeFileResponse(Response):
+    def __init__(self, path, request_headers, size: int, mtime: float, etag: str | None = None,
+                 media_type: str | None = None, filename: str | None = None):
+        self.path = str(path)
+        self.size = size
+        self.media_type = media_type or 'application/octet-stream'
+        self.background = None
+        self.body = b''
+        last_modified = formatdate(mtime, usegmt=True)
+        etag = etag or f'W/"{size:x}-{int(mtime):x}"'
+        headers = {'accept-ranges': 'bytes', 'etag': etag, 'last-modified': last_modified}
+        if filename:
+            headers['content-disposition'] = f'inline; filename="{filename}"'
+        self.ranges = None
+        if_none = request_headers.get('if-none-match')
+        if if_none and (if_none.strip() == '*' or etag in [t.strip() for t in if_none.split(',')]):
+            self.status_code = 304
+            self.init_headers(headers)
+            return
+        if_range = request_headers.get('if-range')
+        ranges = parse_range(request_headers.get('range'), size)
+        if ranges is not None and if_range and not _validator_matches(if_range, etag, last_modified):
+            ranges = None
+        if ranges == []:
+            self.status_code = 416
+            headers['content-range'] = f'bytes */{size}'
+            headers['content-length'] = '0'
+            self.init_headers(headers)
+            return
+        self.ranges = ranges
+        if ranges is None:
+            self.status_code = 200
+            headers['content-length'] = str(size)
+            headers['content-type'] = self.media_type
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.status_code = 206
+            headers['content-range'] = f'bytes {start}-{end}/{size}'
+            headers['content-length'] = str(end - start + 1)
+            headers['content-type'] = self.media_type
+        else:
+            self.status_code = 206
+            self.boundary = uuid.uuid4().hex
+            self.part_headers = [
+                (f'--{self.boundary}\r\nContent-Type: {self.media_type}\r\n'
+                 f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n').encode('latin-1')
+                for start, end in ranges
+            ]
+            self.closing = f'--{self.boundary}--\r\n'.encode('latin-1')
+            length = sum(len(h) + (end - start + 1) + 2 for h, (start, end) in zip(self.part_headers, ranges))
+            headers['content-length'] = str(length + len(self.closing))
+            headers['content-type'] = f'multipart/byteranges; boundary={self.boundary}'
+        self.init_headers(headers)
+
+    async def _send_span(self, file, start: int, count: int, send: Send, more_after: bool, zero_copy: bool):
+        if zero_copy:
+            await send({'type': 'http.response.zerocopysend', 'file': file.wrapped.fileno(),
+                        'offset': start, 'count': count, 'more_body': more_after})
+            return
+        await file.seek(start)
+        remaining = count
+        while remaining > 0:
+            chunk = await file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise RuntimeError(f'File at path {self.path} shrank while streaming.')
+            remaining -= len(chunk)
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': more_after or remaining > 0})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({'type': 'http.response.start', 'status': self.status_code, 'headers': self.raw_headers})
+        if scope['method'].upper() == 'HEAD' or self.status_code in (304, 416) or self.size == 0:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            return
+        extensions = scope.get('extensions') or {}
+        if self.ranges is None and 'http.response.pathsend' in extensions:
+            await send({'type': 'http.response.pathsend', 'path': self.path})
+            return
+        zero_copy = 'http.response.zerocopysend' in extensions
+        async with await anyio.open_file(self.path, mode='rb') as file:
+            if not stat.S_ISREG(os.fstat(file.wrapped.fileno()).st_mode):
+                raise RuntimeError(f'File at path {self.path} is not a file.')
+            if self.ranges is None:
+                await self._send_span(file, 0, self.size, send, False, zero_copy)
+            elif len(self.ranges) == 1:
+                start, end = self.ranges[0]
+                await self._send_span(file, start, end - start + 1, send, False, zero_copy)
+            else:
+                for head, (start, end) in zip(self.part_headers, self.ranges):
+                    await send({'type': 'http.response.body', 'body': head, 'more_body': True})
+                    await self._send_span(file, start, end - start + 1, send, True, zero_copy)
+                    await send({'type': 'http.response.body', 'body': b'\r\n', 'more_body': True})
+                await send({'type': 'http.response.body', 'body': self.closing, 'more_body': False})
@@ -1,58 +1,200 @@
 import asyncio
+import hmac
 import json
+import math
 import os
-import shutil
-import subprocess
+import secrets
+import time
 import uuid
-from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Optional
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import insert
-from app.db.database import get_db
-from app.models.media import Media
-
-# whisper import - ensure whisper and torch are installed
-import whisper
+import numpy as np
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+from app.services import media_pipeline
+from app.services.storage_access import media_raw_path, save_media_meta, hash_file
+from app.services.pcm_pipe import FfmpegPcmDecoder, SAMPLE_RATE, PCM_DTYPE, RING_SECONDS
+from app.services.session_buffer import SessionBuffer, BUDGET, SESSION_BUFFER_BYTES
+from app.services import capture_protocol
+from app.services.realtime_service import RealtimeTranscriber, WINDOW_SECONDS, OVERLAP_SECONDS
+from app.services.realtime_scheduler import get_scheduler, MAX_BUFFER_SECONDS
 
 router = APIRouter()
-ROOT = Path(__file__).parent.parent
-REALTIMED_DIR = ROOT / "realtime_temp"
-REALTIMED_DIR.mkdir(parents=True, exist_ok=True)
 
-# Load Whisper model once at module load (choose small/base for speed)
+# Realtime model size (small/base for speed); the configured engine loads it once per process
 # NOTE: change model name depending on available RAM/CPU/GPU
-WHISPER_MODEL = whisper.load_model("small")
+REALTIME_MODEL = os.getenv('REALTIME_WHISPER_MODEL', 'small')
+# A session whose socket drops stays alive this long, waiting for {"type":"resume"}
+RESUME_GRACE_SECONDS = float(os.getenv('REALTIME_RESUME_GRACE_SECONDS', '60'))
+# Client-requested tick interval (start/config buffer_seconds) is clamped to this range
+MIN_BUFFER_SECONDS = float(os.getenv('REALTIME_MIN_BUFFER_SECONDS', '0.5'))
+DEFAULT_BUFFER_SECONDS = 4.0
 
 
 class SessionState:
-    def __init__(self, session_id: str, ws: WebSocket, buffer_seconds: float = 4.0, debug: bool = False):
+    """One capture session: a long-lived ffmpeg decoder feeding the transcriber's PCM ring buffer.
+
+    Transcription is incremental (RealtimeTranscriber window mode): each tick decodes a
+    bounded trailing window and partials carry the newly committed segments. The
+    received webm stream is kept in a SessionBuffer (memory, spilling to disk above
+    REALTIME_SESSION_BUFFER_MB); `reserved` bytes are held in the global budget.
+
+    The session outlives its socket: when the connection drops `ws` becomes None,
+    sends are skipped and the session waits RESUME_GRACE_SECONDS for a resume. A resume
+    must present `resume_token`, a secret sent only in the session's 'started' reply.
+    When it ends it is stored as one media item (`media_id`).
+    """
+
+    def __init__(self, session_id: str, ws: WebSocket, buffer_seconds: float = 4.0, debug: bool = False,
+                 reserved: int = 0, protocol: str = 'json', user_id: int | None = None):
         self.id = session_id
+        self.resume_token = secrets.token_urlsafe(24)
+        self.user_id = user_id
+        self.media_id: Optional[str] = None
+        self.expiry: Optional[asyncio.Task] = None
+        self.reserved = reserved
+        self.protocol = protocol if protocol in capture_protocol.PROTOCOLS else 'json'
+        self.out_seq = 0  # messages sent (compact frames / JSON partials carry it)
+        self.commit_index = 0  # committed segments sent so far
+        self.last_tentative: list = []
+        self.bytes_in = 0
+        self.acked = 0
+        self.buffer = SessionBuffer()
         self.ws = ws
-        self.dir = REALTIMED_DIR / session_id
-        self.dir.mkdir(exist_ok=True, parents=True)
         self.seq = 0
         self.buffer_seconds = buffer_seconds
-        self.pending_blobs = []
+        self.transcriber = RealtimeTranscriber(decode_interval=buffer_seconds, mode='window', model_size=REALTIME_MODEL)
+        self.ring = self.transcriber.ring
+        self.decoder = FfmpegPcmDecoder(self.ring, debug=debug)
+        self.consumed = 0
+        self.blobs = 0
         self.transcribe_task: Optional[asyncio.Task] = None
-        self.running = True
-        self.last_full_transcript = ""
+        self.running = True  # False once stopped (stop, shutdown, expired grace): no more audio is taken
+        self.write_lock = asyncio.Lock()  # held while a blob is written; the worker takes it before storing
         self.debug = debug
 
-    def push_blob(self, blob_path: Path):
-        self.pending_blobs.append(str(blob_path))
+    @property
+    def last_full_transcript(self) -> str:
+        return self.transcriber.committed_text
 
-    def pop_all_pending(self):
-        items = list(self.pending_blobs)
-        self.pending_blobs.clear()
-        return items
+    @property
+    def compact(self) -> bool:
+        return self.protocol == 'compact'
 
-    def cleanup(self):
+    async def _send(self, text: str | None = None, data: bytes | None = None) -> bool:
+        """Send on the current socket; while detached (or when the send fails) nothing is sent."""
+        ws = self.ws
+        if ws is None:
+            return False
         try:
-            shutil.rmtree(self.dir)
+            if data is not None:
+                await ws.send_bytes(data)
+            else:
+                await ws.send_text(text)
+            return True
+        except Exception:
+            if self.ws is ws:
+                self.detach()
+            return False
+
+    async def send_json(self, message: dict) -> bool:
+        return await self._send(text=json.dumps(message))
+
+    def attach(self, ws: WebSocket, protocol: str | None = None):
+        self.ws = ws
+        if protocol in capture_protocol.PROTOCOLS:
+            self.protocol = protocol
+        if self.expiry:
+            self.expiry.cancel()
+            self.expiry = None
+
+    def detach(self):
+        """The socket is gone: keep transcribing and wait for a resume until the grace period ends."""
+        self.ws = None
+        if self.running and self.expiry is None:
+            self.expiry = asyncio.create_task(expire(self))
+
+    async def send_partial(self, payload: dict):
+        """Newly committed segments plus the tentative tail; nothing when neither changed.
+
+        The commit index advances while detached too: a resuming client says which
+        segments it has and `resync` sends the rest.
+        """
+        if not payload["segments"] and payload["tentative"] == self.last_tentative:
+            return
+        index = self.commit_index
+        self.commit_index += len(payload["segments"])
+        self.last_tentative = payload["tentative"]
+        self.out_seq += 1
+        if self.compact:
+            await self._send(data=capture_protocol.encode_partial(self.out_seq, index, payload["segments"],
+                                                                  payload["tentative"]))
+        else:
+            await self.send_json(dict(payload, seq=self.out_seq, commit_index=index))
+
+    async def resync(self, client_index: int):
+        """After a resume: everything committed since `client_index` plus the current tentative tail."""
+        client_index = min(max(client_index, 0), self.commit_index)
+        missed = self.transcriber.committed[client_index:self.commit_index]
+        self.out_seq += 1
+        if self.compact:
+            await self._send(data=capture_protocol.encode_partial(self.out_seq, client_index, missed, self.last_tentative))
+        else:
+            await self.send_json({"type": "partial", "text": ''.join(s["text"] for s in missed + self.last_tentative),
+                                  "delta": ''.join(s["text"] for s in missed), "segments": missed,
+                                  "tentative": self.last_tentative, "seq": self.out_seq, "commit_index": client_index})
+
+    async def send_ack(self, data: bytes = b'', flush: bool = False):
+        """JSON: one ack per blob. Compact: one ack per ACK_EVERY blobs, plus flushes on each tick."""
+        if not self.compact:
+            if not flush:
+                await self.send_json({"type": "ack", "seq": self.blobs, "bytes": len(data)})
+            return
+        if self.ws is not None and self.blobs > self.acked and (flush or self.blobs - self.acked >= capture_protocol.ACK_EVERY):
+            self.acked = self.blobs
+            self.out_seq += 1
+            await self._send(data=capture_protocol.encode_ack(self.out_seq, self.blobs, self.bytes_in))
+
+    async def send_final(self):
+        text = self.last_full_transcript
+        self.out_seq += 1
+        if self.compact:
+            await self._send(data=capture_protocol.encode_final(self.out_seq, self.commit_index, text))
+        else:
+            await self.send_json({"type": "final", "text": text, "seq": self.out_seq, "media_id": self.media_id,
+                                  "vad_saved_seconds": round(self.transcriber.vad_saved_seconds, 2)})
+        if self.media_id:
+            await self.send_json({"type": "saved", "media_id": self.media_id})
+
+    async def cleanup(self):
+        if self.expiry:
+            self.expiry.cancel()
+            self.expiry = None
+        try:
+            await self.decoder.close()
         except Exception:
             pass
+        self.buffer.close()
+        BUDGET.release(self.reserved)
+        self.reserved = 0
+
+
+def parse_buffer_seconds(value) -> Optional[float]:
+    """A client's buffer_seconds clamped to [MIN_BUFFER_SECONDS, MAX_BUFFER_SECONDS]; None if it is not a number."""
+    if isinstance(value, bool):
+        return None
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(seconds):
+        return None
+    return min(max(seconds, MIN_BUFFER_SECONDS), MAX_BUFFER_SECONDS)
+
+
+def session_reservation() -> int:
+    """Worst-case memory of one session: compressed buffer cap plus the PCM ring."""
+    ring_seconds = max(RING_SECONDS, WINDOW_SECONDS + OVERLAP_SECONDS)  # as sized by RealtimeTranscriber
+    return SESSION_BUFFER_BYTES + int(ring_seconds * SAMPLE_RATE) * PCM_DTYPE.itemsize
 
 
 SESSIONS: Dict[str, SessionState] = {}
@@ -60,111 +202,130 @@ RATE_LIMIT: Dict[str, int] = {}
 MAX_SESSIONS_PER_IP = 5
 
 
-async def convert_and_transcribe(session: SessionState, files: list):
-    if not files:
-        return
+async def expire(session: SessionState):
+    """End a detached session once the resume grace period has passed."""
+    await asyncio.sleep(RESUME_GRACE_SECONDS)
+    if session.ws is None:
+        print(f'[capture] session {session.id} not resumed within {RESUME_GRACE_SECONDS:g}s, finishing')  # noqa: T201
+        session.expiry = None
+        session.running = False
 
-    wavs = []
-    for idx, f in enumerate(files):
-        in_path = Path(f)
-        wav_out = session.dir / f"chunk_{session.seq}_{idx}.wav"
-        cmd = [
-            "ffmpeg", "-y", "-i", str(in_path),
-            "-ar", "16000", "-ac", "1",
-            str(wav_out)
-        ]
-        try:
-            stderr = subprocess.DEVNULL if not session.debug else None
-            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=stderr)
-            wavs.append(str(wav_out))
-        except subprocess.CalledProcessError:
-            continue
 
-    if not wavs:
-        return
+async def persist(session: SessionState) -> Optional[str]:
+    """Store a finished session like an upload: raw audio, manifest entry and one transcript.
 
-    list_txt = session.dir / f"wavlist_{session.seq}.txt"
-    with open(list_txt, "w") as fh:
-        for w in wavs:
-            fh.write(f"file '{w}'\n")
+    The webm stream goes to storage/<media_id>.webm and the committed segments through
+    media_pipeline.store_transcript, so search and summaries treat live captures like
+    any other media. Sessions that received no audio are not stored.
+    """
+    if not session.bytes_in:
+        return None
+    mid = str(uuid.uuid4())
+    raw_path = media_raw_path(mid, '.webm')
+    await session.buffer.save(raw_path)
+    save_media_meta(mid, {
+        'id': mid,
+        'filename': f"live_capture_{session.id}.webm",
+        'raw': raw_path.name,
+        'content_type': 'audio/webm',
+        'size': session.bytes_in,
+        'sha256': await asyncio.to_thread(hash_file, raw_path),
+        'status': 'processing',
+        'created_at': time.time(),
+        'source': 'live',
+        'session_id': session.id,
+        'user_id': session.user_id,
+    })
+    t = session.transcriber
+    result = {'language': t.language, 'text': t.committed_text, 'segments': list(t.committed),
+              'vad_saved_seconds': round(t.vad_saved_seconds, 2)}
+    await asyncio.to_thread(media_pipeline.store_transcript, mid, result, 'final')
+    session.media_id = mid
+    return mid
 
-    merged_wav = session.dir / f"merged_{session.seq}.wav"
-    try:
-        cmd = [
-            "ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(list_txt),
-            "-c", "copy", str(merged_wav)
-        ]
-        stderr = subprocess.DEVNULL if not session.debug else None
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=stderr)
-    except subprocess.CalledProcessError:
-        merged_wav = Path(wavs[-1])
-
-    if session.debug:
-        try:
-            import wave, audioop
-            with wave.open(str(merged_wav), 'rb') as wf:
-                frames = wf.readframes(wf.getnframes())
-                rms = audioop.rms(frames, wf.getsampwidth()) if frames else 0
-                await session.ws.send_text(json.dumps({
-                    "type": "debug", "message": "merged wav stats", "rms": rms, "frames": wf.getnframes(),
-                    "channels": wf.getnchannels(), "rate": wf.getframerate()
-                }))
-        except Exception as e:
-            await session.ws.send_text(json.dumps({"type": "debug", "message": f"rms failed: {e}"}))
-
-    loop = asyncio.get_running_loop()
-    try:
-        result = await loop.run_in_executor(None, lambda: WHISPER_MODEL.transcribe(str(merged_wav), language=None, verbose=False))
-    except Exception as e:
-        await session.ws.send_text(json.dumps({"type": "error", "message": f"transcription failed: {str(e)}"}))
-        session.seq += 1
+
+async def shutdown(timeout: float = 10.0):
+    """Finish every open session (detached ones included) so their transcripts are stored."""
+    tasks = [s.transcribe_task for s in SESSIONS.values() if s.transcribe_task]
+    for s in list(SESSIONS.values()):
+        s.running = False
+    if tasks:
+        await asyncio.wait(tasks, timeout=timeout)
+
+
+async def send_debug_stats(session: SessionState):
+    if session.ring.total <= session.consumed:
         return
+    audio = session.ring.read(session.consumed)
+    session.consumed = session.ring.total
+    rms = int(np.sqrt(np.mean(np.square(audio, dtype=np.float64)))) if len(audio) else 0
+    await session.send_json({
+        "type": "debug", "message": "pcm window stats", "rms": rms, "frames": len(audio),
+        "channels": 1, "rate": SAMPLE_RATE, "bytes_in": session.decoder.bytes_in
+    })
 
-    text = result.get("text", "")
-    segments = result.get("segments", [])
-    payload = {"type": "partial", "text": text, "segments": segments}
-    await session.ws.send_text(json.dumps(payload))
 
-    session.last_full_transcript += " " + text
-    session.seq += 1
+async def deliver(session: SessionState, decoded: asyncio.Future):
+    """Send one scheduled decode: newly committed segments plus the tentative tail.
 
-    for p in wavs:
-        try:
-            os.remove(p)
-        except Exception:
-            pass
-    try:
-        os.remove(list_txt)
-    except Exception:
-        pass
+    A None result means a newer tick superseded this one before it ran. When the
+    scheduler cannot keep up with this session's tick rate the tick interval is raised
+    and the client is told (type 'backpressure').
+    """
     try:
-        if merged_wav.exists():
-            os.remove(merged_wav)
-    except Exception:
-        pass
+        payload = await decoded
+    except Exception as e:
+        await session.send_json({"type": "error", "message": f"transcription failed: {str(e)}"})
+        return
+    finally:
+        session.seq += 1
+    if payload:
+        await session.send_partial(payload)
+    suggested = get_scheduler().advice(session.id, session.buffer_seconds)
+    if suggested and session.running:
+        session.buffer_seconds = suggested
+        await session.send_json({
+            "type": "backpressure", "message": "server over capacity: raise buffer_seconds",
+            "buffer_seconds": suggested, "lag": get_scheduler().session_stats(session.id)
+        })
 
 
 async def session_worker(session: SessionState):
+    """Tick until the session stops (or its resume grace expires), then finalize and store it."""
+    scheduler = get_scheduler()
+    deliveries = set()
     try:
         while session.running:
             await asyncio.sleep(session.buffer_seconds)
-            pending = session.pop_all_pending()
-            if pending:
-                await convert_and_transcribe(session, pending)
-        await session.ws.send_text(json.dumps({"type": "final", "text": session.last_full_transcript}))
-    except WebSocketDisconnect:
-        session.running = False
+            if session.debug:
+                await send_debug_stats(session)
+            await session.send_ack(flush=True)
+            task = asyncio.create_task(deliver(session, scheduler.submit(session.id, session.transcriber.step)))
+            deliveries.add(task)
+            task.add_done_callback(deliveries.discard)
+        async with session.write_lock:
+            pass  # a blob written when the session stopped lands before the buffer is read; later ones are dropped
+        await session.decoder.close()  # flush the audio ffmpeg still holds
+        final = scheduler.submit(session.id, session.transcriber.step, True, final=True)
+        await asyncio.gather(*deliveries)
+        await deliver(session, final)
+        await session.send_ack(flush=True)
+        await persist(session)
+        await session.send_final()
     except Exception as e:
-        try:
-            await session.ws.send_text(json.dumps({"type": "error", "message": str(e)}))
-        except Exception:
-            pass
+        print(f'[capture] session {session.id} failed: {e}')  # noqa: T201
+        await session.send_json({"type": "error", "message": str(e)})
     finally:
-        session.cleanup()
+        for task in deliveries:
+            task.cancel()
+        scheduler.remove(session.id)
+        await session.cleanup()
+        if SESSIONS.get(session.id) is session:
+            del SESSIONS[session.id]
 
 
 @router.websocket("/v1/ws/capture")
-async def ws_capture(websocket: WebSocket, db: AsyncSession = Depends(get_db), user_id: int | None = Query(default=None), debug: bool = Query(default=False)):
+async def ws_capture(websocket: WebSocket, user_id: int | None = Query(default=None), debug: bool = Query(default=False), protocol: str = Query(default='json')):
     await websocket.accept()
     client_ip = websocket.client.host if websocket.client else 'unknown'
     RATE_LIMIT[client_ip] = RATE_LIMIT.get(client_ip, 0) + 1
@@ -184,11 +345,61 @@ async def ws_capture(websocket: WebSocket, db: AsyncSession = Depends(get_db), u
                     continue
                 t = data.get("type")
                 if t == "start":
-                    sid = data.get("session_id") or str(uuid.uuid4())
-                    session = SessionState(sid, websocket, buffer_seconds=data.get("buffer_seconds", 4.0), debug=debug or data.get("debug", False))
+                    if session is not None and session.running:
+                        await websocket.send_text(json.dumps({"type": "error", "code": "session_exists",
+                                                              "message": "this connection already has a session"}))
+                        continue
+                    sid = str(uuid.uuid4())  # server-chosen: ids are never taken from the client
+                    interval = parse_buffer_seconds(data.get("buffer_seconds", DEFAULT_BUFFER_SECONDS))
+                    if interval is None:
+                        await websocket.send_text(json.dumps({"type": "error", "code": "invalid_config",
+                                                              "message": "buffer_seconds must be a number"}))
+                        continue
+                    reserved = session_reservation()
+                    if not BUDGET.reserve(reserved):
+                        await websocket.send_text(json.dumps({"type": "error", "code": "over_capacity",
+                                                              "message": "live capture is at capacity, try again later"}))
+                        await websocket.close(code=1013)  # try again later
+                        break
+                    session = SessionState(sid, websocket, buffer_seconds=interval,
+                                           debug=debug or data.get("debug", False), reserved=reserved,
+                                           protocol=data.get("protocol") or protocol, user_id=user_id)
+                    try:
+                        await session.decoder.start()
+                    except FileNotFoundError:
+                        await session.cleanup()
+                        session = None
+                        await websocket.send_text(json.dumps({"type": "error", "message": "ffmpeg is not installed"}))
+                        continue
                     SESSIONS[sid] = session
                     session.transcribe_task = asyncio.create_task(session_worker(session))
-                    await websocket.send_text(json.dumps({"type": "started", "session_id": sid}))
+                    await websocket.send_text(json.dumps({"type": "started", "session_id": sid, "protocol": session.protocol,
+                                                          "resume_token": session.resume_token}))
+                elif t == "resume":
+                    resumed = SESSIONS.get(str(data.get("session_id") or ''))
+                    token = str(data.get("resume_token") or '')
+                    # an unknown id and a wrong token get the same answer
+                    if (not resumed or not resumed.running or (session is not None and session.running)
+                            or not hmac.compare_digest(token.encode(), resumed.resume_token.encode())):
+                        await websocket.send_text(json.dumps({"type": "error", "code": "unknown_session",
+                                                              "message": "session expired or unknown, send start"}))
+                        continue
+                    session = resumed
+                    session.attach(websocket, data.get("protocol") or protocol)
+                    # blobs/bytes tell the client which queued audio the server already has
+                    await websocket.send_text(json.dumps({"type": "resumed", "session_id": session.id,
+                                                          "protocol": session.protocol, "blobs": session.blobs,
+                                                          "bytes": session.bytes_in, "commit_index": session.commit_index}))
+                    await session.resync(int(data.get("commit_index") or 0))
+                elif t == "config":
+                    if session and "buffer_seconds" in data:
+                        interval = parse_buffer_seconds(data["buffer_seconds"])
+                        if interval is None:
+                            await websocket.send_text(json.dumps({"type": "error", "code": "invalid_config",
+                                                                  "message": "buffer_seconds must be a number"}))
+                            continue
+                        session.buffer_seconds = interval
+                        await websocket.send_text(json.dumps({"type": "config", "buffer_seconds": session.buffer_seconds}))
                 elif t == "stop":
                     if session:
                         session.running = False
@@ -203,44 +414,32 @@ async def ws_capture(websocket: WebSocket, db: AsyncSession = Depends(get_db), u
                     await websocket.send_text(json.dumps({"type":"error", "message":"no active session. send start control"}))
                     continue
                 data = message["bytes"]
-                blob_path = session.dir / f"chunk_{session.seq}_{len(session.pending_blobs)}.webm"
-                with open(blob_path, "wb") as f:
-                    f.write(data)
-                session.push_blob(blob_path)
-                await websocket.send_text(json.dumps({"type":"ack", "file": str(blob_path.name)}))
+                async with session.write_lock:
+                    if not session.running:  # after stop the buffer is being stored and closed
+                        await websocket.send_text(json.dumps({"type": "error", "code": "session_stopped",
+                                                              "message": "session is stopping, audio dropped"}))
+                        continue
+                    try:
+                        await session.buffer.write(data)
+                        await session.decoder.feed(data)
+                    except (RuntimeError, ConnectionResetError, BrokenPipeError):
+                        await websocket.send_text(json.dumps({"type":"error", "message":"audio decoder stopped"}))
+                        continue
+                    session.blobs += 1
+                    session.bytes_in += len(data)
+                await session.send_ack(data)
 
             elif "type" in message and message["type"] == "websocket.disconnect":
                 break
     except WebSocketDisconnect:
-        if session:
-            session.running = False
+        pass
     except Exception as e:
         try:
             await websocket.send_text(json.dumps({"type": "error", "message": str(e)}))
         except Exception:
             pass
     finally:
-        if session:
-            session.running = False
-            if session.transcribe_task:
-                session.transcribe_task.cancel()
-            full_text = session.last_full_transcript.strip()
-            if full_text:
-                try:
-                    media_stmt = insert(Media).values(
-                        filename=f"realtime_session_{session.id}.live",
-                        original_name="Live Capture",
-                        content_type="audio/webm",
-                        status="transcribed",
-                        transcript=full_text,
-                        user_id=user_id
-                    )
-                    await db.execute(media_stmt)
-                    await db.commit()
-                except Exception:
-                    pass
-            try:
-                del SESSIONS[session.id]
-            except Exception:
-                pass
+        # the session is not ended here: the worker stores it after a stop or when the grace period expires
+        if session and session.ws is websocket:
+            session.detach()
     RATE_LIMIT[client_ip] = max(RATE_LIMIT.get(client_ip,1)-1, 0)
\ No newline at end of file
@@ -0,0 +1,28 @@
+"""Standalone queue worker: `python -m app.worker [--workers N]`.
+
+Runs the same job handlers as the in-process pool against storage/jobs.sqlite3, so
+the API can be started with JOB_WORKERS=0 and transcription scaled separately.
+"""
+import argparse, signal, threading
+from app.services import job_queue
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run background job workers')
+    parser.add_argument('--workers', type=int, default=max(job_queue.WORKERS, 1))
+    parser.add_argument('--drain', action='store_true', help='run due jobs once and exit')
+    args = parser.parse_args(argv)
+    if args.drain:
+        print(f'ran {job_queue.drain()} job(s)')  # noqa: T201
+        return
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    pool = job_queue.WorkerPool(args.workers).start()
+    print(f'[worker] {args.workers} worker(s) polling {job_queue.JOBS_PATH}')  # noqa: T201
+    stop.wait()
+    pool.stop()
+
+
+if __name__ == '__main__':
+    main()
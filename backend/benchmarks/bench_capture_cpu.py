@@ -0,0 +1,94 @@
+"""CPU cost of realtime capture decoding: per-blob ffmpeg spawns vs one pipe per session.
+
+Generates a webm/opus recording with ffmpeg, cuts it into MediaRecorder-sized blobs
+and decodes it twice:
+
+- legacy: every blob written to disk and converted by its own ffmpeg, plus a concat
+  run per transcription tick (the pre-pipe capture path);
+- pipe: all blobs written to one long-lived ffmpeg (app.services.pcm_pipe).
+
+Child CPU time comes from getrusage(RUSAGE_CHILDREN) and is reported per minute of
+captured audio. Requires ffmpeg on PATH; no model is loaded.
+
+Run from backend/:
+  python -m benchmarks.bench_capture_cpu --seconds 120 --blob-ms 750 --tick 4
+"""
+import argparse, asyncio, os, resource, shutil, subprocess, sys, tempfile, time
+from pathlib import Path
+
+def _child_cpu() -> float:
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+def _recording(path: Path, seconds: float):
+    subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}",
+                    "-ac", "1", "-c:a", "libopus", "-b:a", "32k", "-f", "webm", str(path)], check=True)
+
+def _blobs(data: bytes, count: int) -> list:
+    size = -(-len(data) // count)
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+def legacy(blobs: list, per_tick: int, workdir: Path) -> int:
+    spawns = 0
+    for tick in range(0, len(blobs), per_tick):
+        wavs = []
+        for idx, blob in enumerate(blobs[tick:tick + per_tick]):
+            src, out = workdir / f"chunk_{tick}_{idx}.webm", workdir / f"chunk_{tick}_{idx}.wav"
+            src.write_bytes(blob)
+            spawns += 1
+            if subprocess.run(["ffmpeg", "-y", "-i", str(src), "-ar", "16000", "-ac", "1", str(out)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0:
+                wavs.append(out)
+        if wavs:
+            listing = workdir / f"wavlist_{tick}.txt"
+            listing.write_text(''.join(f"file '{w}'\n" for w in wavs))
+            spawns += 1
+            subprocess.run(["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(listing), "-c", "copy",
+                            str(workdir / f"merged_{tick}.wav")], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return spawns
+
+async def piped(blobs: list) -> float:
+    from app.services.pcm_pipe import FfmpegPcmDecoder, PcmRingBuffer, SAMPLE_RATE
+    decoder = await FfmpegPcmDecoder(PcmRingBuffer(seconds=30)).start()
+    for blob in blobs:
+        await decoder.feed(blob)
+    await decoder.close()
+    return decoder.ring.total / SAMPLE_RATE
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--seconds', type=float, default=120.0, help='captured audio length')
+    ap.add_argument('--blob-ms', type=int, default=750, help='MediaRecorder timeslice')
+    ap.add_argument('--tick', type=float, default=4.0, help='transcription interval (buffer_seconds)')
+    args = ap.parse_args()
+    if shutil.which('ffmpeg') is None:
+        sys.exit('ffmpeg not found on PATH')
+    sys.path.insert(0, os.getcwd())
+    workdir = Path(tempfile.mkdtemp(prefix='bench-capture-'))
+    try:
+        rec = workdir / 'capture.webm'
+        _recording(rec, args.seconds)
+        blobs = _blobs(rec.read_bytes(), max(int(args.seconds * 1000 / args.blob_ms), 1))
+        per_tick = max(int(args.tick * 1000 / args.blob_ms), 1)
+        minutes = args.seconds / 60
+
+        cpu, t0 = _child_cpu(), time.perf_counter()
+        spawns = legacy(blobs, per_tick, workdir)
+        legacy_cpu, legacy_wall = _child_cpu() - cpu, time.perf_counter() - t0
+
+        cpu, t0 = _child_cpu(), time.perf_counter()
+        decoded = asyncio.run(piped(blobs))
+        pipe_cpu, pipe_wall = _child_cpu() - cpu, time.perf_counter() - t0
+
+        print(f"{len(blobs)} blobs of {args.blob_ms} ms, {args.seconds:.0f}s of audio")
+        print(f"legacy per-blob: {spawns} ffmpeg spawns, {legacy_cpu / minutes:.3f} CPU-s per session minute, "
+              f"wall {legacy_wall:.2f}s")
+        print(f"persistent pipe: 1 ffmpeg spawn, {pipe_cpu / minutes:.3f} CPU-s per session minute, "
+              f"wall {pipe_wall:.2f}s, decoded {decoded:.1f}s of PCM")
+        if pipe_cpu:
+            print(f"reduction: {legacy_cpu / pipe_cpu:.1f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
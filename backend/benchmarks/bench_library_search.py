@@ -0,0 +1,50 @@
+"""Library-wide search latency as the indexed library grows.
+
+Fills the sharded FTS5 index (app/services/library_search.py) with synthetic
+transcripts (Zipf-distributed words, one 4 s segment per row) in a temporary
+storage directory, then times lexical queries with and without filters and deep pages.
+
+Run from backend/:
+  python -m benchmarks.bench_library_search --media 2000 --segments 900 --queries 50
+(2000 media x 900 segments = 2000 hours of speech.)
+"""
+import argparse, os, sys, tempfile, time
+import numpy as np
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--media', type=int, default=2000)
+    ap.add_argument('--segments', type=int, default=900, help='segments per media item (900 x 4 s = 1 h)')
+    ap.add_argument('--vocab', type=int, default=50000)
+    ap.add_argument('--queries', type=int, default=50)
+    ap.add_argument('--shards', type=int, default=8)
+    args = ap.parse_args()
+    os.environ['LIBRARY_SHARDS'] = str(args.shards)
+    sys.path.insert(0, os.getcwd())
+    os.chdir(tempfile.mkdtemp(prefix='bench-library-'))  # storage/ is relative: keep the run out of the real store
+    from app.services import library_search
+    rng = np.random.default_rng(0)
+    words = np.array([f"w{i}" for i in range(args.vocab)])
+    t0 = time.perf_counter()
+    for m in range(args.media):
+        ids = np.minimum(rng.zipf(1.2, size=(args.segments, 12)) - 1, args.vocab - 1)
+        segments = [{'start': i * 4.0, 'end': i * 4.0 + 4.0, 'text': ' '.join(words[row])} for i, row in enumerate(ids)]
+        library_search.index_media(f"media-{m}", {'language': 'en' if m % 3 else 'de', 'segments': segments},
+                                   {'created_at': 1.7e9 + m * 3600})
+    build = time.perf_counter() - t0
+    hours = args.media * args.segments * 4 / 3600
+    print(f"indexed {hours:.0f} h ({args.media * args.segments} segments) in {build:.1f}s across {args.shards} shards")
+    queries = [' '.join(f"w{int(w)}" for w in rng.integers(50, 5000, size=rng.integers(1, 4))) for _ in range(args.queries)]
+    cases = [('top 20', {}), ('language filter', {'language': 'de'}), ('date filter', {'since': 1.7e9 + args.media * 1800}),
+             ('page 10 (offset 180)', {'offset': 180})]
+    print(f"{'case':>22} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, kw in cases:
+        times = []
+        for q in queries:
+            t0 = time.perf_counter()
+            library_search.search(q, limit=20, mode='lexical', **kw)
+            times.append((time.perf_counter() - t0) * 1000)
+        print(f"{name:>22} {np.percentile(times, 50):>8.1f} {np.percentile(times, 95):>8.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Wall-clock speedup of long-media parallel transcription vs the single-pass path.
+
+Needs openai-whisper + ffmpeg and a long recording (tens of minutes shows the effect),
+or TRANSCRIBE_ENGINE=stub and a 16-bit WAV file to measure the scheduling offline.
+
+Run from backend/:
+  python -m benchmarks.bench_long_transcribe path/to/meeting.mp4 --workers 4
+"""
+import argparse, time
+from app.services import whisper_service, engines
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('media')
+    ap.add_argument('--workers', type=int, default=whisper_service.pool_workers())
+    args = ap.parse_args()
+    engine = engines.get_engine()
+    if not engine.available():
+        raise SystemExit(f'transcription engine {engine.name!r} is not available')
+    audio = whisper_service.load_audio(args.media)
+    print(f"audio={len(audio) / whisper_service.SAMPLE_RATE:.0f}s engine={engine.name} "
+          f"model={whisper_service.os.getenv('WHISPER_MODEL', 'base')}")
+
+    t0 = time.perf_counter()
+    single = engine.transcribe_pcm(audio)
+    t_single = time.perf_counter() - t0
+    print(f"sequential: {t_single:8.1f}s segments={len(single.get('segments', []))}")
+
+    with whisper_service._pool(args.workers) as pool:
+        pool.submit(int).result()  # pay worker model loading up front
+        t0 = time.perf_counter()
+        parallel = whisper_service.transcribe_long(audio, workers=args.workers)
+        t_par = time.perf_counter() - t0
+    whisper_service.shutdown_pools()
+    print(f"parallel:   {t_par:8.1f}s segments={len(parallel['segments'])} workers={args.workers} "
+          f"windows={len(whisper_service.plan_windows(audio))}")
+    print(f"speedup:    {t_single / t_par:8.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Offline load test of upload -> job queue -> transcript with the stub engine.
+
+Runs the real app (lifespan, in-process job workers, storage, manifest, progress
+hub) in a temporary working directory with TRANSCRIBE_ENGINE=stub, so no model
+weights, ffmpeg or network are needed. The stub sleeps --latency seconds per audio
+second, standing in for a model of that speed.
+
+Run from backend/:
+  python -m benchmarks.bench_pipeline --files 20 --seconds 30 --latency 0.05 --workers 2
+"""
+import argparse, io, os, shutil, sys, tempfile, time, wave
+import numpy as np
+
+def _wav(seconds: float, seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * 16000)) / 16000
+    audio = 0.3 * np.sin(2 * np.pi * (180 + seed) * t) + 0.05 * rng.standard_normal(len(t))
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as wf:
+        wf.setnchannels(1); wf.setsampwidth(2); wf.setframerate(16000)
+        wf.writeframes((np.clip(audio, -1, 1) * 32767).astype('<i2').tobytes())
+    return buf.getvalue()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--files', type=int, default=20)
+    ap.add_argument('--seconds', type=float, default=30.0)
+    ap.add_argument('--latency', type=float, default=0.05, help='stub wall seconds per audio second')
+    ap.add_argument('--workers', type=int, default=2, help='in-process job workers')
+    ap.add_argument('--slots', type=int, default=1, help='concurrent inferences (WHISPER_INFERENCE_SLOTS)')
+    args = ap.parse_args()
+    os.environ.update(TRANSCRIBE_ENGINE='stub', STUB_ENGINE_LATENCY=str(args.latency), SYNC_TRANSCRIBE_MAX_MB='0',
+                      JOB_WORKERS=str(args.workers), WHISPER_INFERENCE_SLOTS=str(args.slots), WARMUP_WHISPER='0',
+                      JOB_POLL_SECONDS='0.2')
+    sys.path.insert(0, os.getcwd())
+    workdir = tempfile.mkdtemp(prefix='bench-pipeline-')
+    os.chdir(workdir)  # storage/ is relative: keep the run out of the real store
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services import job_queue, storage_access
+
+    payloads = [_wav(args.seconds, i) for i in range(args.files)]
+    with TestClient(app) as client:
+        t0 = time.perf_counter()
+        ids = []
+        for i, data in enumerate(payloads):
+            r = client.post('/media/upload', files={'file': (f'bench{i}.wav', io.BytesIO(data), 'audio/wav')})
+            ids.append(r.json()['id'])
+        t_upload = time.perf_counter() - t0
+        while job_queue.counts().get('queued', 0) or job_queue.counts().get('running', 0):
+            time.sleep(0.05)
+        wall = time.perf_counter() - t0
+    metas = [storage_access.load_media_meta(i) for i in ids]
+    latency = np.array([m['updated_at'] - m['created_at'] for m in metas])
+    done = sum(m['status'] == 'done' for m in metas)
+    audio_s = args.files * args.seconds
+    print(f"files={args.files} x {args.seconds:.0f}s  stub latency={args.latency}s/s  workers={args.workers} slots={args.slots}")
+    print(f"uploads:    {t_upload:7.2f}s ({args.files / t_upload:.1f}/s)")
+    print(f"completed:  {done}/{args.files} in {wall:.2f}s  throughput={audio_s / wall:.1f} audio-s/s")
+    print(f"latency:    p50={np.percentile(latency, 50):.2f}s p95={np.percentile(latency, 95):.2f}s max={latency.max():.2f}s")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
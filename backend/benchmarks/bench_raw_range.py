@@ -0,0 +1,59 @@
+"""Memory per concurrent viewer for /media/{id}/raw range playback.
+
+Each simulated viewer seeks to random offsets of a large file and pulls a window
+through RangeFileResponse with a sink that discards bytes (like a socket would).
+Peak Python heap should stay ~= viewers * CHUNK_SIZE, independent of file size
+and seek position.
+
+Run from backend/:
+  python -m benchmarks.bench_raw_range --size-mb 256 --viewers 1 8 32 64
+"""
+import argparse, asyncio, os, random, tempfile, time, tracemalloc
+from app.utils.http_range import RangeFileResponse, CHUNK_SIZE
+
+async def _viewer(path: str, size: int, seeks: int, window: int, rng: random.Random):
+    sent = 0
+    async def receive():
+        return {'type': 'http.disconnect'}
+    async def send(message):
+        nonlocal sent
+        sent += len(message.get('body', b''))
+    for _ in range(seeks):
+        start = rng.randrange(0, size - window)
+        headers = {'range': f'bytes={start}-{start + window - 1}'}
+        resp = RangeFileResponse(path, headers, size=size, mtime=0.0)
+        await resp({'type': 'http', 'method': 'GET'}, receive, send)
+    return sent
+
+async def _run(path: str, size: int, viewers: int, seeks: int, window: int):
+    rng = random.Random(viewers)
+    return sum(await asyncio.gather(*[_viewer(path, size, seeks, window, rng) for _ in range(viewers)]))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--size-mb', type=int, default=256)
+    ap.add_argument('--viewers', type=int, nargs='+', default=[1, 8, 32, 64])
+    ap.add_argument('--seeks', type=int, default=4)
+    ap.add_argument('--window-mb', type=int, default=4)
+    args = ap.parse_args()
+    size = args.size_mb * 1024 * 1024
+    window = args.window_mb * 1024 * 1024
+    with tempfile.NamedTemporaryFile(delete=False) as tmp:
+        tmp.truncate(size)
+        path = tmp.name
+    try:
+        print(f"file={args.size_mb}MB window={args.window_mb}MB chunk={CHUNK_SIZE // 1024}KB")
+        print(f"{'viewers':>8} {'MB sent':>9} {'seconds':>8} {'peak KB':>9} {'KB/viewer':>10}")
+        for n in args.viewers:
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            sent = asyncio.run(_run(path, size, n, args.seeks, window))
+            dur = time.perf_counter() - t0
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{n:>8} {sent / 2**20:>9.0f} {dur:>8.2f} {peak / 1024:>9.0f} {peak / 1024 / n:>10.1f}")
+    finally:
+        os.unlink(path)
+
+if __name__ == '__main__':
+    main()
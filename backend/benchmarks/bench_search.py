@@ -0,0 +1,76 @@
+"""Per-query latency of /media/{id}/search's lexical path: rank_bm25 per request vs the persisted index.
+
+The old path loads the transcript JSON, tokenizes every segment, builds a BM25Okapi
+and sorts all scores for each query. The new path builds storage/lexical/<id>.npz
+once (at transcript write) and answers from the cached index with vectorized
+scoring and argpartition top-k. Both are timed the way the endpoint runs them:
+the new column calls search_service.search (what GET /media/{id}/search returns,
+minus HTTP and its per-client rate limit), against a throwaway storage/ directory.
+A cold load (first query after a restart) is reported separately.
+
+Synthetic transcripts: Zipf-distributed words from a fixed vocabulary.
+
+Run from backend/:
+  python -m benchmarks.bench_search --segments 1000 10000 50000 --queries 200
+"""
+import argparse, asyncio, json, os, tempfile, time
+from pathlib import Path
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+def _transcript(n_segments: int, vocab: int, rng) -> dict:
+    words = np.array([f"w{i}" for i in range(vocab)])
+    segments = []
+    for i in range(n_segments):
+        ids = np.minimum(rng.zipf(1.3, size=rng.integers(5, 25)) - 1, vocab - 1)
+        segments.append({'start': i * 4.0, 'end': i * 4.0 + 4.0, 'text': ' ' + ' '.join(words[ids])})
+    return {'language': 'en', 'segments': segments}
+
+def _old_search(path: Path, query: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        segments = json.load(f).get('segments', [])
+    bm25 = BM25Okapi([seg.get('text', '').split() for seg in segments])
+    scores = bm25.get_scores(query.split())
+    return sorted(zip(segments, scores), key=lambda x: x[1], reverse=True)[:5]
+
+def _ms(fn, queries, repeat):
+    t0 = time.perf_counter()
+    for q in queries[:repeat]:
+        fn(q)
+    return (time.perf_counter() - t0) / min(repeat, len(queries)) * 1000
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--segments', type=int, nargs='+', default=[1000, 10000, 50000])
+    ap.add_argument('--vocab', type=int, default=20000)
+    ap.add_argument('--queries', type=int, default=200)
+    ap.add_argument('--old-queries', type=int, default=10, help='queries timed on the (slow) rank_bm25 path')
+    args = ap.parse_args()
+    rng = np.random.default_rng(0)
+    queries = [' '.join(f"w{int(w)}" for w in rng.integers(0, 500, size=rng.integers(1, 4))) for _ in range(args.queries)]
+    print(f"{'segments':>9} {'build ms':>9} {'npz KB':>8} {'cold ms':>8} {'old ms/q':>9} {'new ms/q':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # storage/ is relative: the app's files land in the throwaway directory
+        from app.services import lexical_index, search_service
+        from app.services.storage_access import transcript_path, write_json_atomic
+        loop = asyncio.new_event_loop()
+        for n in args.segments:
+            data = _transcript(n, args.vocab, rng)
+            media_id = f"bench-{n}"
+            t_path = transcript_path(media_id)
+            write_json_atomic(t_path, data)
+            t0 = time.perf_counter()
+            lexical_index.build(media_id, data['segments'])  # what store_transcript does
+            build = (time.perf_counter() - t0) * 1000
+            lexical_index._cache.clear()
+            t0 = time.perf_counter()
+            loop.run_until_complete(search_service.search(media_id, queries[0]))
+            cold = (time.perf_counter() - t0) * 1000
+            old = _ms(lambda q: _old_search(t_path, q), queries, args.old_queries)
+            new = _ms(lambda q: loop.run_until_complete(search_service.search(media_id, q)), queries, args.queries)
+            size = os.path.getsize(lexical_index.index_path(media_id)) / 1024
+            print(f"{n:>9} {build:>9.1f} {size:>8.0f} {cold:>8.1f} {old:>9.2f} {new:>9.3f} {old / new:>7.0f}x")
+        loop.close()
+
+if __name__ == '__main__':
+    main()
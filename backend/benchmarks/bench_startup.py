@@ -0,0 +1,49 @@
+"""Import-time profile of the API (`import app.main`) to catch startup regressions.
+
+Runs the import in a fresh interpreter with `-X importtime`, prints total time,
+the slowest modules by cumulative time, and any heavy ML/queue libraries that were
+pulled in at import (those must stay lazy). Exit code is 1 when --max-seconds is
+exceeded or a heavy module is imported, so it can gate CI.
+
+Run from backend/:
+  python -m benchmarks.bench_startup --top 15 --max-seconds 2
+"""
+import argparse, os, subprocess, sys
+from pathlib import Path
+
+HEAVY_MODULES = ('whisper', 'torch', 'faiss', 'sentence_transformers', 'celery', 'reportlab')
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+def profile():
+    probe = ("import sys, app.main; "
+             f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    # run from backend/ whatever the caller's cwd (app paths such as storage/ are relative to it)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(BACKEND_DIR), os.getenv('PYTHONPATH')])))
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe],
+                          capture_output=True, text=True, check=True, cwd=BACKEND_DIR, env=env)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cum_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cum_us), int(self_us), name[1:]))  # name keeps its nesting indent
+    heavy = [m for m in proc.stdout.strip().split(',') if m]
+    total = sum(cum for cum, _, name in rows if not name.startswith(' '))
+    return total / 1e6, sorted((cum, own, name.strip()) for cum, own, name in rows)[::-1], heavy
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--top', type=int, default=15)
+    ap.add_argument('--max-seconds', type=float, default=None)
+    args = ap.parse_args()
+    total, rows, heavy = profile()
+    print(f"import app.main: {total:.3f}s")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cum, own, name in rows[:args.top]:
+        print(f"{cum / 1000:>14.1f} {own / 1000:>9.1f}  {name}")
+    print(f"heavy modules imported: {', '.join(heavy) or 'none'}")
+    if heavy or (args.max_seconds is not None and total > args.max_seconds):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -16,3 +16,33 @@ async def client():
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url='http://test') as ac:
         yield ac
+
+@pytest.fixture
+def tmp_storage(tmp_path, monkeypatch):
+    """Point every storage location (files, manifest, indexes, job queue) at tmp_path/storage.
+
+    Modules bind their paths at import time, so each one is patched; the thread-local
+    SQLite connections are keyed by path and reopen on the new location.
+    """
+    from app import unified_media
+    from app.services import (audio_cache, chunked_upload, dedup_service, embedding_service, job_queue,
+                              lexical_index, library_search, manifest, media_pipeline, session_buffer,
+                              storage_access, whisper_service)
+    root = tmp_path / 'storage'
+    root.mkdir()
+    for module in (storage_access, manifest, job_queue, media_pipeline, dedup_service, audio_cache,
+                   chunked_upload, session_buffer, lexical_index, whisper_service, library_search, unified_media):
+        if hasattr(module, 'STORAGE'):
+            monkeypatch.setattr(module, 'STORAGE', root)
+    monkeypatch.setattr(manifest, 'MANIFEST_PATH', root / 'manifest.sqlite3')
+    monkeypatch.setattr(job_queue, 'JOBS_PATH', root / 'jobs.sqlite3')
+    monkeypatch.setattr(dedup_service, 'INDEX_PATH', root / 'content_index.sqlite3')
+    monkeypatch.setattr(audio_cache, 'AUDIO_DIR', root / 'audio')
+    monkeypatch.setattr(chunked_upload, 'UPLOADS_DIR', root / 'uploads')
+    monkeypatch.setattr(session_buffer, 'SPILL_DIR', root / 'realtime_spill')
+    monkeypatch.setattr(lexical_index, 'LEX_DIR', root / 'lexical')
+    monkeypatch.setattr(whisper_service, 'CHECKPOINT_DIR', root / 'checkpoints')
+    monkeypatch.setattr(library_search, 'SEARCH_DIR', root / 'search')
+    monkeypatch.setattr(embedding_service, 'EMB_DIR', root / 'embeddings')
+    monkeypatch.setattr(dedup_service, 'EMB_DIR', root / 'embeddings')
+    return root
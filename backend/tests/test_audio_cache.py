@@ -0,0 +1,42 @@
+import os
+import numpy as np
+from app.services import audio_cache, whisper_service
+
+def test_pcm_roundtrip_and_chunked_energy(tmp_path):
+    samples = (np.sin(np.arange(16000) / 10) * 20000).astype('<i2')
+    path = tmp_path / 'x.s16'
+    path.write_bytes(samples.tobytes())
+    mm = audio_cache.open_pcm(path)
+    assert isinstance(mm, np.memmap) and len(mm) == 16000
+    f = audio_cache.to_float32(mm)
+    assert f.dtype == np.float32 and np.abs(f).max() <= 1.0
+    frame = 160
+    direct = np.sqrt(np.mean(np.square(samples[:16000 // frame * frame].astype(np.float64).reshape(-1, frame)), axis=1))
+    assert np.allclose(whisper_service.frame_energy(mm, frame, block_frames=7), direct)
+
+def test_ensure_reuses_cached_decode(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_cache, 'AUDIO_DIR', tmp_path)
+    calls = []
+    def fake_decode(src, dest):
+        calls.append(src)
+        dest.write_bytes(np.zeros(10, dtype='<i2').tobytes())
+    monkeypatch.setattr(audio_cache, 'decode_to_pcm', fake_decode)
+    a = audio_cache.ensure('a.mp4', 'abc')
+    b = audio_cache.ensure('copy-of-a.mp4', 'abc')
+    audio_cache.ensure('b.mp4', 'def')
+    assert a == b and calls == ['a.mp4', 'b.mp4']
+
+def test_cache_evicts_least_recently_used_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_cache, 'AUDIO_DIR', tmp_path)
+    monkeypatch.setattr(audio_cache, 'CACHE_BYTES', 250)
+    monkeypatch.setattr(audio_cache, 'CACHE_MIN_AGE', 0)
+    monkeypatch.setattr(audio_cache, 'decode_to_pcm', lambda src, dest: dest.write_bytes(b'\0' * 100))
+    for i, sha in enumerate(('a', 'b')):
+        audio_cache.ensure(f'{sha}.mp4', sha)
+        os.utime(audio_cache.pcm_path(sha), (1000 + i, 1000 + i))
+    audio_cache.ensure('a.mp4', 'a')  # hit: 'a' becomes the most recently used entry
+    audio_cache.ensure('c.mp4', 'c')
+    assert sorted(p.stem for p in tmp_path.glob('*.s16')) == ['a', 'c']
+    monkeypatch.setattr(audio_cache, 'CACHE_MIN_AGE', 3600)
+    audio_cache.ensure('d.mp4', 'd')  # everything left was used recently: over budget, nothing evicted
+    assert len(list(tmp_path.glob('*.s16'))) == 3
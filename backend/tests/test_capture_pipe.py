@@ -0,0 +1,85 @@
+import asyncio, json
+import numpy as np
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import engines, pcm_pipe, session_buffer, capture_protocol
+from app.websocket import capture_ws
+
+def test_ring_buffer_wraps_and_clamps_to_retained_audio():
+    ring = pcm_pipe.PcmRingBuffer(seconds=1, sample_rate=10)
+    ring.append(np.arange(7, dtype='<i2'))
+    ring.append(np.arange(7, 14, dtype='<i2'))
+    assert ring.total == 14 and ring.start == 4
+    assert ring.read(0).tolist() == list(range(4, 14))
+    assert ring.read(8, 12).tolist() == [8, 9, 10, 11]
+    ring.append(np.arange(14, 40, dtype='<i2'))  # longer than the ring: only the tail is kept
+    assert ring.total == 40 and ring.read(0).tolist() == list(range(30, 40))
+    assert ring.read(50).size == 0
+
+def test_decoder_streams_stdout_into_ring_across_odd_reads():
+    async def run():
+        # `cat` stands in for ffmpeg: the bytes written are the PCM read back
+        decoder = await pcm_pipe.FfmpegPcmDecoder(cmd=['cat']).start()
+        pcm = np.arange(1000, dtype='<i2').tobytes()
+        await decoder.feed(pcm[:301])
+        await decoder.feed(pcm[301:])
+        await decoder.close()
+        return decoder
+    decoder = asyncio.run(run())
+    assert decoder.bytes_in == 2000 and not decoder.alive
+    assert decoder.ring.read(0).tolist() == list(range(1000))
+
+def test_capture_session_uses_one_decoder_for_all_blobs(monkeypatch):
+    monkeypatch.setattr(pcm_pipe, 'FFMPEG_CMD', ['cat'])
+    monkeypatch.setattr(capture_ws, 'MIN_BUFFER_SECONDS', 0.05)
+    monkeypatch.setattr(engines, 'ENGINE', 'stub')
+    monkeypatch.setitem(engines._instances, 'stub', engines.StubEngine(latency=0.0, segment_seconds=1))
+    audio = (np.sin(np.arange(3 * 16000) / 5) * 6000).astype('<i2').tobytes()
+    with TestClient(app) as client, client.websocket_connect('/v1/ws/capture') as ws:
+        ws.send_text(json.dumps({'type': 'start', 'buffer_seconds': 0.05}))
+        assert json.loads(ws.receive_text())['type'] == 'started'
+        acks, partials = [], []
+        for i in range(0, len(audio), 32000):
+            ws.send_bytes(audio[i:i + 32000])
+        ws.send_text(json.dumps({'type': 'stop'}))
+        while True:
+            msg = json.loads(ws.receive_text())
+            if msg['type'] == 'final':
+                break
+            (acks if msg['type'] == 'ack' else partials).append(msg)
+    assert [a['seq'] for a in acks] == [1, 2, 3]
+    segments = [s for p in partials if p['type'] == 'partial' for s in p['segments']]
+    assert segments[0]['start'] == 0.0 and segments[-1]['end'] == 3.0
+    assert all(a['end'] <= b['start'] + 1e-9 for a, b in zip(segments, segments[1:])) and msg['text'].strip()
+    assert session_buffer.BUDGET.used == 0  # reservation released with the session
+
+def test_compact_protocol_sends_binary_deltas_and_batched_acks(monkeypatch):
+    monkeypatch.setattr(pcm_pipe, 'FFMPEG_CMD', ['cat'])
+    monkeypatch.setattr(capture_ws, 'MIN_BUFFER_SECONDS', 0.05)
+    monkeypatch.setattr(engines, 'ENGINE', 'stub')
+    monkeypatch.setitem(engines._instances, 'stub', engines.StubEngine(latency=0.0, segment_seconds=1))
+    audio = (np.sin(np.arange(4 * 16000) / 5) * 6000).astype('<i2').tobytes()
+    with TestClient(app) as client, client.websocket_connect('/v1/ws/capture?protocol=compact') as ws:
+        ws.send_text(json.dumps({'type': 'start', 'buffer_seconds': 0.05}))
+        assert json.loads(ws.receive_text())['protocol'] == 'compact'
+        for i in range(0, len(audio), 8000):
+            ws.send_bytes(audio[i:i + 8000])
+        ws.send_text(json.dumps({'type': 'stop'}))
+        frames = []
+        while True:
+            msg = ws.receive()
+            if msg.get('bytes') is None:
+                continue  # JSON control messages ('stopping')
+            frames.append(capture_protocol.decode(msg['bytes']))
+            if frames[-1]['type'] == 'final':
+                break
+    assert [f['seq'] for f in frames] == list(range(1, len(frames) + 1))
+    acks = [f for f in frames if f['type'] == 'ack']
+    assert 0 < len(acks) < 16 and acks[-1]['blobs'] == 16 and acks[-1]['bytes'] == len(audio)
+    committed = []
+    for f in frames:
+        if f['type'] == 'partial':
+            assert f['commit_index'] == len(committed)
+            committed.extend(f['segments'])
+    assert frames[-1]['committed'] == len(committed) and committed[-1]['end'] == 4.0
+    assert frames[-1]['text'] == ''.join(s['text'] for s in committed)
@@ -0,0 +1,114 @@
+import json, time
+import numpy as np
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import engines, pcm_pipe, session_buffer
+from app.services.storage_access import load_media_meta, load_transcript, STORAGE
+from app.websocket import capture_ws
+
+BLOB = 32000  # one second of 16 kHz int16 (`cat` stands in for ffmpeg)
+
+def _stub(monkeypatch):
+    monkeypatch.setattr(pcm_pipe, 'FFMPEG_CMD', ['cat'])
+    monkeypatch.setattr(capture_ws, 'MIN_BUFFER_SECONDS', 0.05)
+    monkeypatch.setattr(engines, 'ENGINE', 'stub')
+    monkeypatch.setitem(engines._instances, 'stub', engines.StubEngine(latency=0.0, segment_seconds=1))
+
+def _audio(seconds):
+    return (np.sin(np.arange(seconds * 16000) / 5) * 6000).astype('<i2').tobytes()
+
+def _until(ws, kind):
+    while True:
+        msg = json.loads(ws.receive_text())
+        if msg['type'] == kind:
+            return msg
+
+def _wait(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+def test_dropped_session_resumes_and_is_stored_once(monkeypatch):
+    _stub(monkeypatch)
+    audio = _audio(6)
+    with TestClient(app) as client:
+        with client.websocket_connect('/v1/ws/capture') as ws:
+            ws.send_text(json.dumps({'type': 'start', 'buffer_seconds': 0.05}))
+            started = _until(ws, 'started')
+            sid, token = started['session_id'], started['resume_token']
+            for i in range(0, 3 * BLOB, BLOB):
+                ws.send_bytes(audio[i:i + BLOB])
+            assert _until(ws, 'ack')['seq'] == 1
+        session = capture_ws.SESSIONS[sid]
+        _wait(lambda: session.ws is None)  # socket gone, session kept for the grace period
+        with client.websocket_connect('/v1/ws/capture') as ws:
+            # the id alone (or with a wrong token) does not take over a live session
+            ws.send_text(json.dumps({'type': 'resume', 'session_id': sid, 'commit_index': 0}))
+            assert _until(ws, 'error')['code'] == 'unknown_session'
+            ws.send_text(json.dumps({'type': 'resume', 'session_id': sid, 'resume_token': token[::-1]}))
+            assert _until(ws, 'error')['code'] == 'unknown_session'
+            assert session.ws is None
+            ws.send_text(json.dumps({'type': 'resume', 'session_id': sid, 'resume_token': token, 'commit_index': 0}))
+            resumed = _until(ws, 'resumed')
+            assert resumed['blobs'] == 3 and resumed['bytes'] == 3 * BLOB
+            resync = _until(ws, 'partial')
+            assert resync['commit_index'] == 0 and len(resync['segments']) >= resumed['commit_index']
+            for i in range(3 * BLOB, len(audio), BLOB):
+                ws.send_bytes(audio[i:i + BLOB])
+            ws.send_text(json.dumps({'type': 'stop'}))
+            final = _until(ws, 'final')
+            assert _until(ws, 'saved')['media_id'] == final['media_id']
+        _wait(lambda: sid not in capture_ws.SESSIONS)
+    meta = load_media_meta(final['media_id'])
+    assert meta['source'] == 'live' and meta['session_id'] == sid and meta['status'] == 'done'
+    assert (STORAGE / meta['raw']).read_bytes() == audio
+    transcript = load_transcript(final['media_id'])
+    segments = transcript['segments']
+    assert segments[0]['start'] == 0.0 and segments[-1]['end'] == 6.0 and transcript['text'] == final['text']
+    assert session_buffer.BUDGET.used == 0
+
+def test_unresumed_session_is_stored_after_the_grace_period(monkeypatch):
+    _stub(monkeypatch)
+    monkeypatch.setattr(capture_ws, 'RESUME_GRACE_SECONDS', 0.05)
+    with TestClient(app) as client:
+        with client.websocket_connect('/v1/ws/capture') as ws:
+            ws.send_text(json.dumps({'type': 'start', 'buffer_seconds': 0.05}))
+            started = _until(ws, 'started')
+            sid = started['session_id']
+            ws.send_bytes(_audio(2))
+            _until(ws, 'ack')
+            session = capture_ws.SESSIONS[sid]
+        _wait(lambda: sid not in capture_ws.SESSIONS)
+        with client.websocket_connect('/v1/ws/capture') as ws:
+            ws.send_text(json.dumps({'type': 'resume', 'session_id': sid, 'resume_token': started['resume_token']}))
+            assert _until(ws, 'error')['code'] == 'unknown_session'
+    transcript = load_transcript(session.media_id)
+    assert transcript['segments'][-1]['end'] == 2.0 and load_media_meta(session.media_id)['size'] == 2 * BLOB
+
+def test_session_ids_are_chosen_by_the_server(tmp_storage, monkeypatch):
+    _stub(monkeypatch)
+    with TestClient(app) as client, client.websocket_connect('/v1/ws/capture') as ws:
+        ws.send_text(json.dumps({'type': 'start', 'session_id': 'chosen-by-client'}))
+        started = _until(ws, 'started')
+        assert started['session_id'] != 'chosen-by-client' and 'chosen-by-client' not in capture_ws.SESSIONS
+        assert len(started['resume_token']) >= 32
+        ws.send_text(json.dumps({'type': 'start'}))
+        assert _until(ws, 'error')['code'] == 'session_exists'  # one live session per connection
+        ws.send_text(json.dumps({'type': 'stop'}))
+        _until(ws, 'final')
+
+def test_audio_after_stop_is_not_stored(tmp_storage, monkeypatch):
+    _stub(monkeypatch)
+    audio = _audio(3)
+    with TestClient(app) as client, client.websocket_connect('/v1/ws/capture') as ws:
+        ws.send_text(json.dumps({'type': 'start', 'buffer_seconds': 0.05}))
+        _until(ws, 'started')
+        ws.send_bytes(audio[:2 * BLOB])
+        ws.send_text(json.dumps({'type': 'stop'}))
+        ws.send_bytes(audio[2 * BLOB:])
+        assert _until(ws, 'error')['code'] == 'session_stopped'
+        saved = _until(ws, 'saved')
+    meta = load_media_meta(saved['media_id'])
+    assert meta['size'] == 2 * BLOB and (tmp_storage / meta['raw']).read_bytes() == audio[:2 * BLOB]
+    assert session_buffer.BUDGET.used == 0
@@ -0,0 +1,62 @@
+import contextlib
+import numpy as np
+import pytest
+from app.services import whisper_service as ws
+
+SR = ws.SAMPLE_RATE
+
+class _Model:
+    """Deterministic stand-in: one segment per piece, text derived from position and prompt."""
+    def __init__(self, crash_at=None):
+        self.calls, self.crash_at = [], crash_at
+
+    def transcribe(self, audio, verbose=False, language=None, initial_prompt=None):
+        self.calls.append((len(audio), language, initial_prompt))
+        if self.crash_at is not None and len(self.calls) == self.crash_at:
+            raise RuntimeError('worker died')
+        n = len(self.calls)
+        return {'language': language or 'de',
+                'segments': [{'start': 0.0, 'end': len(audio) / SR, 'text': f' p{n}:{len(initial_prompt or "")}'}]}
+
+def _audio():
+    t = np.arange(100 * SR) / SR
+    audio = (0.3 * np.sin(2 * np.pi * 220 * t)).astype('float32')
+    for a in (29, 58, 87):
+        audio[a * SR:(a + 1) * SR] = 0.0
+    return audio
+
+def _run(monkeypatch, model, audio):
+    monkeypatch.setattr(ws.model_registry, 'acquire', lambda *a, **k: contextlib.nullcontext(model))
+    return ws.transcribe_resumable(audio, 'abc', piece_s=30)
+
+def test_resumed_run_matches_uninterrupted(tmp_path, monkeypatch):
+    monkeypatch.setattr(ws, 'CHECKPOINT_DIR', tmp_path)
+    audio = _audio()
+    reference = _run(monkeypatch, _Model(), audio)
+    assert len(reference['segments']) == 3 and not ws.checkpoint_path('abc').exists()
+
+    crashing = _Model(crash_at=3)
+    with pytest.raises(RuntimeError):
+        _run(monkeypatch, crashing, audio)
+    assert ws.checkpoint_path('abc').exists()
+
+    resumed_model = _Model()
+    resumed_model.calls = crashing.calls[:2]  # the work committed before the crash
+    resumed = _run(monkeypatch, resumed_model, audio)
+    assert resumed == reference
+    assert len(resumed_model.calls) == 3  # only the last piece was decoded again
+    # later pieces keep the detected language and the committed text as prompt
+    assert resumed_model.calls[2][1] == 'de' and resumed_model.calls[2][2] == ' p1:0 p2:5'
+    assert not ws.checkpoint_path('abc').exists()
+
+def test_checkpoints_are_keyed_by_media_not_content(monkeypatch):
+    keys = []
+    monkeypatch.setattr(ws.engines, 'ENGINE', 'stub')
+    monkeypatch.setattr(ws.vad, 'ENABLED', False)
+    monkeypatch.setattr(ws, 'CHECKPOINT_SECONDS', 10)
+    monkeypatch.setattr(ws.audio_cache, 'ensure', lambda path, sha256: 'cached.s16')
+    monkeypatch.setattr(ws.audio_cache, 'open_pcm', lambda pcm: _audio())
+    monkeypatch.setattr(ws, 'transcribe_resumable', lambda audio, key, **kw: keys.append(key) or {'segments': []})
+    for mid in ('upload-1', 'upload-2'):  # byte-identical uploads transcribed at the same time
+        ws.transcribe_to_segments('clip.wav', sha256='same-bytes', media_id=mid)
+    assert keys[0].startswith('upload-1_') and keys[1].startswith('upload-2_')
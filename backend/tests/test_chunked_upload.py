@@ -0,0 +1,81 @@
+import io, json, os, subprocess, sys, time, uuid
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import chunked_upload, storage_access, job_queue
+
+def _send(client, upload_id, idx, data, total, chunk_size=None):
+    fields = {'upload_id': upload_id, 'chunk_index': str(idx), 'total_chunks': str(total), 'filename': 'clip.wav'}
+    if chunk_size:
+        fields['chunk_size'] = str(chunk_size)
+    return client.post('/media/upload/chunk', data=fields, files={'chunk': ('blob', io.BytesIO(data), 'audio/wav')})
+
+def test_resumable_chunked_upload_out_of_order(tmp_storage):
+    client = TestClient(app)
+    payload = os.urandom(10_000)
+    size = 4096
+    parts = [payload[i:i + size] for i in range(0, len(payload), size)]
+    upload_id = uuid.uuid4().hex
+    r = _send(client, upload_id, 1, parts[1], len(parts))
+    assert r.status_code == 200, r.text
+    assert r.json()['missing'] == [[0, 0], [2, 2]]
+    status = client.get(f'/media/upload/{upload_id}/status').json()
+    assert status['received_chunks'] == 1 and status['state'] == 'open'
+    _send(client, upload_id, 2, parts[2], len(parts))
+    r = _send(client, upload_id, 0, parts[0], len(parts))
+    body = r.json()
+    assert body['assembled'] and body['media_id']
+    raw = storage_access.find_raw_media(body['media_id'])
+    assert raw.read_bytes() == payload
+    # retried final chunk resolves to the same media item instead of re-finalizing
+    again = _send(client, upload_id, 0, parts[0], len(parts)).json()
+    assert again['media_id'] == body['media_id']
+    assert client.get(f"/media/{body['media_id']}").json()['status'] == 'processing'
+    assert job_queue.drain() == 1  # transcription runs on the job queue
+    assert client.get(f"/media/{body['media_id']}").json()['status'] == 'done'
+    assert 'error' not in storage_access.load_transcript(body['media_id'])
+
+def test_last_chunk_first_requires_chunk_size(tmp_storage):
+    client = TestClient(app)
+    r = _send(client, uuid.uuid4().hex, 2, b'abc', 3)
+    assert r.status_code == 400
+    r = _send(client, '../escape', 0, b'abc', 1)
+    assert r.status_code == 400
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    return proc.pid
+
+def test_claim_of_a_dead_finalizer_is_reclaimed(tmp_storage, monkeypatch):
+    client = TestClient(app, raise_server_exceptions=False)
+    payload = os.urandom(6000)
+    upload_id = uuid.uuid4().hex
+    _send(client, upload_id, 0, payload[:4096], 2)
+    real_complete = chunked_upload.complete
+    monkeypatch.setattr(chunked_upload, 'complete', lambda *a, **k: 1 / 0)  # finalizer dies after the claim
+    assert _send(client, upload_id, 1, payload[4096:], 2).status_code == 500
+    monkeypatch.setattr(chunked_upload, 'complete', real_complete)
+    lock = chunked_upload.UPLOADS_DIR / upload_id / 'finalize.lock'
+    assert json.loads(lock.read_text())['pid'] == os.getpid()
+    # the claimer is alive: others wait for it
+    assert client.get(f'/media/upload/{upload_id}/status').json()['state'] == 'finalizing'
+    assert _send(client, upload_id, 1, payload[4096:], 2).json()['state'] == 'finalizing'
+    lock.write_text(json.dumps({'pid': _dead_pid(), 'claimed_at': time.time()}))
+    assert client.get(f'/media/upload/{upload_id}/status').json()['state'] == 'open'
+    body = _send(client, upload_id, 1, payload[4096:], 2).json()
+    assert body['assembled'] and storage_access.find_raw_media(body['media_id']).read_bytes() == payload
+
+def test_startup_purge_drops_only_abandoned_claims(tmp_storage, monkeypatch):
+    client = TestClient(app)
+    sessions = []
+    for _ in range(3):
+        upload_id = uuid.uuid4().hex
+        _send(client, upload_id, 0, b'abc', 2, chunk_size=3)
+        sessions.append(chunked_upload.UPLOADS_DIR / upload_id)
+    old, dead, live = sessions
+    (old / 'finalize.lock').write_text(json.dumps({'pid': os.getpid(), 'claimed_at': time.time() - 3600}))
+    (dead / 'finalize.lock').write_text(json.dumps({'pid': _dead_pid(), 'claimed_at': time.time()}))
+    (live / 'finalize.lock').write_text(json.dumps({'pid': os.getpid(), 'claimed_at': time.time()}))
+    monkeypatch.setattr(chunked_upload, 'FINALIZE_TIMEOUT_SECONDS', 600)
+    assert chunked_upload.purge_stale_locks() == 2
+    assert [(s / 'finalize.lock').exists() for s in sessions] == [False, False, True]
@@ -0,0 +1,37 @@
+import io, os
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import lexical_index, whisper_service, storage_access
+
+def _upload(client, payload):
+    r = client.post('/media/upload', files={'file': ('dup.wav', io.BytesIO(payload), 'audio/wav')})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+def test_identical_upload_reuses_transcript(tmp_storage, monkeypatch):
+    client = TestClient(app)
+    calls = []
+    def fake_transcribe(path, sha256=None, **kwargs):
+        calls.append(path)
+        return {'language': 'en', 'text': 'hello', 'segments': [{'start': 0.0, 'end': 1.0, 'text': 'hello'}]}
+    monkeypatch.setattr(whisper_service, 'transcribe_to_segments', fake_transcribe)
+    payload = os.urandom(50_000)
+    first = _upload(client, payload)
+    second = _upload(client, payload)
+    assert len(calls) == 1
+    assert second['status'] == 'done' and second['deduplicated_from'] == first['id']
+    assert storage_access.load_transcript(second['id']) == storage_access.load_transcript(first['id'])
+    assert client.get(f"/media/{second['id']}").json()['status'] == 'done'
+    # the clone owns its transcript: rewriting one in place leaves the other alone
+    first_path, second_path = (storage_access.transcript_path(item['id']) for item in (first, second))
+    assert not os.path.samefile(first_path, second_path)
+    lexical = [lexical_index.index_path(item['id']) for item in (first, second)]
+    assert os.path.samefile(*lexical)  # renamed into place on rewrite, so shared
+    # Deleting the source transcript invalidates it; the clone becomes the source
+    storage_access.transcript_path(first['id']).unlink()
+    third = _upload(client, payload)
+    assert third['deduplicated_from'] == second['id'] and len(calls) == 1
+    for item in (second, third):
+        storage_access.transcript_path(item['id']).unlink()
+    fourth = _upload(client, payload)
+    assert 'deduplicated_from' not in fourth and len(calls) == 2
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from app.services import embedding_service, job_queue, library_search, media_pipeline, search_service, whisper_service
+from app.services.storage_access import load_media_meta, save_media_meta
+
+class FakeFaiss:
+    """Exact inner-product index with the few faiss calls embedding_service uses."""
+    class IndexFlatIP:
+        def __init__(self, dim):
+            self.vectors = np.zeros((0, dim), dtype=np.float32)
+        @property
+        def ntotal(self):
+            return len(self.vectors)
+        def add(self, x):
+            self.vectors = np.vstack([self.vectors, x])
+        def search(self, q, k):
+            sims = q @ self.vectors.T
+            ids = np.argsort(-sims, axis=1)[:, :k]
+            return np.take_along_axis(sims, ids, axis=1), ids
+        def reconstruct_n(self, start, n):
+            return self.vectors[start:start + n]
+    @staticmethod
+    def write_index(index, path):
+        with open(path, 'wb') as f:
+            np.save(f, index.vectors)
+    @classmethod
+    def read_index(cls, path):
+        index = cls.IndexFlatIP(1)
+        index.vectors = np.load(path)
+        return index
+
+SEGMENTS = [{'start': 0.0, 'end': 1.0, 'text': ' quarterly budget review'},
+            {'start': 1.0, 'end': 2.0, 'text': ' hiring plan'}]
+
+@pytest.mark.anyio
+async def test_embedding_index_is_built_in_the_background_and_keyed_by_transcript(tmp_storage, monkeypatch):
+    monkeypatch.setattr(embedding_service, '_faiss', FakeFaiss())
+    monkeypatch.setattr(embedding_service, 'EAGER', True)
+    mid = 'eager-embed-test'
+    save_media_meta(mid, {'id': mid, 'status': 'processing'})
+    media_pipeline.store_transcript(mid, {'language': 'en', 'segments': SEGMENTS})
+    assert job_queue.get(f'embed:{mid}')['status'] == 'queued'
+    status, pending = await search_service.search_with_status(mid, 'hiring')
+    assert status == 'building' and pending[0]['text'] == ' hiring plan'  # lexical meanwhile
+
+    assert job_queue.run_job(f'embed:{mid}') == 'done'
+    assert job_queue.get(f'embed:{mid}')['result'] == {'segments': 2} and library_search.has_vector(mid)
+    status, ready = await search_service.search_with_status(mid, ' quarterly budget review')
+    assert status == 'ready' and ready[0]['timestamp'] == 0.0
+    assert await search_service.search(mid, ' quarterly budget review') == ready
+    assert embedding_service.build_index(mid) == {'skipped': 'up to date'}  # same transcript hash
+
+    media_pipeline.store_transcript(mid, {'language': 'en', 'segments': SEGMENTS[:1]})
+    assert embedding_service.index_status(mid) == 'building'
+    assert job_queue.run_job(f'embed:{mid}') == 'done' and embedding_service.index_status(mid) == 'ready'
+
+def test_refine_keeps_the_index_built_for_the_final_transcript(tmp_storage, monkeypatch):
+    monkeypatch.setattr(embedding_service, '_faiss', FakeFaiss())
+    monkeypatch.setattr(embedding_service, 'EAGER', True)
+    monkeypatch.setattr(embedding_service, 'enqueue', embedding_service.build_index)  # a worker that is done at once
+    monkeypatch.setattr(whisper_service, 'transcribe_to_segments', lambda *a, **k: {'language': 'en', 'segments': SEGMENTS})
+    mid = 'refine-embed-test'
+    raw = tmp_storage / f'{mid}.wav'
+    raw.write_bytes(b'audio')
+    save_media_meta(mid, {'id': mid, 'status': 'processing'})
+    media_pipeline.store_transcript(mid, {'language': 'en', 'segments': SEGMENTS[:1]}, quality='draft')
+    assert embedding_service.index_status(mid) == 'ready'
+    assert media_pipeline.refine_job({'media_id': mid, 'path': str(raw)}, {}) == {'segments': 2}
+    assert load_media_meta(mid)['quality'] == 'final' and embedding_service.index_status(mid) == 'ready'
+
+@pytest.mark.anyio
+async def test_search_only_reports_status_and_startup_requeues_lost_builds(tmp_storage, monkeypatch):
+    monkeypatch.setattr(embedding_service, '_faiss', FakeFaiss())
+    monkeypatch.setattr(embedding_service, 'EAGER', True)
+    mid = 'lost-embed-test'
+    save_media_meta(mid, {'id': mid, 'status': 'processing'})
+    with monkeypatch.context() as m:
+        m.setattr(embedding_service, 'enqueue', lambda media_id: None)  # the build job got lost
+        media_pipeline.store_transcript(mid, {'language': 'en', 'segments': SEGMENTS})
+    for _ in range(3):
+        status, results = await search_service.search_with_status(mid, 'hiring')
+        assert status == 'building' and results
+    assert job_queue.get(f'embed:{mid}') is None  # polling search queues nothing
+    assert embedding_service.backfill() == 1 and job_queue.get(f'embed:{mid}')['status'] == 'queued'
+    assert job_queue.run_job(f'embed:{mid}') == 'done' and embedding_service.index_status(mid) == 'ready'
+    assert embedding_service.backfill() == 0
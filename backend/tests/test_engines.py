@@ -0,0 +1,39 @@
+import wave
+import numpy as np
+from app.services import engines, whisper_service
+
+def _wav_file(path, seconds, rate=8000):
+    t = np.arange(int(seconds * rate)) / rate
+    with wave.open(str(path), 'wb') as wf:
+        wf.setnchannels(2); wf.setsampwidth(2); wf.setframerate(rate)
+        stereo = np.repeat((0.2 * np.sin(2 * np.pi * 200 * t) * 32767).astype('<i2'), 2)
+        wf.writeframes(stereo.tobytes())
+
+def test_stub_engine_is_deterministic_and_reports_capabilities():
+    stub = engines.StubEngine(latency=0.0, segment_seconds=2)
+    audio = (np.sin(np.arange(5 * 16000) / 7) * 8000).astype('<i2')
+    a = stub.transcribe_pcm(audio, word_timestamps=True)
+    assert a == stub.transcribe_pcm(audio.copy(), word_timestamps=True)
+    assert [s['start'] for s in a['segments']] == [0.0, 2.0, 4.0] and a['segments'][-1]['end'] == 5.0
+    assert len(a['segments'][0]['words']) == 3 and a['language'] == 'en'
+    caps = stub.capabilities()
+    assert caps['name'] == 'stub' and caps['word_timestamps'] and not caps['language_detect']
+    decoder = stub.stream()
+    decoder.feed(audio[:16000]); decoder.feed(audio[16000:])
+    assert decoder.partial()['segments'] == stub.transcribe_pcm(audio)['segments']
+
+def test_pipeline_runs_on_configured_engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(engines, 'ENGINE', 'stub')
+    monkeypatch.setitem(engines._instances, 'stub', engines.StubEngine(latency=0.0, segment_seconds=1))
+    src = tmp_path / 'clip.wav'
+    _wav_file(src, 3)
+    result = whisper_service.transcribe_to_segments(str(src))
+    assert len(result['segments']) == 3 and result['text'].strip()
+    progress = []
+    whisper_service.transcribe_to_segments(str(src), on_progress=lambda d, t, s: progress.append((d, t)))
+    assert progress == [(3.0, 3.0)]
+
+def test_engines_register_by_path(monkeypatch):
+    monkeypatch.setitem(engines.ENGINES, 'mine', 'app.services.engines:StubEngine')
+    monkeypatch.setattr(engines, '_instances', {})
+    assert isinstance(engines.get_engine('mine'), engines.StubEngine)
@@ -0,0 +1,102 @@
+import asyncio, sqlite3, time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import job_queue
+
+CALLS = []
+
+def flaky(payload, job):
+    CALLS.append((payload['n'], job['attempts']))
+    if job['attempts'] < payload.get('fail_times', 0) + 1:
+        raise RuntimeError('boom')
+    return {'n': payload['n']}
+
+LOOPS = []
+
+def async_handler(payload, job):
+    async def step():
+        LOOPS.append(asyncio.get_running_loop())
+    job_queue.run_async(step())
+
+def _use_tmp_queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, 'JOBS_PATH', tmp_path / 'jobs.sqlite3')
+    monkeypatch.setattr(job_queue, 'RETRY_BASE_SECONDS', 0)
+    monkeypatch.setitem(job_queue.HANDLERS, 'flaky', f'{__name__}:flaky')
+    monkeypatch.setitem(job_queue.HANDLERS, 'async', f'{__name__}:async_handler')
+    CALLS.clear()
+    LOOPS.clear()
+
+def test_priority_retry_and_status(tmp_path, monkeypatch):
+    _use_tmp_queue(tmp_path, monkeypatch)
+    low = job_queue.enqueue('flaky', {'n': 1})
+    high = job_queue.enqueue('flaky', {'n': 2, 'fail_times': 1}, priority=5)
+    assert job_queue.enqueue('flaky', {'n': 2}, job_id=high) == high  # active id is not duplicated
+    assert job_queue.drain() == 3
+    assert CALLS == [(2, 1), (2, 2), (1, 1)]
+    job = job_queue.get(high)
+    assert job['status'] == 'done' and job['attempts'] == 2 and job['result'] == {'n': 2}
+    assert job_queue.get(low)['status'] == 'done'
+    failing = job_queue.enqueue('flaky', {'n': 3, 'fail_times': 9}, max_attempts=2)
+    job_queue.drain()
+    job = job_queue.get(failing)
+    assert job['status'] == 'failed' and job['attempts'] == 2 and 'boom' in job['error']
+    body = TestClient(app).get(f'/jobs/{failing}').json()
+    assert body['status'] == 'failed'
+    assert TestClient(app).get('/jobs/nope').status_code == 404
+
+def test_expired_lease_is_reclaimed(tmp_path, monkeypatch):
+    _use_tmp_queue(tmp_path, monkeypatch)
+    job_id = job_queue.enqueue('flaky', {'n': 4})
+    assert job_queue.claim('dead-worker', lease_seconds=0.01)['id'] == job_id
+    assert job_queue.claim('other') is None  # still leased
+    time.sleep(0.05)
+    job = job_queue.claim('other')
+    assert job['id'] == job_id and job['attempts'] == 2
+    job_queue.complete(job_id, 'dead-worker')  # stale owner cannot finish it
+    assert job_queue.get(job_id)['status'] == 'running'
+    assert job_queue.execute(job, 'other') == 'done'
+
+def test_worker_reuses_one_event_loop(tmp_path, monkeypatch):
+    _use_tmp_queue(tmp_path, monkeypatch)
+    for _ in range(3):
+        job_queue.enqueue('async', {})
+    pool = job_queue.WorkerPool(workers=1, poll_seconds=0.01).start()
+    try:
+        deadline = time.time() + 5
+        while len(LOOPS) < 3:
+            assert time.time() < deadline
+            time.sleep(0.01)
+    finally:
+        pool.stop(5)
+    assert len(set(map(id, LOOPS))) == 1 and LOOPS[0].is_closed()
+
+def test_worker_survives_a_failure_to_record_the_outcome(tmp_path, monkeypatch, capsys):
+    _use_tmp_queue(tmp_path, monkeypatch)
+    monkeypatch.setattr(job_queue, 'LEASE_SECONDS', 0.2)
+    real_complete, locked = job_queue.complete, []
+    def complete(job_id, worker_id, result=None):
+        if not locked:
+            locked.append(job_id)
+            raise sqlite3.OperationalError('database is locked')
+        return real_complete(job_id, worker_id, result)
+    monkeypatch.setattr(job_queue, 'complete', complete)
+    first, second = job_queue.enqueue('flaky', {'n': 1}), job_queue.enqueue('flaky', {'n': 2})
+    pool = job_queue.WorkerPool(workers=1, poll_seconds=0.01).start()
+    try:
+        deadline = time.time() + 5
+        while not all(job_queue.get(j)['status'] == 'done' for j in (first, second)):
+            assert time.time() < deadline
+            time.sleep(0.01)
+    finally:
+        pool.stop(5)
+    assert locked == [first] and job_queue.get(first)['attempts'] == 2  # re-delivered after the lease
+    assert 'database is locked' in capsys.readouterr().out
+
+def test_fail_from_a_stale_owner_is_ignored(tmp_path, monkeypatch):
+    _use_tmp_queue(tmp_path, monkeypatch)
+    job_id = job_queue.enqueue('flaky', {'n': 5})
+    job_queue.claim('owner')
+    assert job_queue.fail(job_id, 'someone-else', 'boom') == 'lost'
+    assert job_queue.fail(job_id, 'owner', 'boom') == 'queued'
+    job = job_queue.get(job_id)
+    assert job['status'] == 'queued' and job['lease_owner'] is None and job['error'] == 'boom'
@@ -0,0 +1,52 @@
+import json
+import numpy as np
+from fastapi.testclient import TestClient
+from rank_bm25 import BM25Okapi
+from app.main import app
+from app.services import lexical_index, media_pipeline
+from app.services.storage_access import load_media_meta, transcript_path
+
+TEXTS = ['The Q3 budget was approved.', 'Budget, budget and more budget!', '', 'Hiring plan for Q4',
+         'the the the', 'Nothing about money here', 'Approved: the hiring budget']
+
+def test_scores_match_bm25okapi_and_top_k_is_ordered():
+    index = lexical_index.LexicalIndex.build(TEXTS, starts=[float(i) for i in range(len(TEXTS))])
+    reference = BM25Okapi([lexical_index.tokenize(t) for t in TEXTS])
+    for query in ['budget', 'the budget', 'q3 budget approved', 'hiring hiring', 'absent']:
+        tokens = lexical_index.tokenize(query)
+        assert np.allclose(index.scores(tokens), reference.get_scores(tokens), atol=1e-5)
+    hits = index.top_k('budget approved', k=2)
+    expected = np.argsort(-reference.get_scores(['budget', 'approved']), kind='stable')[:2]
+    assert [d for d, _ in hits] == expected.tolist() and hits[0][1] >= hits[1][1] > 0
+    assert index.top_k('absent') == []
+
+def test_matches_of_a_zero_idf_term_are_still_returned():
+    # 'budget' is in exactly half the segments: its BM25 idf (and every score) is 0
+    index = lexical_index.LexicalIndex.build(['budget one', 'budget two', 'other three', 'other four'])
+    assert np.allclose(index.scores(['budget']), 0.0)
+    assert sorted(d for d, _ in index.top_k('budget', k=5)) == [0, 1]
+
+def test_index_is_persisted_with_the_transcript_and_served_by_search(tmp_storage):
+    segments = [{'start': float(i), 'end': i + 1.0, 'text': t} for i, t in enumerate(TEXTS)]
+    media_pipeline.store_transcript('lexical-test', {'language': 'en', 'segments': segments})
+    path = lexical_index.index_path('lexical-test')
+    assert path.exists() and load_media_meta('lexical-test')['artifacts']['lexical'] == str(path)
+    loaded = lexical_index.LexicalIndex.load(path)
+    assert loaded.texts == TEXTS and np.array_equal(loaded.scores(['budget']), lexical_index.LexicalIndex.build(TEXTS).scores(['budget']))
+    with TestClient(app) as client:
+        response = client.get('/media/lexical-test/search', params={'q': 'Hiring'})
+    results = response.json()
+    assert response.headers['X-Index-Status'] == 'unavailable'  # no FAISS here: BM25 answers
+    assert [r['timestamp'] for r in results] == [3.0, 6.0] and results[0]['text'] == 'Hiring plan for Q4'
+
+def test_search_does_not_parse_the_transcript(tmp_storage, monkeypatch):
+    segments = [{'start': float(i), 'end': i + 1.0, 'text': t} for i, t in enumerate(TEXTS)]
+    media_pipeline.store_transcript('lexical-noparse', {'language': 'en', 'segments': segments})
+    def no_parse(*args, **kwargs):
+        raise AssertionError('transcript JSON parsed on the query path')
+    monkeypatch.setattr(json, 'load', no_parse)
+    client = TestClient(app)  # no lifespan: nothing else runs meanwhile
+    results = client.get('/media/lexical-noparse/search', params={'q': 'hiring'}).json()
+    assert [r['timestamp'] for r in results] == [3.0, 6.0]
+    transcript_path('lexical-noparse').unlink()
+    assert client.get('/media/lexical-noparse/search', params={'q': 'hiring'}).json() == []
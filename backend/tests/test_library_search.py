@@ -0,0 +1,85 @@
+import io, os, time, uuid
+import numpy as np
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.security import create_access_token
+from app.services import library_search, media_pipeline
+from app.services.storage_access import save_media_meta, load_media_meta
+
+DAY = 86400.0
+
+def _store(text_by_start, language='en', created_at=None, user_id=None):
+    mid = str(uuid.uuid4())
+    save_media_meta(mid, {'id': mid, 'filename': f'{mid}.wav', 'status': 'processing', 'created_at': created_at or time.time(),
+                          'user_id': user_id})
+    segments = [{'start': float(t), 'end': t + 1.0, 'text': text} for t, text in text_by_start.items()]
+    media_pipeline.store_transcript(mid, {'language': language, 'text': ''.join(text_by_start.values()), 'segments': segments})
+    return mid
+
+def test_library_search_spans_media_with_pagination_and_filters(tmp_storage):
+    now = time.time()
+    a = _store({0: ' Zanzibar budget for Q3', 5: ' unrelated chatter', 9: ' the zanzibar zanzibar plan'}, created_at=now - 10 * DAY)
+    b = _store({3: ' Zanzibar trip notes'}, language='de', created_at=now)
+    c = _store({1: ' nothing to see'})
+    with TestClient(app) as client:
+        full = client.get('/search', params={'q': 'zanzibar', 'mode': 'lexical'}).json()
+        assert {(r['media_id'], r['timestamp']) for r in full['results']} == {(a, 0.0), (a, 9.0), (b, 3.0)}
+        assert not full['has_more'] and c not in {r['media_id'] for r in full['results']}
+        assert (full['results'][0]['media_id'], full['results'][0]['timestamp']) == (a, 9.0)  # two mentions rank first
+        pages = [client.get('/search', params={'q': 'zanzibar', 'mode': 'lexical', 'offset': o, 'limit': 1}).json()
+                 for o in range(3)]
+        assert [p['results'][0] for p in pages] == full['results']
+        assert pages[0]['has_more'] and not pages[-1]['has_more']
+        german = client.get('/search', params={'q': 'zanzibar', 'language': 'de'}).json()['results']
+        assert [r['media_id'] for r in german] == [b]
+        since = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now - DAY))
+        recent = client.get('/search', params={'q': 'zanzibar', 'since': since}).json()
+        assert [r['media_id'] for r in recent['results']] == [b] and recent['semantic'] is False
+        assert client.get('/search', params={'q': 'x', 'offset': 5000}).status_code == 400
+        assert client.get('/search', params={'q': 'x', 'mode': 'fuzzy'}).status_code == 400
+
+def test_results_are_scoped_to_the_callers_token(tmp_storage, monkeypatch):
+    monkeypatch.setenv('SYNC_TRANSCRIBE_MAX_MB', '0')  # uploads are only queued
+    captured = _store({0: ' quokka census'}, user_id=7)
+    client = TestClient(app)  # no lifespan: no job workers transcribing the queued uploads
+    auth = {'Authorization': f'Bearer {create_access_token("7")}'}
+    mine = client.post('/media/upload', headers=auth,
+                       files={'file': ('mine.wav', io.BytesIO(os.urandom(64)), 'audio/wav')}).json()['id']
+    anonymous = client.post('/media/upload', files={'file': ('anon.wav', io.BytesIO(os.urandom(64)), 'audio/wav')}).json()['id']
+    assert load_media_meta(mine)['user_id'] == '7' and load_media_meta(anonymous).get('user_id') is None
+    for mid in (mine, anonymous):
+        media_pipeline.store_transcript(mid, {'language': 'en', 'segments': [{'start': 0.0, 'end': 1.0, 'text': ' quokka sighting'}]})
+    def found(headers=None, **params):
+        body = client.get('/search', headers=headers, params={'q': 'quokka', 'mode': 'lexical', **params}).json()
+        return {r['media_id'] for r in body['results']}
+    assert found(auth) == {captured, mine}
+    assert found() == {anonymous}
+    assert found(user_id=7) == {anonymous}  # a user id in the query does not widen the scope
+    assert found({'Authorization': f'Bearer {create_access_token("8")}'}) == set()
+    assert client.get('/search', headers={'Authorization': 'Bearer nope'}, params={'q': 'quokka'}).status_code == 401
+    assert len(library_search.search('quokka', mode='lexical')['results']) == 3  # internal callers see everything
+
+def test_reindexing_the_same_transcript_is_a_no_op(tmp_storage):
+    mid = _store({0: ' hello library'})
+    data = {'language': 'en', 'segments': [{'start': 0.0, 'end': 1.0, 'text': ' hello library'}]}
+    assert not library_search.index_media(mid, data)
+    assert library_search.index_media(mid, dict(data, segments=data['segments'] + [{'start': 1.0, 'end': 2.0, 'text': ' more'}]))
+
+def test_aggregated_vectors_rank_media_within_filters(tmp_storage):
+    a = _store({0: ' alpha'}, language='en')
+    b = _store({0: ' beta'}, language='fr')
+    library_search.set_media_vector(a, np.array([[1.0, 0.0], [0.8, 0.2]]))
+    library_search.set_media_vector(b, np.array([[0.0, 1.0]]))
+    q = np.array([0.0, 1.0], dtype=np.float32)
+    found = [m for s in range(library_search.SHARDS) for m in library_search._semantic_shard(s, q, 5, None, None, None, None)]
+    best = max((m for m in found if m[1] in (a, b)), key=lambda m: m[0])
+    assert best[1] == b and best[3] == 'fr'
+    english = [m[1] for s in range(library_search.SHARDS) for m in library_search._semantic_shard(s, q, 5, 'en', None, None, None)]
+    assert english == [a]
+    # media embedded by a model of another size stay searchable with queries of that size
+    c = _store({0: ' gamma'})
+    library_search.set_media_vector(c, np.array([[0.0, 0.0, 1.0]]))
+    wide = [m[1] for s in range(library_search.SHARDS)
+            for m in library_search._semantic_shard(s, np.array([0.0, 0.0, 1.0], dtype=np.float32), 5, None, None, None, None)]
+    narrow = [m[1] for s in range(library_search.SHARDS) for m in library_search._semantic_shard(s, q, 5, None, None, None, None)]
+    assert wide == [c] and sorted(narrow) == sorted([a, b])
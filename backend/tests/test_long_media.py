@@ -0,0 +1,59 @@
+import numpy as np
+from app.services import whisper_service as ws
+
+SR = ws.SAMPLE_RATE
+
+def _speechy(seconds, gaps):
+    t = np.arange(int(seconds * SR)) / SR
+    audio = (0.3 * np.sin(2 * np.pi * 220 * t)).astype('float32')
+    for a, b in gaps:
+        audio[int(a * SR):int(b * SR)] = 0.0
+    return audio
+
+def test_windows_cut_in_silence_and_cover_audio():
+    audio = _speechy(100, gaps=[(28, 29), (61, 62), (88, 89)])
+    plan = ws.plan_windows(audio, window_s=30, overlap_s=1, search_s=5)
+    assert plan[0][0] == 0 and plan[-1][1] == len(audio)
+    for (a, b, _, _), (c, _, _, _) in zip(plan, plan[1:]):
+        assert b == c
+        assert any(g0 * SR <= b <= g1 * SR for g0, g1 in [(28, 29), (61, 62), (88, 89)])
+    assert all(da <= a and db >= b for a, b, da, db in plan)
+
+def test_merge_drops_overlap_duplicates_and_votes_language():
+    cut = 30 * SR
+    w1 = {'own': (0, cut), 'language': 'en', 'segments': [
+        {'start': 0.0, 'end': 10.0, 'text': ' a'}, {'start': 28.0, 'end': 30.5, 'text': ' b'},
+        {'start': 30.6, 'end': 31.0, 'text': ' c'}]}
+    w2 = {'own': (cut, 60 * SR), 'language': 'en', 'segments': [
+        {'start': 28.1, 'end': 30.4, 'text': ' b'}, {'start': 30.6, 'end': 31.0, 'text': ' c'},
+        {'start': 40.0, 'end': 59.0, 'text': ' d'}]}
+    merged = ws.merge_window_segments([w2, w1])
+    assert [s['text'] for s in merged['segments']] == [' a', ' b', ' c', ' d']
+    assert merged['text'] == ' a b c d' and merged['language'] == 'en'
+
+class _FakePool:
+    def __init__(self, max_workers, **kwargs):
+        self.workers, self.shut = max_workers, False
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut = True
+
+def test_worker_count_is_capped_by_model_memory(monkeypatch):
+    monkeypatch.setattr(ws, '_WORKERS_ENV', None)
+    monkeypatch.setattr(ws, 'PARALLEL_WORKERS', 8)
+    monkeypatch.setattr(ws, 'WORKERS_MEMORY_MB', 4500)
+    assert ws.pool_workers('tiny') == 4 and ws.pool_workers('small.en') == 2 and ws.pool_workers('large-v3') == 1
+    monkeypatch.setattr(ws, '_WORKERS_ENV', '8')  # an explicit WHISPER_WORKERS is used as is
+    assert ws.pool_workers('large-v3') == 8
+
+def test_one_idle_pool_is_kept_and_idle_pools_shut_down(monkeypatch):
+    monkeypatch.setattr(ws, 'ProcessPoolExecutor', _FakePool)
+    monkeypatch.setattr(ws, '_pools', {})
+    monkeypatch.setattr(ws, 'POOL_IDLE_SECONDS', 0)
+    with ws._pool(2, 'tiny') as draft:
+        with ws._pool(2, 'small') as final:  # both in use: both resident
+            assert not draft.shut and set(ws._pools) == {'tiny', 'small'}
+        with ws._pool(2, 'tiny') as again:
+            assert again is draft
+    assert final.shut and set(ws._pools) == {'tiny'}  # the idle other size made room
+    assert ws.shutdown_pools(idle_for=3600) == 0 and not draft.shut
+    assert ws.shutdown_pools() == 1 and draft.shut and not ws._pools
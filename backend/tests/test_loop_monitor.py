@@ -0,0 +1,19 @@
+import asyncio, time
+import pytest
+from app.core import loop_monitor
+
+@pytest.mark.anyio
+async def test_monitor_reports_blocking_work_on_the_loop(capsys):
+    loop_monitor.stop()
+    stalls = loop_monitor.stats()['stalls']
+    loop_monitor.start(interval=0.01, threshold=0.1)
+    try:
+        await asyncio.sleep(0.05)
+        time.sleep(0.25)  # blocks every coroutine on this loop
+        await asyncio.sleep(0.05)
+        stats = loop_monitor.stats()
+    finally:
+        loop_monitor.stop()
+    assert stats['running'] and stats['stalls'] == stalls + 1
+    assert stats['last_stall_ms'] >= 200 and stats['max_ms'] >= 200 and stats['p50_ms'] < 100
+    assert '[loop] event loop stalled' in capsys.readouterr().out
@@ -0,0 +1,31 @@
+import json
+from pathlib import Path
+from app.services import manifest, storage_access
+
+def test_backfill_and_upsert(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest, 'STORAGE', tmp_path)
+    monkeypatch.setattr(manifest, 'MANIFEST_PATH', tmp_path / 'manifest.sqlite3')
+    (tmp_path / 'abc.mp4').write_bytes(b'\0' * 10)
+    (tmp_path / 'abc_transcript.json').write_text(json.dumps({'segments': []}))
+    (tmp_path / 'def.wav').write_bytes(b'\0' * 3)
+    entry = manifest.get('abc')
+    assert entry['raw'] == 'abc.mp4' and entry['size'] == 10 and entry['status'] == 'done'
+    assert entry['artifacts']['transcript'].endswith('abc_transcript.json')
+    assert manifest.get('def')['status'] == 'processing'
+    assert manifest.get('missing') is None
+    manifest.upsert('def', artifacts={'summary': tmp_path / 'def_summary.json'}, status='done', dedup_of='abc')
+    entry = manifest.get('def')
+    assert entry['status'] == 'done' and entry['dedup_of'] == 'abc' and entry['size'] == 3
+    manifest.set_artifact('def', 'summary', None)
+    assert 'summary' not in manifest.get('def')['artifacts']
+
+def test_save_media_meta_accepts_a_loaded_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest, 'STORAGE', tmp_path)
+    monkeypatch.setattr(manifest, 'MANIFEST_PATH', tmp_path / 'manifest.sqlite3')
+    storage_access.save_media_meta('abc', {'raw': 'abc.wav', 'status': 'processing'},
+                                   artifacts={'transcript': tmp_path / 'abc_transcript.json'})
+    meta = storage_access.load_media_meta('abc')
+    meta['status'] = 'done'
+    storage_access.save_media_meta('abc', meta)  # carries the 'artifacts' key read back from the manifest
+    entry = manifest.get('abc')
+    assert entry['status'] == 'done' and entry['artifacts']['transcript'].endswith('abc_transcript.json')
@@ -0,0 +1,41 @@
+import threading, time
+from app.services import model_registry
+
+class _FakeModel:
+    def parameters(self):
+        return []
+
+def test_slots_bound_concurrency_and_reuse_replicas(monkeypatch):
+    monkeypatch.setattr(model_registry, 'INFERENCE_SLOTS', 2)
+    entry = model_registry._Entry('fake', 'cpu', _FakeModel())
+    monkeypatch.setitem(model_registry._entries, ('fake', 'cpu'), entry)
+    active, peak, seen = [0], [0], set()
+    lock = threading.Lock()
+    def work():
+        with model_registry.acquire('fake', 'cpu') as model:
+            with lock:
+                active[0] += 1; peak[0] = max(peak[0], active[0]); seen.add(id(model))
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert peak[0] == 2
+    assert len(entry.replicas) == 2 and len(seen) == 2
+    stats = [s for s in model_registry.stats() if s['model'] == 'fake'][0]
+    assert stats['in_use'] == 0 and stats['queue_depth'] == 0 and stats['replicas'] == 2
+
+def test_failed_replica_copy_releases_its_slot(monkeypatch):
+    monkeypatch.setattr(model_registry, 'INFERENCE_SLOTS', 1)
+    entry = model_registry._Entry('fake-oom', 'cpu', _FakeModel())
+    entry.idle.clear()  # the only replica is busy elsewhere: the next checkout must copy it
+    def oom(_):
+        raise MemoryError
+    monkeypatch.setattr(model_registry.copy, 'deepcopy', oom)
+    for _ in range(3):
+        try:
+            entry.checkout()
+        except MemoryError:
+            pass
+    assert entry.in_use == 0 and entry.slots.acquire(timeout=1)
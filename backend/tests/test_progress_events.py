@@ -0,0 +1,53 @@
+import io, json, os, threading
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import job_queue, progress_hub
+
+def _read_events(response):
+    events = []
+    for line in response.iter_lines():
+        if line.startswith('data: '):
+            events.append(json.loads(line[6:]))
+            if events[-1]['event'] in ('done', 'error'):
+                break
+    return events
+
+def test_sse_streams_progress_until_done(tmp_storage, monkeypatch):
+    monkeypatch.setenv('SYNC_TRANSCRIBE_MAX_MB', '0')
+    client = TestClient(app)
+    r = client.post('/media/upload', files={'file': ('long.wav', io.BytesIO(b'RIFF' + os.urandom(64)), 'audio/wav')})
+    body = r.json()
+    assert body['status'] == 'processing' and body['job_id']
+    worker = threading.Timer(0.3, job_queue.drain)
+    worker.start()
+    with client.stream('GET', f"/media/{body['id']}/events") as resp:
+        assert resp.headers['content-type'].startswith('text/event-stream')
+        events = _read_events(resp)
+    worker.join()
+    kinds = [e['event'] for e in events]
+    assert kinds[0] == 'snapshot' and events[0]['status'] == 'queued'
+    assert kinds[-1] == 'done' and 'segments' in kinds and 'progress' in kinds
+    assert [e for e in events if e['event'] == 'progress'][-1]['percent'] == 100.0
+    # finished items answer with a terminal snapshot and close
+    with client.stream('GET', f"/media/{body['id']}/events") as resp:
+        events = [json.loads(l[6:]) for l in resp.iter_lines() if l.startswith('data: ')]
+    assert len(events) == 1 and events[0]['status'] == 'done'
+    assert client.get('/media/does-not-exist/events').status_code == 404
+
+@pytest.mark.anyio
+async def test_hub_fans_out_and_snapshots_late_joiners(monkeypatch):
+    monkeypatch.setattr(progress_hub, '_current_state', lambda media_id: ('running', {}))
+    first = progress_hub.subscribe('m1')
+    assert (await first.__anext__())['event'] == 'snapshot'
+    threading.Thread(target=progress_hub.publish, args=('m1', 'segments'),
+                     kwargs={'segments': [{'start': 0, 'end': 1, 'text': 'hi'}]}).start()
+    assert (await first.__anext__())['segments'][0]['text'] == 'hi'
+    late = progress_hub.subscribe('m1')
+    snap = await late.__anext__()
+    assert snap['segments'] == [{'start': 0, 'end': 1, 'text': 'hi'}] and progress_hub.watchers('m1') == 2
+    progress_hub.publish('m1', 'done')
+    assert (await first.__anext__())['event'] == 'done'
+    assert (await late.__anext__())['event'] == 'done'
+    await first.aclose(); await late.aclose()
+    assert progress_hub.watchers('m1') == 0
@@ -0,0 +1,40 @@
+import io, os
+from fastapi.testclient import TestClient
+from app.main import app
+
+def _upload(client):
+    payload = os.urandom(200_000)
+    r = client.post('/media/upload', files={'file': ('clip.mp4', io.BytesIO(payload), 'video/mp4')})
+    assert r.status_code == 200, r.text
+    return r.json(), payload
+
+def test_raw_range_requests(tmp_storage):
+    client = TestClient(app)
+    item, payload = _upload(client)
+    url = f"/media/{item['id']}/raw"
+    full = client.get(url)
+    assert full.status_code == 200 and full.content == payload
+    assert full.headers['accept-ranges'] == 'bytes'
+    etag = full.headers['etag']
+    assert etag == f'"{item["sha256"]}"'
+
+    r = client.get(url, headers={'Range': 'bytes=1000-1999'})
+    assert r.status_code == 206 and r.content == payload[1000:2000]
+    assert r.headers['content-range'] == f'bytes 1000-1999/{len(payload)}'
+
+    r = client.get(url, headers={'Range': 'bytes=-500'})
+    assert r.status_code == 206 and r.content == payload[-500:]
+
+    r = client.get(url, headers={'Range': 'bytes=0-9,100-109'})
+    assert r.status_code == 206 and r.headers['content-type'].startswith('multipart/byteranges')
+    assert int(r.headers['content-length']) == len(r.content)
+    assert payload[0:10] in r.content and payload[100:110] in r.content
+
+    r = client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    assert r.status_code == 200 and len(r.content) == len(payload)
+    r = client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': etag})
+    assert r.status_code == 206 and r.content == payload[:10]
+
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    r = client.get(url, headers={'Range': f'bytes={len(payload)}-'})
+    assert r.status_code == 416 and r.headers['content-range'] == f'bytes */{len(payload)}'
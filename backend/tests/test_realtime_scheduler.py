@@ -0,0 +1,74 @@
+import asyncio, json, threading, time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import engines, pcm_pipe
+from app.websocket import capture_ws
+from app.services.realtime_scheduler import RealtimeScheduler
+
+@pytest.mark.anyio
+async def test_sessions_round_robin_and_superseded_partials_are_dropped():
+    sched = RealtimeScheduler(workers=1)
+    gate, order = threading.Event(), []
+    def run(name, block=False):
+        if block:
+            gate.wait(5)
+        order.append(name)
+        return name
+    first = sched.submit('a', run, 'a1', True)
+    a2 = sched.submit('a', run, 'a2')
+    b1 = sched.submit('b', run, 'b1')
+    b2 = sched.submit('b', run, 'b2')  # replaces b1 before it ran
+    c1 = sched.submit('c', run, 'c1')
+    gate.set()
+    results = await asyncio.gather(first, a2, b1, b2, c1)
+    assert results == ['a1', 'a2', None, 'b2', 'c1']
+    assert order == ['a1', 'b2', 'c1', 'a2']  # a goes to the back after its run
+    stats = sched.stats()['sessions']
+    assert stats['b']['dropped'] == 1 and stats['b']['runs'] == 1 and stats['a']['runs'] == 2
+
+@pytest.mark.anyio
+async def test_final_is_never_superseded_and_errors_propagate():
+    sched = RealtimeScheduler(workers=1)
+    gate = threading.Event()
+    busy = sched.submit('x', gate.wait, 5)
+    final = sched.submit('s', lambda: 'final', final=True)
+    late = sched.submit('s', lambda: 'partial')
+    def boom():
+        raise ValueError('decode failed')
+    failing = sched.submit('y', boom)
+    gate.set()
+    assert await busy is True and await final == 'final' and await late is None
+    with pytest.raises(ValueError):
+        await failing
+
+@pytest.mark.anyio
+async def test_backpressure_advice_when_session_cannot_keep_up():
+    sched = RealtimeScheduler(workers=1)
+    await sched.submit('s', time.sleep, 0.2)
+    assert sched.advice('s', 1.0) is None
+    assert sched.advice('s', 0.1) == pytest.approx(0.25, abs=0.05)
+    sched.remove('s')
+    assert sched.session_stats('s') is None
+
+def test_buffer_seconds_is_validated_and_clamped(tmp_storage, monkeypatch):
+    assert capture_ws.parse_buffer_seconds('2.5') == 2.5
+    assert capture_ws.parse_buffer_seconds(0) == capture_ws.MIN_BUFFER_SECONDS
+    assert capture_ws.parse_buffer_seconds(-3) == capture_ws.MIN_BUFFER_SECONDS
+    assert capture_ws.parse_buffer_seconds(1e9) == capture_ws.MAX_BUFFER_SECONDS
+    assert all(capture_ws.parse_buffer_seconds(v) is None for v in ('soon', None, [], True, float('nan'), 'inf'))
+    monkeypatch.setattr(pcm_pipe, 'FFMPEG_CMD', ['cat'])
+    monkeypatch.setattr(engines, 'ENGINE', 'stub')
+    monkeypatch.setitem(engines._instances, 'stub', engines.StubEngine(latency=0.0, segment_seconds=1))
+    with TestClient(app) as client, client.websocket_connect('/v1/ws/capture') as ws:
+        ws.send_text(json.dumps({'type': 'start', 'buffer_seconds': 'fast'}))
+        assert json.loads(ws.receive_text())['code'] == 'invalid_config'
+        ws.send_text(json.dumps({'type': 'start'}))
+        assert json.loads(ws.receive_text())['type'] == 'started'
+        ws.send_text(json.dumps({'type': 'config', 'buffer_seconds': 'slow'}))
+        assert json.loads(ws.receive_text())['code'] == 'invalid_config'  # socket stays open
+        ws.send_text(json.dumps({'type': 'config', 'buffer_seconds': 1e6}))
+        assert json.loads(ws.receive_text()) == {'type': 'config', 'buffer_seconds': capture_ws.MAX_BUFFER_SECONDS}
+        ws.send_text(json.dumps({'type': 'stop'}))
+        while json.loads(ws.receive_text())['type'] != 'final':
+            pass
@@ -0,0 +1,54 @@
+import numpy as np
+from app.services.realtime_service import RealtimeTranscriber
+
+SR = 16000
+LEVEL = 3000  # well above the VAD threshold
+
+class SecondsEngine:
+    """Fake engine: one segment per run of equal samples, text naming the sample value (minus LEVEL)."""
+    def __init__(self):
+        self.lengths = []
+
+    def transcribe_pcm(self, audio, model_size=None, language=None, initial_prompt=None, word_timestamps=False):
+        self.lengths.append(len(audio) / SR)
+        cuts = np.flatnonzero(np.diff(audio)) + 1
+        bounds = [0, *cuts.tolist(), len(audio)]
+        segments = [{'start': a / SR, 'end': b / SR, 'text': f' w{int(audio[a]) - LEVEL}'} for a, b in zip(bounds, bounds[1:])]
+        return {'language': 'en', 'text': ''.join(s['text'] for s in segments), 'segments': segments}
+
+def test_window_mode_commits_stable_segments_with_bounded_work():
+    engine = SecondsEngine()
+    rt = RealtimeTranscriber(decode_interval=2.0, window_seconds=8, overlap_seconds=1, engine=engine)
+    capacity = rt.ring.capacity
+    for second in range(1, 301):  # five minutes, one tick every two seconds
+        rt.add_pcm(np.full(SR, LEVEL + second, dtype='<i2'))
+        if second % 2 == 0:
+            rt.step()
+    assert max(engine.lengths) <= 8 and rt.ring.capacity == capacity
+    assert rt.committed_text.split()[:3] == ['w1', 'w2', 'w3']
+    rt.step(final=True)
+    assert rt.committed_text.split() == [f'w{i}' for i in range(1, 301)]
+    assert [s['start'] for s in rt.committed] == [float(i) for i in range(300)]
+
+def test_window_mode_waits_for_agreement_before_committing():
+    engine = SecondsEngine()
+    rt = RealtimeTranscriber(window_seconds=30, engine=engine)
+    rt.add_pcm(np.full(SR, LEVEL + 1, dtype='<i2'))
+    first = rt.step()
+    assert first['segments'] == [] and [s['text'] for s in first['tentative']] == [' w1']
+    rt.add_pcm(np.full(SR, LEVEL + 2, dtype='<i2'))
+    second = rt.step()
+    assert second['delta'] == ' w1' and [s['text'] for s in second['tentative']] == [' w2']
+    assert rt.step() is None  # no new audio
+
+def test_vad_skips_silent_windows_and_commits_on_pauses():
+    engine = SecondsEngine()
+    rt = RealtimeTranscriber(window_seconds=30, overlap_seconds=0, engine=engine)
+    rt.add_pcm(np.zeros(2 * SR, dtype='<i2'))
+    assert rt.step() is None and engine.lengths == [] and rt.vad_saved_seconds == 2.0
+    rt.add_pcm(np.full(SR, LEVEL + 1, dtype='<i2'))
+    assert rt.step()['tentative'][0]['start'] == 2.0 and len(engine.lengths) == 1
+    rt.add_pcm(np.zeros(SR, dtype='<i2'))  # pause: the tentative tail is committed without a decode
+    paused = rt.step()
+    assert paused['delta'] == ' w1' and len(engine.lengths) == 1
+    assert rt.committed == [{'start': 2.0, 'end': 3.0, 'text': ' w1'}]
@@ -0,0 +1,45 @@
+import json, os, time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import session_buffer
+from app.websocket import capture_ws
+
+@pytest.mark.anyio
+async def test_buffer_stays_in_memory_until_the_cap_then_spills(tmp_path):
+    buf = session_buffer.SessionBuffer(cap=10, spill_dir=tmp_path)
+    await buf.write(b'12345')
+    await buf.write(b'67890')
+    assert not buf.spilled and buf.memory_bytes == 10 and not list(tmp_path.iterdir())
+    await buf.write(b'abc')
+    assert buf.spilled and buf.memory_bytes == 0 and buf.size == 13
+    assert await buf.read() == b'1234567890abc'
+    await buf.save(tmp_path / 'out' / 'capture.webm')
+    assert (tmp_path / 'out' / 'capture.webm').read_bytes() == b'1234567890abc'
+    buf.close()
+    assert [p.name for p in tmp_path.iterdir()] == ['out']
+
+def test_budget_refuses_sessions_that_do_not_fit(monkeypatch):
+    budget = session_buffer.MemoryBudget(total=100)
+    assert budget.reserve(60) and not budget.reserve(60)
+    budget.release(60)
+    assert budget.reserve(60) and budget.stats() == {'budget_bytes': 100, 'reserved_bytes': 60, 'rejected_sessions': 1}
+
+def test_capture_rejects_new_sessions_over_the_memory_budget(monkeypatch):
+    budget = session_buffer.MemoryBudget(total=capture_ws.session_reservation() - 1)
+    monkeypatch.setattr(capture_ws, 'BUDGET', budget)
+    with TestClient(app) as client, client.websocket_connect('/v1/ws/capture') as ws:
+        ws.send_text(json.dumps({'type': 'start'}))
+        msg = json.loads(ws.receive_text())
+        assert msg['type'] == 'error' and msg['code'] == 'over_capacity'
+        assert ws.receive()['code'] == 1013
+    assert budget.used == 0 and budget.rejected == 1
+
+def test_stale_spill_files_are_purged(tmp_path):
+    stale, live = tmp_path / 'old.webm', tmp_path / 'live.webm'
+    stale.write_bytes(b'x')
+    live.write_bytes(b'y')
+    os.utime(stale, (time.time() - 3600, time.time() - 3600))
+    assert session_buffer.purge_stale_spills(tmp_path, older_than=300) == 1
+    assert [p.name for p in tmp_path.iterdir()] == ['live.webm']
+    assert session_buffer.purge_stale_spills(tmp_path / 'missing') == 0
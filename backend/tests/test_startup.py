@@ -0,0 +1,32 @@
+import threading
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core import warmup
+from benchmarks.bench_startup import profile
+
+def test_import_keeps_heavy_modules_lazy():
+    _, rows, heavy = profile()
+    assert heavy == []
+    assert rows and rows[0][2] in ('app.main', 'app')
+
+def test_health_is_independent_of_readiness():
+    client = TestClient(app)
+    assert client.get('/health').json() == {'status': 'ok'}
+
+def test_ready_reports_503_until_warmup_finishes(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(warmup, '_plan', lambda: [('storage', lambda: None), ('whisper', lambda: release.wait(5) and 'done')])
+    monkeypatch.setattr(warmup, '_thread', None)
+    monkeypatch.setattr(warmup, '_started_at', None)
+    monkeypatch.setattr(warmup, '_steps', {})
+    client = TestClient(app)
+    warmup.start()
+    r = client.get('/ready')
+    assert r.status_code == 503 and not r.json()['ready']
+    assert r.json()['steps']['whisper']['status'] in ('pending', 'running')
+    assert client.get('/health').status_code == 200
+    release.set()
+    warmup._thread.join(5)
+    r = client.get('/ready')
+    assert r.status_code == 200 and r.json()['ready']
+    assert r.json()['steps']['whisper']['status'] == 'done'
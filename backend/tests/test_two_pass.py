@@ -0,0 +1,33 @@
+import io, json, os
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import embedding_service, job_queue, media_pipeline, whisper_service, storage_access
+
+def test_draft_then_refine_swaps_transcript_and_drops_derived(tmp_storage, monkeypatch):
+    monkeypatch.setattr(media_pipeline, 'TWO_PASS', True)
+    sizes = []
+    def fake_transcribe(path, sha256=None, on_progress=None, model_size=None, media_id=None):
+        sizes.append(model_size)
+        return {'language': 'en', 'text': f' {model_size}', 'segments': [{'start': 0.0, 'end': 1.0, 'text': f' {model_size}'}]}
+    monkeypatch.setattr(whisper_service, 'transcribe_to_segments', fake_transcribe)
+    client = TestClient(app)
+    body = client.post('/media/upload', files={'file': ('a.wav', io.BytesIO(os.urandom(2000)), 'audio/wav')}).json()
+    mid = body['id']
+    assert body['quality'] == 'draft' and sizes == [media_pipeline.DRAFT_MODEL]
+    assert client.get(f'/media/{mid}/transcript').json()['quality'] == 'draft'
+    assert client.get(f'/media/{mid}/status').json() == {'ready': True, 'quality': 'draft'}
+    # artifacts built from the draft
+    summary = tmp_storage / f'{mid}_summary.json'
+    summary.write_text(json.dumps({'summary_short': 'draft'}))
+    storage_access.record_artifact(mid, 'summary', summary)
+    emb_dir = embedding_service.EMB_DIR
+    emb_dir.mkdir(parents=True, exist_ok=True)
+    (emb_dir / f'{mid}.index').write_bytes(b'x')
+    assert job_queue.get(f'refine:{mid}')['status'] == 'queued'
+    job_queue.drain()
+    assert sizes[-1] == media_pipeline.FINAL_MODEL
+    data = client.get(f'/media/{mid}/transcript').json()
+    assert data['quality'] == 'final' and data['text'] == f' {media_pipeline.FINAL_MODEL}'
+    assert client.get(f'/media/{mid}').json()['quality'] == 'final'
+    assert not summary.exists() and not (emb_dir / f'{mid}.index').exists()
+    assert 'summary' not in storage_access.load_media_meta(mid)['artifacts']
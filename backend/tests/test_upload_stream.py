@@ -0,0 +1,45 @@
+import hashlib, io, os, pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import storage_access
+
+def test_upload_records_size_and_digest(tmp_storage):
+    client = TestClient(app)
+    payload = os.urandom(300_000)
+    r = client.post('/media/upload', files={'file': ('blob.wav', io.BytesIO(payload), 'audio/wav')})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body['size'] == len(payload)
+    assert body['sha256'] == hashlib.sha256(payload).hexdigest()
+    raw = storage_access.find_raw_media(body['id'])
+    assert raw is not None and raw.read_bytes() == payload
+    meta = client.get(f"/media/{body['id']}").json()
+    assert meta['sha256'] == body['sha256']
+    assert meta['filename'] == raw.name
+
+@pytest.mark.anyio
+async def test_stream_uses_bounded_chunks(tmp_path):
+    class _Upload:
+        def __init__(self, data):
+            self.buf = io.BytesIO(data); self.reads = []
+        async def read(self, n=-1):
+            self.reads.append(n)
+            return self.buf.read(n)
+    data = b'x' * 10_000
+    up = _Upload(data)
+    dest = tmp_path / 'out.bin'
+    size, digest = await storage_access.save_upload_stream(up, dest, 4096)
+    assert size == len(data) and digest == hashlib.sha256(data).hexdigest()
+    assert all(n == 4096 for n in up.reads)
+    assert dest.read_bytes() == data
+    assert not [p for p in tmp_path.iterdir() if p.name.endswith('.part')]
+
+@pytest.mark.anyio
+async def test_stored_upload_respects_the_umask(tmp_path):
+    class _Upload:
+        def __init__(self):
+            self.buf = io.BytesIO(b'payload')
+        async def read(self, n=-1):
+            return self.buf.read(n)
+    await storage_access.save_upload_stream(_Upload(), tmp_path / 'out.bin')
+    assert (tmp_path / 'out.bin').stat().st_mode & 0o777 == 0o666 & ~storage_access._UMASK
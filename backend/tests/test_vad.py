@@ -0,0 +1,75 @@
+import numpy as np
+from app.services import vad, whisper_service, engines
+
+SR = 16000
+
+def _tone(seconds, level=0.3):
+    return (level * np.sin(2 * np.pi * 220 * np.arange(int(seconds * SR)) / SR)).astype(np.float32)
+
+def test_speech_frames_hold_speech_through_the_hangover():
+    audio = np.concatenate([np.zeros(SR // 2, np.float32), _tone(0.3), np.zeros(SR, np.float32)])
+    active = vad.speech_frames(audio, frame_ms=30, hangover_ms=300)
+    frames = np.flatnonzero(active)
+    assert frames[0] * 0.03 >= 0.45 and 0.75 <= (frames[-1] + 1) * 0.03 <= 1.15
+    assert vad.is_silent(np.zeros(SR, np.float32)) and not vad.is_silent(audio)
+    assert vad.is_silent((np.ones(SR) * 10).astype('<i2'))  # -70 dBFS hum
+
+def test_speech_map_trims_long_silences_and_restores_timestamps():
+    audio = np.concatenate([_tone(2), np.zeros(10 * SR, np.float32), _tone(3), np.zeros(SR, np.float32)])
+    speech = vad.speech_map(audio, min_silence_s=2, pad_s=0.5)
+    assert len(speech.spans) == 2 and speech.spans[0][0] == 0 and speech.spans[1][1] == len(audio)
+    assert 8.5 < speech.saved_seconds < 9.5
+    trimmed = speech.trim(audio)
+    assert len(trimmed) == speech.kept_samples
+    second_start = speech.spans[0][1] - speech.spans[0][0]
+    seg = speech.remap([{'start': 0.5, 'end': second_start / SR, 'text': 'a'},
+                        {'start': second_start / SR + 0.5, 'end': second_start / SR + 1.5, 'text': 'b'}])
+    assert seg[0]['start'] == 0.5 and seg[0]['end'] == speech.spans[0][1] / SR
+    assert abs(seg[1]['start'] - (speech.spans[1][0] / SR + 0.5)) < 1e-3
+
+def test_batch_transcription_skips_silence_and_reports_saving(tmp_path, monkeypatch):
+    calls = []
+    class Recorder(engines.StubEngine):
+        def transcribe_pcm(self, audio, **kw):
+            calls.append(len(audio) / SR)
+            return super().transcribe_pcm(audio, **kw)
+    monkeypatch.setattr(engines, 'ENGINE', 'stub')
+    monkeypatch.setitem(engines._instances, 'stub', Recorder(latency=0.0, segment_seconds=1))
+    audio = np.concatenate([_tone(2), np.zeros(20 * SR, np.float32), _tone(2)])
+    monkeypatch.setattr(whisper_service, 'load_audio', lambda path: audio)
+    result = whisper_service.transcribe_to_segments('clip.wav')
+    assert calls and calls[0] < 6 and result['vad_saved_seconds'] > 18
+    assert result['segments'][-1]['end'] == len(audio) / SR
+    assert any(s['start'] >= 21 for s in result['segments'])
+
+def test_cached_pcm_is_read_span_by_span_without_a_trimmed_copy(tmp_path, monkeypatch):
+    calls = []
+    class Recorder(engines.StubEngine):
+        def transcribe_pcm(self, audio, **kw):
+            calls.append(len(audio) / SR)
+            return super().transcribe_pcm(audio, **kw)
+    monkeypatch.setattr(engines, 'ENGINE', 'stub')
+    monkeypatch.setitem(engines._instances, 'stub', Recorder(latency=0.0, segment_seconds=1))
+    audio = (np.concatenate([_tone(4), np.zeros(20 * SR, np.float32), _tone(5)]) * 32767).astype('<i2')
+    pcm = tmp_path / 'clip.s16'
+    pcm.write_bytes(audio.tobytes())
+    speech = vad.speech_map(audio)
+    view = speech.view(whisper_service.audio_cache.open_pcm(pcm))
+    trimmed = speech.trim(audio)
+    assert len(view) == len(trimmed)
+    for a, b in [(0, 100), (len(trimmed) // 3, len(trimmed) - 7), (0, len(trimmed)), (5, 5)]:
+        assert np.array_equal(view[a:b], trimmed[a:b])
+
+    def no_copy(self, audio):
+        raise AssertionError('the whole recording was trimmed into memory')
+    monkeypatch.setattr(vad.SpeechMap, 'trim', no_copy)
+    monkeypatch.setattr(whisper_service.audio_cache, 'ensure', lambda path, sha256: pcm)
+    monkeypatch.setattr(whisper_service, 'CHECKPOINT_DIR', tmp_path / 'checkpoints')
+    monkeypatch.setattr(whisper_service, 'CHECKPOINT_SECONDS', 3)  # pieces are sliced from the view
+    result = whisper_service.transcribe_to_segments('clip.wav', sha256='abc', media_id='m')
+    assert sum(calls) < 11 and result['vad_saved_seconds'] > 18
+    assert result['segments'][0]['start'] == 0.0 and result['segments'][-1]['end'] == len(audio) / SR
+    # long-media workers open the same file and slice the same spans
+    monkeypatch.setattr(whisper_service, '_worker_engine', engines.get_engine())
+    window = whisper_service._transcribe_window(str(pcm), 0, len(view), speech.spans)
+    assert window['segments'][-1]['end'] == len(view) / SR
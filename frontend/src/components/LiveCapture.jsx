@@ -15,6 +15,37 @@ function pickAudioMime(){
   return undefined; // let browser choose
 }
 
+// Compact capture protocol (backend app/services/capture_protocol.py): little-endian binary frames
+// kind u8, seq u32, then PARTIAL(1): commit_index u32 + committed and tentative segment lists,
+// ACK(2): blobs u32 + bytes u64, FINAL(3): committed u32 + text. Segment: start_ms, end_ms u32, text (u16 length).
+const utf8 = new TextDecoder();
+function decodeCaptureFrame(buf){
+  const view = new DataView(buf);
+  const kind = view.getUint8(0), seq = view.getUint32(1, true);
+  let pos = 5;
+  const segmentsAt = ()=>{
+    const n = view.getUint16(pos, true); pos += 2;
+    const out = [];
+    for(let i=0;i<n;i++){
+      const start = view.getUint32(pos, true)/1000, end = view.getUint32(pos+4, true)/1000, len = view.getUint16(pos+8, true);
+      out.push({ start, end, text: utf8.decode(new Uint8Array(buf, pos+10, len)) });
+      pos += 10 + len;
+    }
+    return out;
+  };
+  if(kind===1){
+    const commit_index = view.getUint32(pos, true); pos += 4;
+    const segments = segmentsAt(), tentative = segmentsAt();
+    return { type:'partial', seq, commit_index, segments, tentative, text: [...segments, ...tentative].map(s=>s.text).join('') };
+  }
+  if(kind===2) return { type:'ack', seq, blobs: view.getUint32(pos, true) };
+  if(kind===3){
+    const committed = view.getUint32(pos, true), len = view.getUint32(pos+4, true);
+    return { type:'final', seq, committed, text: utf8.decode(new Uint8Array(buf, pos+8, len)) };
+  }
+  return { type:'unknown', seq };
+}
+
 export default function LiveCapture(){
   const [recording, setRecording] = useState(false);
   const [socketState, setSocketState] = useState('idle');
@@ -22,6 +53,15 @@ export default function LiveCapture(){
   const [segments, setSegments] = useState([]);
   const wsRef = useRef(null);
   const mediaRecRef = useRef(null);
+  // Reconnect state: the server keeps the session for a grace period after a drop
+  const sessionRef = useRef(null);     // session_id from 'started'
+  const tokenRef = useRef(null);       // resume_token from 'started' (required to resume)
+  const readyRef = useRef(false);      // socket has a started/resumed session: blobs may go out directly
+  const queueRef = useRef([]);         // [{n, buf}] blobs the server has not acknowledged yet
+  const blobCountRef = useRef(0);
+  const committedRef = useRef(0);      // committed segments received (commit_index to resume from)
+  const stoppedRef = useRef(false);
+  const retryRef = useRef(0);
 
   const apiBase = import.meta.env.VITE_API || 'http://localhost:8000';
   // Backend route is versioned: /v1/ws/capture
@@ -29,6 +69,7 @@ export default function LiveCapture(){
 
   useEffect(()=>{
     return ()=>{
+      sessionRef.current = null; readyRef.current = false;
       if(mediaRecRef.current && mediaRecRef.current.state === 'recording') mediaRecRef.current.stop();
       if(wsRef.current) try{ wsRef.current.close(); }catch{}
     };
@@ -46,20 +87,84 @@ export default function LiveCapture(){
           sampleRate: 48000
         }
       });
+      sessionRef.current = null; tokenRef.current = null; readyRef.current = false;
+      queueRef.current = []; blobCountRef.current = 0;
+      committedRef.current = 0; stoppedRef.current = false; retryRef.current = 0;
+      connect();
+
+      const mimeType = pickAudioMime();
+      const rec = new MediaRecorder(stream, mimeType? {mimeType}:{ });
+      mediaRecRef.current = rec;
+      rec.ondataavailable = e=>{
+        if(!e.data.size) return;
+        const n = ++blobCountRef.current;
+        e.data.arrayBuffer().then(buf=>{
+          // queued until acknowledged, so blobs recorded during a drop are sent after the resume;
+          // until 'started'/'resumed' flushes the queue nothing is sent directly (keeps the webm in order)
+          queueRef.current.push({ n, buf });
+          const ws = wsRef.current;
+          if(ws && ws.readyState===1 && readyRef.current) ws.send(buf); // arraybuffer direct
+        });
+      };
+      rec.onstop = ()=>{
+        stoppedRef.current = true;
+        const ws = wsRef.current;
+        if(ws && ws.readyState===1 && readyRef.current){
+          ws.send(JSON.stringify({ type: 'stop' })); // otherwise sent after the queue flush
+        }
+      };
+      // Smaller timeslice for lower latency
+      rec.start(750); // ~0.75s chunks
+      setRecording(true);
+    } catch(e){
+      console.error(e);
+      alert('Mic error: '+ e.message);
+    }
+  };
+
+  const connect = ()=>{
       const ws = new WebSocket(wsUrl);
       ws.binaryType = 'arraybuffer';
       wsRef.current = ws;
+      readyRef.current = false;
       ws.onopen = ()=>{ 
         setSocketState('open');
-        // Send start control message required by backend
-        ws.send(JSON.stringify({ type: 'start', buffer_seconds: 3.0 }));
+        retryRef.current = 0;
+        if(sessionRef.current){
+          ws.send(JSON.stringify({ type: 'resume', session_id: sessionRef.current, resume_token: tokenRef.current,
+            commit_index: committedRef.current, protocol: 'compact' }));
+        } else {
+          // Send start control message required by backend
+          ws.send(JSON.stringify({ type: 'start', buffer_seconds: 3.0, protocol: 'compact' }));
+        }
+      };
+      ws.onclose = ()=>{
+        if(wsRef.current===ws) readyRef.current = false;
+        setSocketState('closed');
+        if(wsRef.current!==ws || !sessionRef.current) return;
+        // dropped before the final message: reconnect with backoff and resume the session
+        const delay = Math.min(500 * 2 ** retryRef.current++, 8000);
+        setSocketState('reconnecting');
+        setTimeout(()=>{ if(sessionRef.current) connect(); }, delay);
       };
-      ws.onclose = ()=>{ setSocketState('closed'); };
       ws.onerror = (e)=>{ console.error('WS error', e); setSocketState('error'); };
       ws.onmessage = (ev)=>{
         try {
-          const msg = JSON.parse(ev.data);
-          if(msg.type==='partial'){
+          const msg = typeof ev.data === 'string' ? JSON.parse(ev.data) : decodeCaptureFrame(ev.data);
+          const confirmed = msg.type==='ack' ? (msg.blobs ?? msg.seq) : msg.type==='resumed' ? msg.blobs : null;
+          if(confirmed!=null) queueRef.current = queueRef.current.filter(b=>b.n > confirmed);
+          if(msg.type==='started'){
+            sessionRef.current = msg.session_id;
+            tokenRef.current = msg.resume_token;
+            queueRef.current.forEach(b=>ws.send(b.buf)); // recorded before the session started
+            readyRef.current = true;
+            if(stoppedRef.current) ws.send(JSON.stringify({ type: 'stop' }));
+          } else if(msg.type==='resumed'){
+            queueRef.current.forEach(b=>ws.send(b.buf));
+            readyRef.current = true;
+            if(stoppedRef.current) ws.send(JSON.stringify({ type: 'stop' }));
+          } else if(msg.type==='partial'){
+            if(Array.isArray(msg.segments) && msg.commit_index!=null) committedRef.current = msg.commit_index + msg.segments.length;
             setPartial(msg.text || '');
             if(Array.isArray(msg.segments)) setSegments(prev=>{ 
               const merged = [...prev];
@@ -70,41 +175,25 @@ export default function LiveCapture(){
             });
           } else if(msg.type==='final'){
             setPartial(msg.text || '');
+            sessionRef.current = null; tokenRef.current = null; readyRef.current = false;
+          } else if(msg.type==='backpressure'){
+            console.info('Server busy, transcribing every', msg.buffer_seconds, 's');
+          } else if(msg.type==='saved'){
+            console.info('Live capture stored as media', msg.media_id);
           } else if(msg.type==='error'){
             console.warn('Backend error:', msg.message);
+            if(msg.code==='unknown_session'){ sessionRef.current = null; tokenRef.current = null; } // grace period over: the server stored it
           }
         } catch(err){
           // Non-json messages
         }
       };
-
-      const mimeType = pickAudioMime();
-      const rec = new MediaRecorder(stream, mimeType? {mimeType}:{ });
-      mediaRecRef.current = rec;
-      rec.ondataavailable = e=>{
-        if(e.data.size && ws.readyState===1){
-          e.data.arrayBuffer().then(buf=>{
-            ws.send(buf); // arraybuffer direct
-          });
-        }
-      };
-      rec.onstop = ()=>{
-        if(ws.readyState===1){
-          ws.send(JSON.stringify({ type: 'stop' }));
-        }
-      };
-      // Smaller timeslice for lower latency
-      rec.start(750); // ~0.75s chunks
-      setRecording(true);
-    } catch(e){
-      console.error(e);
-      alert('Mic error: '+ e.message);
-    }
   };
 
   const stop = ()=>{
+    stoppedRef.current = true;
     if(mediaRecRef.current && mediaRecRef.current.state==='recording'){ mediaRecRef.current.stop(); }
-    if(wsRef.current && wsRef.current.readyState===1){ try{ wsRef.current.send(JSON.stringify({type:'stop'})); }catch{} }
+    if(wsRef.current && wsRef.current.readyState===1 && readyRef.current){ try{ wsRef.current.send(JSON.stringify({type:'stop'})); }catch{} }
     setRecording(false);
   };
 
@@ -18,10 +18,12 @@ export default function TranscriptViewer({media}){
   // Sync prop -> state
   useEffect(()=>{ setCurrent(media); }, [media]);
 
-  // Poll status & transcript
+  // Live progress over Server-Sent Events; falls back to polling if the stream fails
   useEffect(()=>{
     if(!current?.id) return; // still run effect (no-op) to keep hook order stable
     setPolling(true);
+    let timer = null;
+    let es = null;
     const fetchOnce = async ()=>{
       try {
         const res = await axios.get(`${apiBase}/media/${current.id}`);
@@ -30,22 +32,51 @@ export default function TranscriptViewer({media}){
         const segs = tr.data.segments || [];
         if(segs.length){
           setSegments(segs);
-          if(progress !== 100) setProgress(100);
+          setProgress(100);
         }
         // Capture any provided raw transcript text (different backends might send 'transcript' or 'text')
         if(tr.data.transcript || tr.data.text){
           setFullText(tr.data.transcript || tr.data.text || '');
-        } else if(segs.length && !fullText){
+        } else if(segs.length){
           setFullText(segs.map(s=>s.text).join(' '));
         }
-        if(res.data.status === 'transcribed') setProgress(100);
+        if(res.data.status === 'transcribed' || res.data.status === 'done') setProgress(100);
+        return res.data.status;
       } catch {/* swallow polling errors */}
     };
+    const poll = ()=>{ if(!timer) timer = setInterval(fetchOnce, 4000); };
     // Initial immediate fetch for quicker UI response
     fetchOnce();
-    const id = setInterval(fetchOnce, 4000);
-    return ()=>{ clearInterval(id); setPolling(false);} ;
-    // We intentionally do NOT include progress/fullText in deps to avoid recreating interval.
+    if(typeof EventSource !== 'undefined'){
+      es = new EventSource(`${apiBase}/media/${current.id}/events`);
+      es.addEventListener('snapshot', e=>{
+        const d = JSON.parse(e.data);
+        if(d.segments?.length) setSegments(d.segments);
+        if(typeof d.percent === 'number') setProgress(d.percent);
+        if(d.status === 'done' || d.status === 'error'){ es.close(); fetchOnce(); }
+      });
+      es.addEventListener('state', e=>{
+        if(JSON.parse(e.data).status === 'running'){ setSegments([]); setProgress(0); }
+      });
+      es.addEventListener('segments', e=>{
+        const d = JSON.parse(e.data);
+        setSegments(prev=>prev.concat(d.segments || []));
+      });
+      es.addEventListener('progress', e=>{
+        const d = JSON.parse(e.data);
+        if(typeof d.percent === 'number') setProgress(d.percent);
+      });
+      const finish = ()=>{ es.close(); fetchOnce(); };
+      // two-pass mode: draft transcript is readable now, the refined one replaces it on 'done'
+      es.addEventListener('draft', ()=>fetchOnce());
+      es.addEventListener('done', finish);
+      es.addEventListener('error', e=>{ if(e.data) finish(); });
+      es.onerror = ()=>{ if(es.readyState === EventSource.CLOSED) poll(); };
+    } else {
+      poll();
+    }
+    return ()=>{ if(es) es.close(); if(timer) clearInterval(timer); setPolling(false);} ;
+    // We intentionally do NOT include progress/fullText in deps to avoid recreating the stream.
   }, [current?.id, apiBase]);
 
   const filtered = useMemo(()=>{